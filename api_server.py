@@ -4,19 +4,652 @@ API Server for System Monitoring Dashboard
 Serves metrics and alerts to the web interface
 """
 
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
+from collections import OrderedDict, deque
+from functools import lru_cache
+import gzip
 import json
+import math
 import os
+import sys
+import threading
+import time
+import zlib
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+import exposition
+from aggregator import Aggregator
+from file_watcher import FileWatcher, file_signature
+from forecast import Forecaster, FORECAST_HOURS
+from metrics_store import MetricsStore
+from series import FieldProjection, bucket_aggregate, lttb, parse_path
+
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
 DATA_DIR = os.getenv('DATA_DIR', '/app/data')
 REPORTS_DIR = os.getenv('REPORTS_DIR', '/app/reports')
+HISTORY_CACHE_HOURS = float(os.getenv('HISTORY_CACHE_HOURS', 6))
+HISTORY_CACHE_MB = float(os.getenv('HISTORY_CACHE_MB', 64))
+DEFAULT_LTTB_SERIES = 'cpu.load_1min'
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', 1))
+STREAM_KEEPALIVE_SECONDS = 15
+# Each open stream holds a worker thread; keep half of them for other requests
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', int(os.getenv('API_THREADS', 128)) // 2))
+STREAM_RETRY_SECONDS = 30
+ALERTS_CACHE_SIZE = int(os.getenv('ALERTS_CACHE_SIZE', 200))
+ALERTS_PAGE_LIMIT = 500
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_CACHE_ENTRIES = 64
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain')
+
+store = MetricsStore(DATA_DIR)
+
+
+def heap_size(value):
+    """Estimate the bytes a parsed JSON document occupies in memory
+
+    Sums sys.getsizeof over every container and value. JSON parsers reuse
+    one string per distinct key (orjson even across documents), so each key
+    is counted once; this is within a few percent of tracemalloc with the
+    json module and errs on the high side with orjson.
+    """
+    size = 0
+    keys = set()
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            keys.update(item)
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+    return size + sum(sys.getsizeof(key) for key in keys)
+
+
+def load_json(path):
+    """Load a JSON document"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def read_lines_reversed(f, end, block_size=8192):
+    """Yield (offset, line) for the lines before byte `end`, newest first"""
+    position = end
+    carry = b''
+    while position > 0:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        parts = (f.read(size) + carry).split(b'\n')
+        # parts[0] may continue in the previous block
+        carry = parts[0]
+        offset = position + len(carry) + 1
+        lines = []
+        for part in parts[1:]:
+            lines.append((offset, part))
+            offset += len(part) + 1
+        for offset, line in reversed(lines):
+            if line.strip():
+                yield offset, line
+    if carry.strip():
+        yield 0, carry
+
+
+def parse_alert(line):
+    """Parse one alerts.jsonl line, or None if it is malformed"""
+    try:
+        alert = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return alert if isinstance(alert, dict) else None
+
+
+def parse_alert_cursor(value):
+    """Turn a before/since value into (timestamp string, skip count)"""
+    timestamp, _, skip = value.partition('~')
+    if timestamp.isdigit():
+        # Alerts are stamped in local time by alert_system.sh
+        timestamp = datetime.fromtimestamp(int(timestamp)).strftime('%Y-%m-%d %H:%M:%S')
+    return timestamp, int(skip) if skip.isdigit() else 0
+
+
+class FileSnapshot:
+    """Parsed and pre-serialized copy of a data file, reloaded only when it changes"""
+    
+    def __init__(self, path, loader=load_json):
+        self.path = Path(path)
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.signature = None
+        self.entry = None  # (data, body, etag, mtime)
+        self.hits = 0
+        self.misses = 0
+    
+    def get_entry(self):
+        """Return (data, body, etag, mtime), or None when the file does not exist"""
+        signature = file_signature(self.path)
+        if signature is None:
+            return None
+        
+        with self.lock:
+            if signature == self.signature:
+                self.hits += 1
+                return self.entry
+            
+            # Holding the lock while loading collapses concurrent misses into one read
+            self.misses += 1
+            data = self.loader(self.path)
+            inode, mtime_ns, size = signature
+            etag = f"{inode:x}-{mtime_ns:x}-{size:x}"
+            self.entry = (data, app.json.dumps(data), etag, mtime_ns / 1e9)
+            self.signature = signature
+            return self.entry
+    
+    def get(self):
+        """Return (data, body), or (None, None) when the file does not exist"""
+        entry = self.get_entry()
+        if entry is None:
+            return None, None
+        return entry[0], entry[1]
+    
+    def stats(self):
+        """Return hit/miss counters"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class AlertTail:
+    """Newest alerts from alerts.jsonl, kept in a deque and refreshed when the file grows
+    
+    Appends are read incrementally from the last offset; a rewrite by
+    alert_system.sh (new inode or smaller file) reloads the tail by reading
+    the file backwards, so cost follows the number of alerts kept.
+    """
+    
+    def __init__(self, path, size=200, recent=50):
+        self.path = Path(path)
+        self.recent = recent
+        self.lock = threading.Lock()
+        self.alerts = deque(maxlen=size)  # (line offset, alert), oldest first
+        self.signature = None
+        self.offset = 0  # end of the last complete line read
+        self.entry = None
+        self.hits = 0
+        self.misses = 0
+    
+    def _refresh(self):
+        signature = file_signature(self.path)
+        if signature is None:
+            self.alerts.clear()
+            self.signature = self.entry = None
+            return False
+        if signature == self.signature:
+            self.hits += 1
+            return True
+        
+        self.misses += 1
+        inode, mtime_ns, size = signature
+        with open(self.path, 'rb') as f:
+            if self.signature is not None and inode == self.signature[0] and size >= self.offset:
+                # File grew: parse only the appended lines
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+                complete = data.rfind(b'\n') + 1
+                offset = self.offset
+                for line in data[:complete].split(b'\n')[:-1]:
+                    alert = parse_alert(line)
+                    if alert is not None:
+                        self.alerts.append((offset, alert))
+                    offset += len(line) + 1
+                self.offset += complete
+            else:
+                # New or rewritten file: reload the newest alerts from the end
+                self.alerts.clear()
+                self.offset = size
+                f.seek(max(size - 1, 0))
+                complete = f.read(1) in (b'\n', b'')
+                newest = []
+                for offset, line in read_lines_reversed(f, size):
+                    if not complete and offset + len(line) == size:
+                        # Partial last line: the writer is mid-append
+                        self.offset = offset
+                        continue
+                    alert = parse_alert(line)
+                    if alert is not None:
+                        newest.append((offset, alert))
+                        if len(newest) == self.alerts.maxlen:
+                            break
+                self.alerts.extend(reversed(newest))
+        
+        self.signature = signature
+        recent = [alert for _, alert in reversed(self.alerts)][:self.recent]
+        self.entry = (recent, app.json.dumps(recent), f"{inode:x}-{mtime_ns:x}-{size:x}", mtime_ns / 1e9)
+        return True
+    
+    def get_entry(self):
+        """Return (newest alerts, body, etag, mtime), or None when there are no alerts"""
+        with self.lock:
+            if not self._refresh():
+                return None
+            return self.entry
+    
+    def get(self):
+        """Return (newest alerts, body), or (None, None) when there are no alerts"""
+        entry = self.get_entry()
+        if entry is None:
+            return None, None
+        return entry[0], entry[1]
+    
+    def _iter_newest_first(self):
+        with self.lock:
+            if not self._refresh():
+                return
+            cached = list(self.alerts)
+            inode = self.signature[0]
+        
+        for _, alert in reversed(cached):
+            yield alert
+        
+        # Page reaches past the cache: keep reading backwards from the file
+        if cached and cached[0][0] > 0:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino != inode:
+                    return
+                for _, line in read_lines_reversed(f, cached[0][0]):
+                    alert = parse_alert(line)
+                    if alert is not None:
+                        yield alert
+    
+    def page(self, limit, before=None, since=None, severities=None):
+        """Return (alerts newest first, cursor for the next page or None)"""
+        before_ts, skip = before if before is not None else (None, 0)
+        alerts = []
+        current_ts = None
+        seen_at_ts = 0
+        
+        for alert in self._iter_newest_first():
+            timestamp = str(alert.get('timestamp', ''))
+            if since is not None and timestamp <= since:
+                break
+            if before_ts is not None and timestamp > before_ts:
+                continue
+            
+            # Count every alert sharing a timestamp so cursors survive ties
+            if timestamp != current_ts:
+                current_ts = timestamp
+                seen_at_ts = 0
+            seen_at_ts += 1
+            if timestamp == before_ts and seen_at_ts <= skip:
+                continue
+            
+            if severities and str(alert.get('severity', '')).upper() not in severities:
+                continue
+            
+            alerts.append(alert)
+            if len(alerts) == limit:
+                return alerts, f"{timestamp}~{seen_at_ts}"
+        
+        return alerts, None
+    
+    def stats(self):
+        """Return hit/miss counters and cache occupancy"""
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.alerts)}
+
+
+class HistoryBuffer:
+    """Bounded ring of recent samples that history requests are served from"""
+    
+    def __init__(self, store, max_age_seconds, max_bytes):
+        self.store = store
+        self.max_age = int(max_age_seconds)
+        self.max_bytes = int(max_bytes)
+        self.lock = threading.Lock()
+        self.samples = deque()  # (timestamp, size in memory, metrics)
+        self.bytes = 0
+        self.covered_from = None  # buffer holds every sample from here on
+        self.last_timestamp = 0
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+    
+    def _refresh(self, now):
+        # New samples are only read when the monitor has written one
+        signature = file_signature(self.store.latest_file)
+        if self.covered_from is None:
+            self.covered_from = now - self.max_age
+            new_samples = self.store.iter_metrics(self.covered_from)
+        elif signature != self.signature:
+            new_samples = self.store.iter_metrics(self.last_timestamp + 1)
+        else:
+            new_samples = ()
+        self.signature = signature
+        
+        for metrics in new_samples:
+            timestamp = metrics.get('timestamp', 0)
+            size = heap_size(metrics)
+            self.samples.append((timestamp, size, metrics))
+            self.bytes += size
+            self.last_timestamp = max(self.last_timestamp, timestamp)
+        
+        # Evict by age, then by memory budget
+        self.covered_from = max(self.covered_from, now - self.max_age)
+        while self.samples and (self.samples[0][0] < self.covered_from or self.bytes > self.max_bytes):
+            timestamp, size, _ = self.samples.popleft()
+            self.bytes -= size
+            self.covered_from = max(self.covered_from, timestamp + 1)
+    
+    def latest_timestamp(self):
+        """Pick up any new samples and return the newest timestamp held"""
+        with self.lock:
+            self._refresh(int(time.time()))
+            return self.last_timestamp
+    
+    def get_range(self, start_ts):
+        """Return samples newer than start_ts, oldest first"""
+        with self.lock:
+            self._refresh(int(time.time()))
+            recent = [metrics for timestamp, _, metrics in self.samples if timestamp >= start_ts]
+            
+            if start_ts >= self.covered_from:
+                self.hits += 1
+                return recent
+            
+            self.misses += 1
+            covered_from = self.covered_from
+        
+        # Older part of the window is outside the buffer; read it from disk
+        return self.store.load_range(start_ts, covered_from - 1) + recent
+    
+    def stats(self):
+        """Return hit/miss counters and buffer occupancy"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'samples': len(self.samples),
+            'bytes': self.bytes,
+            'covered_from': self.covered_from
+        }
+
+
+class ResponseMemo:
+    """Serialized responses keyed by request parameters, valid until a new sample arrives"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.bodies = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, version, key):
+        """Return a memoized body for this data version, or None"""
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.bodies = {}
+            body = self.bodies.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return body
+    
+    def put(self, version, key, body):
+        """Store a body computed for a data version"""
+        with self.lock:
+            if version == self.version:
+                self.bodies[key] = body
+    
+    def stats(self):
+        """Return hit/miss counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.bodies)}
+
+
+def stream_sources():
+    """Event name and snapshot of each stream source, in event id order"""
+    return [('metrics', latest_snapshot), ('alerts', alerts_tail)]
+
+
+def format_event_id(versions):
+    """Join source versions into an event id that every worker derives alike"""
+    return '-'.join(str(version) for version in versions)
+
+
+def parse_event_id(value):
+    """Return the source versions of a Last-Event-ID, or None if it is not one of ours"""
+    try:
+        versions = [int(part) for part in value.split('-')]
+    except (AttributeError, ValueError):
+        return None
+    return versions if len(versions) == len(stream_sources()) else None
+
+
+def source_version(signature):
+    """Version of a source file: its mtime in ns, 0 while it is missing"""
+    return signature[1] if signature else 0
+
+
+def format_event(event, body, event_id=None):
+    """Format a server-sent event; multi-line bodies become several data lines"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in body.splitlines())
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroadcaster:
+    """Fans server-sent events out to any number of subscribers
+    
+    Each event is formatted once into a shared ring; subscribers wait on a
+    condition and replay whatever they have not seen yet, so publishing
+    costs the same no matter how many clients are connected. Ring positions
+    are local to the worker; the ids sent to clients are source versions.
+    """
+    
+    def __init__(self, backlog=64, max_subscribers=STREAM_MAX_CLIENTS):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=backlog)  # (position, formatted event)
+        self.last_id = 0
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.rejected = 0
+        self.published = 0
+        self.watcher = None
+    
+    def acquire(self):
+        """Reserve a subscriber slot; False when the worker has none left"""
+        with self.condition:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return False
+            self.subscribers += 1
+            return True
+    
+    def release(self):
+        """Free a slot taken by acquire()"""
+        with self.condition:
+            self.subscribers -= 1
+    
+    def publish(self, event, body, event_id):
+        """Queue an already serialized JSON body for every subscriber"""
+        with self.condition:
+            self.last_id += 1
+            self.published += 1
+            self.events.append((self.last_id, format_event(event, body, event_id)))
+            self.condition.notify_all()
+    
+    def start_watcher(self):
+        """Start the thread that turns file changes into events (once)"""
+        with self.condition:
+            if self.watcher is None:
+                self.watcher = threading.Thread(target=self._watch, name='event-watcher', daemon=True)
+                self.watcher.start()
+    
+    def _watch(self):
+        sources = stream_sources()
+        signatures = {event: file_signature(snapshot.path) for event, snapshot in sources}
+        watcher = FileWatcher(DATA_DIR, names=[snapshot.path.name for _, snapshot in sources],
+                              poll_interval=STREAM_POLL_SECONDS)
+        
+        while True:
+            # Signatures still decide what changed; the watcher only ends the wait early
+            watcher.wait(STREAM_KEEPALIVE_SECONDS)
+            for event, snapshot in sources:
+                signature = file_signature(snapshot.path)
+                if signature is None or signature == signatures[event]:
+                    continue
+                signatures[event] = signature
+                try:
+                    _, body = snapshot.get()
+                except Exception as e:
+                    print(f"Error reading {snapshot.path}: {e}", file=sys.stderr)
+                    continue
+                if body is not None:
+                    event_id = format_event_id(source_version(signatures[name]) for name, _ in sources)
+                    self.publish(event, body, event_id)
+    
+    def subscribe(self, last_seen):
+        """Yield formatted events for one client, starting after ring position last_seen"""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.last_id > last_seen,
+                                        timeout=STREAM_KEEPALIVE_SECONDS)
+                pending = [(position, message) for position, message in self.events
+                           if position > last_seen]
+            
+            if not pending:
+                yield ': keepalive\n\n'
+                continue
+            
+            for _, message in pending:
+                yield message
+            last_seen = pending[-1][0]
+    
+    def stats(self):
+        """Return subscriber and event counters"""
+        return {'subscribers': self.subscribers, 'max_subscribers': self.max_subscribers,
+                'rejected': self.rejected, 'published': self.published}
+
+
+latest_snapshot = FileSnapshot(store.latest_file)
+summary_snapshot = FileSnapshot(Path(DATA_DIR) / 'latest_summary.json')
+alerts_tail = AlertTail(Path(DATA_DIR) / 'alerts.jsonl', size=ALERTS_CACHE_SIZE)
+history_buffer = HistoryBuffer(store, HISTORY_CACHE_HOURS * 3600, HISTORY_CACHE_MB * 1024 * 1024)
+downsample_memo = ResponseMemo()
+exposition_memo = ResponseMemo()
+forecast_memo = ResponseMemo()
+broadcaster = EventBroadcaster()
+
+compressed_bodies = OrderedDict()
+compressed_lock = threading.Lock()
+
+# Dashboards repeat the same selectors, so compiled projections are shared
+compile_fields = lru_cache(maxsize=128)(FieldProjection)
+
+
+def json_response(body, etag=None, last_modified=None):
+    """Send an already serialized JSON body"""
+    response = Response(body, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def snapshot_response(entry):
+    """Send a snapshot body tagged with its file version"""
+    _, body, etag, mtime = entry
+    return json_response(body, etag=etag, last_modified=mtime)
+
+
+def compress_body(etag, encoding, data):
+    """Compress a body once per (ETag, encoding) and reuse it for later polls"""
+    key = (etag, encoding)
+    with compressed_lock:
+        if key in compressed_bodies:
+            compressed_bodies.move_to_end(key)
+            return compressed_bodies[key]
+    
+    if encoding == 'gzip':
+        body = gzip.compress(data, compresslevel=6)
+    else:
+        body = zlib.compress(data, 6)
+    
+    with compressed_lock:
+        compressed_bodies[key] = body
+        while len(compressed_bodies) > COMPRESS_CACHE_ENTRIES:
+            compressed_bodies.popitem(last=False)
+    return body
+
+
+@app.after_request
+def conditional_and_compress(response):
+    """Answer unchanged polls with 304 and compress large bodies"""
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    
+    # Event streams and NDJSON exports are generators; leave them alone
+    if response.is_streamed and not response.direct_passthrough:
+        return response
+    
+    # Files from send_from_directory are small reports; buffer them
+    response.direct_passthrough = False
+    
+    if response.get_etag()[0] is None:
+        response.add_etag()
+    response.make_conditional(request)
+    if response.status_code != 200:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if response.content_length is None or response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    if response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers:
+        return response
+    
+    if request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    elif request.accept_encodings['deflate']:
+        encoding = 'deflate'
+    else:
+        return response
+    
+    etag, _ = response.get_etag()
+    response.set_data(compress_body(etag, encoding, response.get_data()))
+    response.headers['Content-Encoding'] = encoding
+    # Same resource, different bytes: weak validators still match If-None-Match
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def wants_ndjson():
+    """Whether the client asked for a streamed NDJSON response"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def request_projection():
+    """Compiled ?fields= selector for this request, or None"""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return compile_fields(fields)
+
+
+def stream_history(start_ts, projection=None):
+    """Yield samples one NDJSON line at a time, straight from the segment store"""
+    for metrics in store.iter_metrics(start_ts):
+        if projection is not None:
+            metrics = projection.apply(metrics)
+        yield json.dumps(metrics, separators=(',', ':')) + '\n'
 
 
 @app.route('/api/health')
@@ -30,20 +663,24 @@ def health():
 
 @app.route('/api/metrics/latest')
 def get_latest_metrics():
-    """Get the latest system metrics"""
+    """Get the latest system metrics (optionally pruned with ?fields=)"""
     try:
-        metrics_file = Path(DATA_DIR) / 'latest_metrics.json'
+        projection = request_projection()
+        entry = latest_snapshot.get_entry()
         
-        if not metrics_file.exists():
+        if entry is None:
             return jsonify({
                 'error': 'No metrics available yet',
                 'timestamp': datetime.now().isoformat()
             }), 404
         
-        with open(metrics_file, 'r') as f:
-            metrics = json.load(f)
+        if projection is not None:
+            return jsonify(projection.apply(entry[0]))
         
-        return jsonify(metrics)
+        return snapshot_response(entry)
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     except Exception as e:
         return jsonify({
@@ -54,29 +691,105 @@ def get_latest_metrics():
 
 @app.route('/api/metrics/history/<int:hours>')
 def get_metrics_history(hours):
-    """Get metrics history for the last N hours"""
+    """Get metrics history for the last N hours
+    
+    Optional downsampling: ?points=N or ?resolution=<seconds> returns
+    min/avg/max/last buckets, read from the coarsest rollup tier that fits
+    when no ?fields= projection is given; ?method=lttb&points=N&series=<path> keeps the N
+    samples that best preserve the shape of one series.
+    
+    Raw history can be streamed as NDJSON with ?stream=1 or
+    Accept: application/x-ndjson. ?fields= prunes every sample.
+    """
     try:
-        data_dir = Path(DATA_DIR)
+        points = request.args.get('points', type=int)
+        resolution = request.args.get('resolution', type=int)
+        method = request.args.get('method', 'buckets')
+        series = request.args.get('series', DEFAULT_LTTB_SERIES)
+        projection = request_projection()
         cutoff_timestamp = int(datetime.now().timestamp()) - (hours * 3600)
         
-        metrics_files = sorted(data_dir.glob('metrics_*.json'))
-        history = []
+        if points is None and resolution is None and 'method' not in request.args:
+            if wants_ndjson():
+                return Response(stream_history(cutoff_timestamp, projection),
+                                mimetype='application/x-ndjson')
+            
+            history = history_buffer.get_range(cutoff_timestamp)
+            if projection is not None:
+                history = [projection.apply(metrics) for metrics in history]
+            
+            return jsonify({
+                'hours': hours,
+                'count': len(history),
+                'metrics': history
+            })
         
-        for filepath in metrics_files:
-            try:
-                timestamp = int(filepath.stem.split('_')[1])
-                if timestamp >= cutoff_timestamp:
-                    with open(filepath, 'r') as f:
-                        metrics = json.load(f)
-                        history.append(metrics)
-            except (ValueError, IndexError, json.JSONDecodeError):
-                continue
+        if method not in ('buckets', 'lttb'):
+            return jsonify({'error': f"Unknown method: {method}"}), 400
+        if (points is not None and points <= 0) or (resolution is not None and resolution <= 0):
+            return jsonify({'error': 'points and resolution must be positive'}), 400
+        if method == 'lttb':
+            if points is None:
+                return jsonify({'error': 'method=lttb requires points'}), 400
+            parse_path(series)
         
-        return jsonify({
+        key = (hours, method, points, resolution,
+               series if method == 'lttb' else None,
+               projection.selector if projection is not None else None)
+        version = history_buffer.latest_timestamp()
+        body = downsample_memo.get(version, key)
+        if body is not None:
+            return json_response(body)
+        
+        source = 'raw'
+        if method == 'lttb':
+            history = history_buffer.get_range(cutoff_timestamp)
+            # Select on the full samples so the driving series is always present
+            metrics = lttb(history, points, series)
+            if projection is not None:
+                metrics = [projection.apply(sample) for sample in metrics]
+        else:
+            if resolution is None:
+                # Buckets are epoch-aligned, so leave room for a partial one at each end
+                resolution = max(1, -(-(hours * 3600) // max(points - 1, 1)))
+            
+            # Serve from the coarsest rollup tier that is still finer than the buckets asked for
+            rollups = Aggregator(DATA_DIR)
+            level = None
+            if projection is None and rollups.state_file.exists():
+                level = rollups.select_tier(cutoff_timestamp, resolution)
+            
+            if level is not None:
+                rollups.load_state()
+                metrics = rollups.history(cutoff_timestamp, resolution, level)
+                source = rollups.tiers[level][1]
+                source_count = sum(bucket['count'] for bucket in metrics)
+            else:
+                history = history_buffer.get_range(cutoff_timestamp)
+                if projection is not None:
+                    history = [projection.apply(sample) for sample in history]
+                metrics = bucket_aggregate(history, resolution)
+        
+        if source == 'raw':
+            source_count = len(history)
+        
+        body = app.json.dumps({
             'hours': hours,
-            'count': len(history),
-            'metrics': history
+            'method': method,
+            'resolution': resolution,
+            'points': points,
+            'series': series if method == 'lttb' else None,
+            'source': source,
+            'source_count': source_count,
+            'count': len(metrics),
+            'metrics': metrics
         })
+        downsample_memo.put(version, key, body)
+        
+        return json_response(body)
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     except Exception as e:
         return jsonify({
@@ -85,26 +798,88 @@ def get_metrics_history(hours):
         }), 500
 
 
+@app.route('/api/stream')
+def stream_events():
+    """Push new metrics and alerts to the client as server-sent events"""
+    broadcaster.start_watcher()
+    if not broadcaster.acquire():
+        response = jsonify({'error': 'Too many stream clients', 'timestamp': datetime.now().isoformat()})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_SECONDS)
+        return response
+    
+    # Ids are source versions, so a client may resume against any worker
+    seen = parse_event_id(request.headers.get('Last-Event-ID'))
+    start = broadcaster.last_id
+    
+    def generate():
+        # Send the current state of every source the client has not seen;
+        # fresh connections and unknown ids get all of them
+        sources = stream_sources()
+        versions = [source_version(file_signature(snapshot.path)) for _, snapshot in sources]
+        event_id = format_event_id(versions)
+        for index, (event, snapshot) in enumerate(sources):
+            if seen is not None and seen[index] == versions[index]:
+                continue
+            _, body = snapshot.get()
+            if body is not None:
+                yield format_event(event, body, event_id)
+        yield from broadcaster.subscribe(start)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(broadcaster.release)
+    return response
+
+
 @app.route('/api/alerts/recent')
 def get_recent_alerts():
-    """Get recent alerts"""
+    """Get the 50 most recent alerts, newest first"""
     try:
-        alerts_file = Path(DATA_DIR) / 'alerts.jsonl'
+        entry = alerts_tail.get_entry()
         
-        if not alerts_file.exists():
+        if entry is None:
             return jsonify([])
         
-        alerts = []
-        with open(alerts_file, 'r') as f:
-            for line in f:
-                try:
-                    alert = json.loads(line.strip())
-                    alerts.append(alert)
-                except json.JSONDecodeError:
-                    continue
+        return snapshot_response(entry)
+    
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@app.route('/api/alerts')
+def get_alerts():
+    """Get a page of alerts, newest first
+    
+    ?limit=N (default 50), ?before=<cursor> for older pages (use the
+    returned next_before), ?since=<timestamp> for alerts newer than a
+    timestamp, ?severity=WARNING,CRITICAL to filter.
+    """
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        if limit <= 0 or limit > ALERTS_PAGE_LIMIT:
+            return jsonify({'error': f"limit must be between 1 and {ALERTS_PAGE_LIMIT}"}), 400
+        
+        before = request.args.get('before')
+        since = request.args.get('since')
+        severity = request.args.get('severity')
         
-        # Return last 50 alerts, newest first
-        return jsonify(alerts[-50:][::-1])
+        alerts, next_before = alerts_tail.page(
+            limit,
+            before=parse_alert_cursor(before) if before else None,
+            since=parse_alert_cursor(since)[0] if since else None,
+            severities={s.strip().upper() for s in severity.split(',')} if severity else None
+        )
+        
+        return jsonify({
+            'count': len(alerts),
+            'alerts': alerts,
+            'next_before': next_before
+        })
     
     except Exception as e:
         return jsonify({
@@ -117,18 +892,49 @@ def get_recent_alerts():
 def get_summary():
     """Get summary statistics"""
     try:
-        summary_file = Path(DATA_DIR) / 'latest_summary.json'
+        entry = summary_snapshot.get_entry()
         
-        if not summary_file.exists():
+        if entry is None:
             return jsonify({
                 'error': 'No summary available yet',
                 'timestamp': datetime.now().isoformat()
             }), 404
         
-        with open(summary_file, 'r') as f:
-            summary = json.load(f)
+        return snapshot_response(entry)
+    
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@app.route('/api/forecast')
+def get_forecast():
+    """Get disk, memory and swap trends with time-to-threshold estimates
+    
+    ?hours= sets the fit window in whole hours (default FORECAST_HOURS),
+    capped at the retention of the hourly rollup tier. Estimates are
+    refitted when an hourly rollup bucket closes and at most once a minute.
+    """
+    try:
+        hours = request.args.get('hours', FORECAST_HOURS, type=float)
+        if not math.isfinite(hours) or hours <= 0:
+            return jsonify({'error': 'hours must be a positive number'}), 400
+        
+        # Whole hours bound the number of distinct fits a client can ask for
+        forecaster = Forecaster(DATA_DIR, max(1, round(hours)) if hours != FORECAST_HOURS else hours)
+        hours = forecaster.hours
+        version = (file_signature(forecaster.aggregator.tier_file(forecaster.level)),
+                   int(time.time() // 60))
+        body = forecast_memo.get(version, hours)
+        if body is None:
+            forecast = forecaster.refresh()
+            forecast['timestamp'] = datetime.now().isoformat()
+            body = app.json.dumps(forecast)
+            forecast_memo.put(version, hours, body)
         
-        return jsonify(summary)
+        return json_response(body)
     
     except Exception as e:
         return jsonify({
@@ -184,16 +990,13 @@ def list_reports():
 def get_system_info():
     """Get system information"""
     try:
-        metrics_file = Path(DATA_DIR) / 'latest_metrics.json'
+        metrics, _ = latest_snapshot.get()
         
-        if not metrics_file.exists():
+        if metrics is None:
             return jsonify({
                 'error': 'No system info available yet'
             }), 404
         
-        with open(metrics_file, 'r') as f:
-            metrics = json.load(f)
-        
         return jsonify(metrics.get('system', {}))
     
     except Exception as e:
@@ -202,6 +1005,46 @@ def get_system_info():
         }), 500
 
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latest sample in Prometheus text exposition format"""
+    try:
+        entry = latest_snapshot.get_entry()
+        if entry is None:
+            return Response('# No metrics available yet\n', status=503,
+                            content_type=exposition.CONTENT_TYPE)
+        
+        # Rendered once per sample, however many scrapers ask for it
+        data, _, etag, mtime = entry
+        body = exposition_memo.get(etag, 'metrics')
+        if body is None:
+            body = exposition.render(data)
+            exposition_memo.put(etag, 'metrics', body)
+        
+        response = Response(body, content_type=exposition.CONTENT_TYPE)
+        response.set_etag(etag)
+        response.last_modified = mtime
+        return response
+    
+    except Exception as e:
+        return Response(f"# Error: {e}\n", status=500, content_type=exposition.CONTENT_TYPE)
+
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Get hit/miss counters for the in-process caches"""
+    return jsonify({
+        'latest': latest_snapshot.stats(),
+        'summary': summary_snapshot.stats(),
+        'alerts': alerts_tail.stats(),
+        'history': history_buffer.stats(),
+        'downsample': downsample_memo.stats(),
+        'exposition': exposition_memo.stats(),
+        'forecast': forecast_memo.stats(),
+        'stream': broadcaster.stats()
+    })
+
+
 if __name__ == '__main__':
     # Ensure data directory exists
     Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
@@ -215,4 +1058,5 @@ if __name__ == '__main__':
     print(f"Data directory: {DATA_DIR}")
     print(f"Reports directory: {REPORTS_DIR}")
     
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    # Development server; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+InfluxDB Writer Benchmark
+Points per second for per-point writes versus batched writes, against a
+local stub server
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_polling import make_sample
+from influx_stub import InfluxStub
+
+
+def make_writer(url):
+    os.environ['INFLUXDB_URL'] = url
+    os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='taskmania-influx-'))
+    from influxdb_writer import InfluxDBWriter
+    return InfluxDBWriter()
+
+
+def per_point(writer, samples):
+    """Original path: one POST per point"""
+    from influxdb_writer import sample_points
+    for metrics in samples:
+        for measurement, tags, fields, timestamp in sample_points(metrics):
+            writer.write_metric(measurement, tags, fields, timestamp)
+
+
+def batched(writer, samples):
+    """Batched path: points from many samples share one POST"""
+    for metrics in samples:
+        writer.add_sample(metrics)
+    writer.flush()
+
+
+def run(sample_count):
+    """Time both paths and return their throughput"""
+    start_ts = int(time.time()) - sample_count * 5
+    samples = [make_sample(start_ts + i * 5) for i in range(sample_count)]
+
+    results = {}
+    for name, method in (('per_point', per_point), ('batched', batched)):
+        stub = InfluxStub()
+        writer = make_writer(stub.start())
+        started = time.perf_counter()
+        method(writer, samples)
+        elapsed = time.perf_counter() - started
+        stub.stop()
+        results[name] = {
+            'points': stub.points,
+            'requests': stub.requests,
+            'connections': stub.connections,
+            'seconds': elapsed,
+            'points_per_second': stub.points / elapsed if elapsed else 0
+        }
+    return results
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark InfluxDB writer throughput')
+    parser.add_argument('--samples', type=int, default=500,
+                       help='Number of synthetic samples to write (default: 500)')
+    parser.add_argument('--json', action='store_true',
+                       help='Print machine-readable results')
+
+    args = parser.parse_args()
+    results = run(args.samples)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'path':<12}{'points':>10}{'requests':>10}{'conns':>8}{'seconds':>10}{'points/s':>12}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['points']:>10}{r['requests']:>10}{r['connections']:>8}"
+              f"{r['seconds']:>10.2f}{r['points_per_second']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
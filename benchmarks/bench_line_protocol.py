@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Line Protocol Benchmark
+Encoding cost of the original f-string lines versus the cached LineEncoder
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_polling import make_sample
+from line_protocol import LineEncoder
+
+
+def fstring_lines(points):
+    """Original encoding: join tags and fields for every point, no escaping or typing"""
+    lines = []
+    for measurement, tags, fields, timestamp in points:
+        tag_str = ','.join([f"{k}={v}" for k, v in tags.items()])
+        field_str = ','.join([f"{k}={v}" for k, v in fields.items()])
+        lines.append(f"{measurement},{tag_str} {field_str} {timestamp}")
+    return '\n'.join(lines).encode('utf-8')
+
+
+def encoder_lines(points, encoder):
+    """LineEncoder: cached prefixes, schema typing, one reusable buffer"""
+    encoder.clear()
+    encoder.extend(points)
+    return encoder.getvalue()
+
+
+def run(sample_count, rounds):
+    """Encode the same points repeatedly with both encoders"""
+    from influxdb_writer import sample_points
+
+    start_ts = int(time.time()) - sample_count * 5
+    points = [point for i in range(sample_count)
+              for point in sample_points(make_sample(start_ts + i * 5))]
+
+    encoder = LineEncoder()
+    results = {}
+    for name, encode in (('fstring', fstring_lines),
+                         ('encoder', lambda p: encoder_lines(p, encoder))):
+        best = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            body = encode(points)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {
+            'points': len(points),
+            'bytes': len(body),
+            'seconds': best,
+            'points_per_second': len(points) / best if best else 0
+        }
+    return results
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark line-protocol encoding')
+    parser.add_argument('--samples', type=int, default=2000,
+                       help='Number of synthetic samples to encode (default: 2000)')
+    parser.add_argument('--rounds', type=int, default=5,
+                       help='Repetitions; the best round is reported (default: 5)')
+    parser.add_argument('--json', action='store_true',
+                       help='Print machine-readable results')
+
+    args = parser.parse_args()
+    results = run(args.samples, args.rounds)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'encoder':<10}{'points':>10}{'bytes':>12}{'seconds':>10}{'points/s':>12}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['points']:>10}{r['bytes']:>12}{r['seconds']:>10.3f}"
+              f"{r['points_per_second']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Polling Benchmark
+Bytes on the wire for the dashboard's polling pattern, with and without
+conditional GET and compression
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+POLLED_ENDPOINTS = ['/api/metrics/latest', '/api/alerts/recent', '/api/summary']
+
+SCENARIOS = {
+    'baseline': {'conditional': False, 'encoding': None},
+    'conditional': {'conditional': True, 'encoding': None},
+    'gzip': {'conditional': False, 'encoding': 'gzip'},
+    'conditional+gzip': {'conditional': True, 'encoding': 'gzip'},
+}
+
+
+def make_sample(timestamp):
+    """Build a sample shaped like system_monitor.sh output"""
+    return {
+        'timestamp': timestamp,
+        'datetime': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)),
+        'system': {'hostname': 'bench-host', 'os_name': 'Linux', 'os_version': '6',
+                   'kernel': '6.1.0', 'architecture': 'x86_64',
+                   'uptime_seconds': 1000 + timestamp % 100000, 'process_count': 200},
+        'cpu': {'load_1min': round(random.uniform(0, 4), 2), 'load_5min': 1.2,
+                'load_15min': 1.1, 'core_count': 8, 'model': 'Bench CPU',
+                'temperature_celsius': round(random.uniform(35, 70), 1)},
+        'memory': {'total_kb': 16384000, 'available_kb': random.randint(4000000, 12000000),
+                   'swap_total_kb': 2048000, 'swap_used_kb': random.randint(0, 100000)},
+        'disk': {
+            'filesystems': [{'device': f"/dev/sd{d}", 'mount_point': m, 'total_kb': 100000000,
+                             'used_kb': 50000000, 'available_kb': 50000000, 'use_percent': 50}
+                            for d, m in (('a', '/'), ('b', '/var'), ('c', '/home'))],
+            'io_stats': [{'device': 'sda', 'reads': timestamp, 'writes': timestamp}]
+        },
+        'network': {'interfaces': [{'interface': name, 'status': 'up',
+                                    'rx_bytes': timestamp * 1000, 'tx_bytes': timestamp * 500,
+                                    'rx_packets': timestamp, 'tx_packets': timestamp,
+                                    'rx_errors': 0, 'tx_errors': 0}
+                                   for name in ('eth0', 'eth1')]},
+        'gpu': {'devices': []},
+        'collection_status': 'success'
+    }
+
+
+def run(polls, sample_every, alert_every):
+    """Replay the polling pattern once per scenario and count bytes"""
+    data_dir = Path(tempfile.mkdtemp(prefix='taskmania-bench-'))
+    os.environ['DATA_DIR'] = str(data_dir)
+    os.environ['REPORTS_DIR'] = str(data_dir / 'reports')
+
+    import api_server
+    from metrics_store import MetricsStore
+
+    store = MetricsStore(data_dir)
+    with open(data_dir / 'latest_summary.json', 'w') as f:
+        json.dump({'cpu': {'load_1min_avg': 1.0}, 'samples_count': 720}, f, indent=2)
+
+    # api_server reads DATA_DIR once, so every scenario shares the store; one
+    # timestamp keeps advancing across them, as appends must be in order
+    timestamp = int(time.time())
+    results = {}
+    for name, options in SCENARIOS.items():
+        client = api_server.app.test_client()
+        etags = {}
+        wire_bytes = 0
+        not_modified = 0
+
+        for poll in range(polls):
+            if poll % sample_every == 0:
+                timestamp += 5
+                sample = make_sample(timestamp)
+                store.append(sample)
+                store.write_latest(json.dumps(sample, indent=2))
+                # Keep mtime moving even on filesystems with coarse timestamps
+                os.utime(store.latest_file, ns=(timestamp * 10**9, timestamp * 10**9))
+            if poll % alert_every == 0:
+                with open(data_dir / 'alerts.jsonl', 'a') as f:
+                    f.write(json.dumps({'timestamp': timestamp, 'severity': 'WARNING',
+                                        'title': 'High CPU', 'message': 'load above threshold'}) + '\n')
+
+            for endpoint in POLLED_ENDPOINTS:
+                headers = {}
+                if options['encoding']:
+                    headers['Accept-Encoding'] = options['encoding']
+                if options['conditional'] and endpoint in etags:
+                    headers['If-None-Match'] = etags[endpoint]
+
+                response = client.get(endpoint, headers=headers)
+                if response.status_code == 304:
+                    not_modified += 1
+                elif 'ETag' in response.headers:
+                    etags[endpoint] = response.headers['ETag']
+
+                header_bytes = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+                wire_bytes += header_bytes + len(response.get_data())
+
+        results[name] = {'requests': polls * len(POLLED_ENDPOINTS),
+                         'bytes': wire_bytes, 'not_modified': not_modified}
+
+    return results
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure bytes on the wire for dashboard polling')
+    parser.add_argument('--polls', type=int, default=720,
+                       help='Number of 5 s polling rounds per scenario (default: 720, one hour)')
+    parser.add_argument('--sample-every', type=int, default=1,
+                       help='New sample every N polls (default: 1)')
+    parser.add_argument('--alert-every', type=int, default=60,
+                       help='New alert every N polls (default: 60)')
+    parser.add_argument('--json', action='store_true',
+                       help='Print machine-readable results')
+
+    args = parser.parse_args()
+
+    results = run(args.polls, args.sample_every, args.alert_every)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    baseline = results['baseline']['bytes']
+    print(f"{'scenario':<20}{'requests':>10}{'304s':>8}{'bytes':>14}{'vs baseline':>14}")
+    for name, result in results.items():
+        ratio = result['bytes'] / baseline if baseline else 0
+        print(f"{name:<20}{result['requests']:>10}{result['not_modified']:>8}"
+              f"{result['bytes']:>14}{ratio:>13.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+End-to-End Benchmark Suite
+Times summaries, reports, API endpoints and the InfluxDB writer on a
+synthetic data dir, with machine-readable results to compare between versions
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate_data import generate, iter_samples
+from influx_stub import InfluxStub
+from load_test import percentile
+
+
+def measure(function, rounds):
+    """Run function `rounds` times and return the best and mean wall time"""
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return {'seconds': min(times), 'mean_seconds': sum(times) / len(times), 'rounds': rounds}
+
+
+def git_version():
+    """Describe the checked-out revision, or None outside a git work tree"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_processor(summary_hours, report_hours, rounds):
+    """Time generate_summary per window and generate_html_report with a cold and a warm cache"""
+    from data_processor import MetricsProcessor
+
+    processor = MetricsProcessor()
+    results = {}
+    for hours in summary_hours:
+        result = measure(lambda: processor.generate_summary(hours), rounds)
+        result['samples'] = processor.generate_summary(hours).get('samples_count', 0)
+        results[f"summary_{hours}h"] = result
+
+    cache_file = processor.reports_dir / f".report_cache_{report_hours}h.json"
+
+    def cold_report():
+        cache_file.unlink(missing_ok=True)
+        processor.generate_html_report(report_hours)
+
+    results[f"report_{report_hours}h_cold"] = measure(cold_report, rounds)
+    results[f"report_{report_hours}h_warm"] = measure(
+        lambda: processor.generate_html_report(report_hours), rounds)
+    return results
+
+
+def bench_api(history_hours, requests):
+    """Time API endpoints in-process: the first (cold) request, then p50/p99 of the rest"""
+    import api_server
+
+    client = api_server.app.test_client()
+    endpoints = [
+        ('api_latest', '/api/metrics/latest'),
+        ('api_history_1h', '/api/metrics/history/1'),
+        (f"api_history_{history_hours}h_buckets", f"/api/metrics/history/{history_hours}?points=300"),
+        ('api_alerts_recent', '/api/alerts/recent'),
+        ('api_alerts_page', '/api/alerts?limit=100&severity=WARNING,CRITICAL'),
+    ]
+
+    results = {}
+    for name, path in endpoints:
+        latencies = []
+        size = 0
+        for _ in range(requests + 1):
+            started = time.perf_counter()
+            response = client.get(path)
+            body = response.get_data()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+            size = len(body)
+        cold, warm = latencies[0], latencies[1:]
+        results[name] = {
+            'seconds': percentile(warm, 0.50),
+            'p99_seconds': percentile(warm, 0.99),
+            'cold_seconds': cold,
+            'requests': len(warm),
+            'bytes': size
+        }
+    return results
+
+
+def bench_influx(samples, interval, hosts, interfaces, mounts, gpus, seed):
+    """Time InfluxDBWriter.process_metrics_file over legacy sample files against a local stub"""
+    files_dir = Path(tempfile.mkdtemp(prefix='taskmania-suite-files-'))
+    paths = []
+    for metrics in iter_samples(samples * interval / hosts / 86400, interval, hosts,
+                                interfaces, mounts, gpus, seed):
+        path = files_dir / f"metrics_{metrics['timestamp']}.json"
+        with open(path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        paths.append(path)
+
+    stub = InfluxStub()
+    os.environ['INFLUXDB_URL'] = stub.start()
+    # Keep the writer's spool and progress marker out of the benchmarked data dir
+    os.environ['DATA_DIR'] = str(files_dir)
+    from influxdb_writer import InfluxDBWriter
+
+    writer = InfluxDBWriter()
+    started = time.perf_counter()
+    written = sum(1 for path in paths if writer.process_metrics_file(path))
+    elapsed = time.perf_counter() - started
+    stub.stop()
+
+    return {'influx_process_metrics_file': {
+        'seconds': elapsed,
+        'samples': len(paths),
+        'written': written,
+        'points': stub.points,
+        'requests': stub.requests,
+        'samples_per_second': len(paths) / elapsed if elapsed else 0
+    }}
+
+
+def bench_forecast(points, mounts, rounds, budget):
+    """Time Forecaster.forecast over a year of hourly points per series, against a time budget"""
+    import random
+    from forecast import Forecaster, DISK_PREFIX, MEMORY_KEY, SWAP_KEY
+
+    forecaster = Forecaster(tempfile.mkdtemp(prefix='taskmania-suite-forecast-'))
+    rng = random.Random(0)
+    now = int(time.time())
+    keys = [f"{DISK_PREFIX}/mnt/{index}" for index in range(mounts)] + [MEMORY_KEY, SWAP_KEY]
+    forecaster.points = {
+        key: [[now - (points - i) * 3600, 40 + 0.002 * i + rng.gauss(0, 0.5)] for i in range(points)]
+        for key in keys
+    }
+
+    result = measure(lambda: forecaster.forecast(now), rounds)
+    result.update({'points': points, 'series': len(keys), 'budget_seconds': budget,
+                   'over_budget': result['seconds'] > budget})
+    return {'forecast_fit': result}
+
+
+def run(args):
+    """Build or reuse a data dir, then run every benchmark against it"""
+    if args.data_dir:
+        data_dir = Path(args.data_dir)
+        generated = None
+    else:
+        data_dir = Path(tempfile.mkdtemp(prefix='taskmania-suite-'))
+        generated = generate(data_dir, args.days, args.interval, args.hosts, args.interfaces,
+                             args.mounts, args.gpus, args.seed)
+
+    # The modules read their directories at import time
+    os.environ['DATA_DIR'] = str(data_dir)
+    os.environ['REPORTS_DIR'] = str(data_dir / 'reports')
+    os.environ['LOG_DIR'] = str(data_dir / 'logs')
+
+    results = {}
+    results.update(bench_processor(args.summary_hours, args.report_hours, args.rounds))
+    results.update(bench_api(max(args.summary_hours), args.requests))
+    results.update(bench_influx(args.influx_samples, args.interval, args.hosts, args.interfaces,
+                                args.mounts, args.gpus, args.seed))
+    results.update(bench_forecast(args.forecast_points, args.mounts, args.rounds, args.forecast_budget))
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+
+    return {
+        'meta': {
+            'version': git_version(),
+            'timestamp': int(time.time()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': getattr(numpy, '__version__', None),
+            'orjson': getattr(orjson, '__version__', None),
+            'data_dir': str(data_dir),
+            'generated': generated,
+            'parameters': {key: value for key, value in vars(args).items()
+                           if key not in ('json', 'output', 'compare')}
+        },
+        'results': results
+    }
+
+
+def compare(results, baseline):
+    """Return (name, baseline seconds, current seconds, speedup) for benchmarks in both runs"""
+    rows = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        speedup = previous['seconds'] / current['seconds'] if current['seconds'] else 0
+        rows.append((name, previous['seconds'], current['seconds'], speedup))
+    return rows
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the end-to-end benchmark suite')
+    parser.add_argument('--data-dir', help='Benchmark an existing data dir instead of generating one')
+    parser.add_argument('--days', type=float, default=1,
+                       help='Days of synthetic samples (default: 1)')
+    parser.add_argument('--interval', type=int, default=5,
+                       help='Seconds between samples of one host (default: 5)')
+    parser.add_argument('--hosts', type=int, default=1,
+                       help='Number of monitored hosts (default: 1)')
+    parser.add_argument('--interfaces', type=int, default=2,
+                       help='Network interfaces per host (default: 2)')
+    parser.add_argument('--mounts', type=int, default=3,
+                       help='Mounted filesystems per host (default: 3)')
+    parser.add_argument('--gpus', type=int, default=0,
+                       help='GPUs per host (default: 0)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed of the synthetic data (default: 0)')
+    parser.add_argument('--summary-hours', type=lambda value: [int(h) for h in value.split(',')],
+                       default=[1, 24], help='Comma-separated summary windows (default: 1,24)')
+    parser.add_argument('--report-hours', type=int, default=24,
+                       help='Report window (default: 24)')
+    parser.add_argument('--rounds', type=int, default=3,
+                       help='Repetitions of processor benchmarks; the best is reported (default: 3)')
+    parser.add_argument('--requests', type=int, default=50,
+                       help='Requests per API endpoint after the first (default: 50)')
+    parser.add_argument('--influx-samples', type=int, default=200,
+                       help='Sample files written through the InfluxDB writer (default: 200)')
+    parser.add_argument('--forecast-points', type=int, default=24 * 365,
+                       help='Hourly points per forecast series (default: 8760)')
+    parser.add_argument('--forecast-budget', type=float, default=1.0,
+                       help='Seconds the forecast fit may take before the run fails (default: 1.0)')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare against')
+    parser.add_argument('--json', action='store_true',
+                       help='Print machine-readable results')
+
+    args = parser.parse_args()
+    try:
+        results = run(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    over_budget = [name for name, r in results['results'].items() if r.get('over_budget')]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        if over_budget:
+            sys.exit(1)
+        return
+
+    generated = results['meta']['generated']
+    if generated:
+        print(f"Data: {generated['samples']} samples, {generated['bytes'] / 1024 / 1024:.1f} MB "
+              f"(generated in {generated['seconds']:.1f}s)")
+    print(f"{'benchmark':<32}{'seconds':>12}{'detail':>40}")
+    for name, r in results['results'].items():
+        if 'p99_seconds' in r:
+            detail = f"p99 {r['p99_seconds'] * 1000:.2f} ms, cold {r['cold_seconds'] * 1000:.1f} ms"
+        elif 'samples_per_second' in r:
+            detail = f"{r['samples_per_second']:.0f} samples/s, {r['requests']} requests"
+        else:
+            detail = f"mean {r['mean_seconds']:.4f}s over {r['rounds']} rounds"
+        print(f"{name:<32}{r['seconds']:>12.4f}{detail:>40}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print(f"\nAgainst {baseline.get('meta', {}).get('version') or args.compare}:")
+        print(f"{'benchmark':<32}{'before':>12}{'after':>12}{'speedup':>10}")
+        for name, before, after, speedup in compare(results, baseline):
+            print(f"{name:<32}{before:>12.4f}{after:>12.4f}{speedup:>9.2f}x")
+
+    for name in over_budget:
+        r = results['results'][name]
+        print(f"\n{name} took {r['seconds']:.3f}s, over its {r['budget_seconds']:g}s budget",
+              file=sys.stderr)
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator
+Realistic system_monitor.sh sample streams for benchmarks and scale testing
+"""
+
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+from aggregator import Aggregator
+from metrics_store import MetricsStore
+
+MOUNT_POINTS = ['/', '/var', '/home', '/data', '/srv', '/opt', '/tmp', '/backup']
+INTERFACE_NAMES = ['eth0', 'eth1', 'wlan0', 'docker0', 'br0', 'bond0', 'ens3', 'ens4']
+# Same defaults as config/alert_config.conf
+ALERT_THRESHOLDS = {'memory': 85, 'disk': 90, 'swap': 70}
+ALERT_COOLDOWN = 300
+LAYOUTS = ('segments', 'files')
+
+
+def diurnal(timestamp, peak_hour=14):
+    """Daily cycle between 0 (night) and 1 (peak hour), in UTC"""
+    hour = (timestamp % 86400) / 3600
+    return (1 + math.cos((hour - peak_hour) / 24 * 2 * math.pi)) / 2
+
+
+class SyntheticHost:
+    """One monitored host whose metrics evolve between samples
+
+    Load and network traffic follow a daily cycle with noise, memory
+    mean-reverts around a per-host level, swap creeps up, disks fill at
+    their own rate with occasional cleanups and counters only grow.
+    """
+
+    def __init__(self, index, interfaces=2, mounts=3, gpus=0, rng=None):
+        self.rng = rng or random.Random(index)
+        self.hostname = f"bench-host-{index:02d}"
+        self.cores = self.rng.choice([4, 8, 16, 32])
+        self.memory_total_kb = self.rng.choice([8, 16, 32, 64]) * 1024 * 1024
+        self.memory_level = self.rng.uniform(0.35, 0.7)
+        self.memory_used = self.memory_level
+        self.swap_total_kb = self.memory_total_kb // 4
+        self.swap_used = self.rng.uniform(0, 0.1)
+        self.boot_time = None
+
+        self.mounts = []
+        for i in range(mounts):
+            name = MOUNT_POINTS[i] if i < len(MOUNT_POINTS) else f"/mnt/disk{i}"
+            self.mounts.append({
+                'device': f"/dev/sd{chr(ord('a') + i % 26)}{i // 26 + 1}",
+                'mount_point': name,
+                'total_kb': self.rng.choice([50, 100, 250, 500, 1000]) * 1024 * 1024,
+                'used': self.rng.uniform(0.2, 0.6),
+                # Fraction of the disk filled per day
+                'growth': self.rng.uniform(0, 0.02)
+            })
+
+        self.interfaces = []
+        for i in range(interfaces):
+            self.interfaces.append({
+                'interface': INTERFACE_NAMES[i] if i < len(INTERFACE_NAMES) else f"eth{i}",
+                # Peak bytes per second
+                'rate': self.rng.uniform(1e5, 5e7),
+                'rx_bytes': 0, 'tx_bytes': 0, 'rx_packets': 0, 'tx_packets': 0,
+                'rx_errors': 0, 'tx_errors': 0
+            })
+
+        self.gpus = [{'id': i, 'name': 'Synthetic GPU', 'vendor': 'NVIDIA',
+                      'memory_total_mb': self.rng.choice([8192, 16384, 24576, 81920]),
+                      'power_limit_watts': self.rng.choice([150, 250, 350])}
+                     for i in range(gpus)]
+        self.io = [0, 0]
+        self.last_timestamp = None
+
+    def sample(self, timestamp):
+        """Advance to timestamp and return a sample shaped like system_monitor.sh output"""
+        rng = self.rng
+        elapsed = 0 if self.last_timestamp is None else timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+        if self.boot_time is None:
+            self.boot_time = timestamp - rng.randint(3600, 30 * 86400)
+
+        activity = diurnal(timestamp)
+        load = max(0.0, self.cores * (0.1 + 0.5 * activity) + rng.gauss(0, self.cores * 0.05))
+        # Occasional bursts
+        if rng.random() < 0.002:
+            load += self.cores * rng.uniform(0.5, 1.5)
+
+        self.memory_used += (self.memory_level + 0.15 * activity - self.memory_used) * 0.05 + rng.gauss(0, 0.01)
+        self.memory_used = min(max(self.memory_used, 0.05), 0.99)
+        # A few percent of swap per day, with noise
+        self.swap_used += 0.03 * elapsed / 86400 + rng.gauss(0, 0.0002)
+        self.swap_used = min(max(self.swap_used, 0.0), 1.0)
+
+        filesystems = []
+        for mount in self.mounts:
+            mount['used'] += mount['growth'] * elapsed / 86400 + rng.gauss(0, 0.00002)
+            if mount['used'] > 0.95 or rng.random() < elapsed / (30 * 86400):
+                # A cleanup about once a month, or when nearly full, frees part of the disk
+                mount['used'] *= rng.uniform(0.6, 0.9)
+            mount['used'] = min(max(mount['used'], 0.01), 1.0)
+            used_kb = int(mount['total_kb'] * mount['used'])
+            filesystems.append({
+                'device': mount['device'], 'mount_point': mount['mount_point'],
+                'total_kb': mount['total_kb'], 'used_kb': used_kb,
+                'available_kb': mount['total_kb'] - used_kb,
+                'use_percent': round(mount['used'] * 100)
+            })
+
+        self.io[0] += int(elapsed * rng.uniform(10, 200) * (0.2 + activity))
+        self.io[1] += int(elapsed * rng.uniform(20, 400) * (0.2 + activity))
+
+        interfaces = []
+        for iface in self.interfaces:
+            for direction, share in (('rx', 1.0), ('tx', 0.4)):
+                sent = int(iface['rate'] * share * (0.05 + activity) * elapsed * rng.uniform(0.7, 1.3))
+                iface[f"{direction}_bytes"] += sent
+                iface[f"{direction}_packets"] += sent // 900
+                if rng.random() < 0.001:
+                    iface[f"{direction}_errors"] += 1
+            interfaces.append({key: iface[key] for key in (
+                'interface', 'rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets', 'rx_errors', 'tx_errors')})
+            interfaces[-1]['status'] = 'up'
+
+        devices = []
+        for gpu in self.gpus:
+            utilization = min(100, max(0, int(100 * activity + rng.gauss(0, 10))))
+            temperature = int(35 + utilization * 0.45 + rng.gauss(0, 2))
+            devices.append({
+                'id': gpu['id'], 'name': gpu['name'], 'vendor': gpu['vendor'],
+                'temperature_celsius': temperature, 'utilization_percent': utilization,
+                'memory_used_mb': int(gpu['memory_total_mb'] * min(0.95, 0.1 + utilization / 120)),
+                'memory_total_mb': gpu['memory_total_mb'],
+                'power_draw_watts': round(gpu['power_limit_watts'] * (0.15 + 0.8 * utilization / 100), 1),
+                'power_limit_watts': gpu['power_limit_watts'],
+                'fan_speed_percent': min(100, 30 + utilization // 2),
+                'health': 'good' if temperature < 85 else 'warning'
+            })
+
+        return {
+            'timestamp': timestamp,
+            'datetime': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)),
+            'system': {'hostname': self.hostname, 'os_name': 'Ubuntu', 'os_version': '22.04',
+                       'kernel': '6.1.0-synthetic', 'architecture': 'x86_64',
+                       'uptime_seconds': timestamp - self.boot_time,
+                       'process_count': int(150 + 100 * activity + rng.randint(0, 20))},
+            'cpu': {'load_1min': round(load, 2), 'load_5min': round(load * 0.95, 2),
+                    'load_15min': round(load * 0.9, 2), 'core_count': self.cores,
+                    'model': 'Synthetic CPU @ 3.00GHz',
+                    'temperature_celsius': round(40 + 35 * load / self.cores + rng.gauss(0, 1), 1)},
+            'memory': {'total_kb': self.memory_total_kb,
+                       'available_kb': int(self.memory_total_kb * (1 - self.memory_used)),
+                       'swap_total_kb': self.swap_total_kb,
+                       'swap_used_kb': int(self.swap_total_kb * self.swap_used)},
+            'disk': {'filesystems': filesystems,
+                     'io_stats': [{'device': 'sda', 'reads': self.io[0], 'writes': self.io[1]}]},
+            'network': {'interfaces': interfaces},
+            'gpu': {'devices': devices},
+            'collection_status': 'success'
+        }
+
+
+def sample_alerts(metrics, last_sent):
+    """Return the alerts system_monitor.sh thresholds would raise for a sample, with a cooldown"""
+    timestamp = metrics['timestamp']
+    hostname = metrics['system']['hostname']
+    memory = metrics['memory']
+    checks = [('memory', 'High Memory Usage',
+               (memory['total_kb'] - memory['available_kb']) / memory['total_kb'] * 100),
+              ('swap', 'High Swap Usage', memory['swap_used_kb'] / memory['swap_total_kb'] * 100)]
+    checks += [('disk', f"High Disk Usage on {fs['mount_point']}", fs['use_percent'])
+               for fs in metrics['disk']['filesystems']]
+
+    alerts = []
+    for kind, title, value in checks:
+        threshold = ALERT_THRESHOLDS[kind]
+        key = (hostname, title)
+        if value <= threshold or timestamp - last_sent.get(key, 0) < ALERT_COOLDOWN:
+            continue
+        last_sent[key] = timestamp
+        alerts.append({
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)),
+            'severity': 'CRITICAL' if value > (threshold + 100) / 2 else 'WARNING',
+            'title': title,
+            'message': f"{hostname}: {value:.1f}% (threshold: {threshold}%)"
+        })
+    return alerts
+
+
+def iter_samples(days, interval, hosts=1, interfaces=2, mounts=3, gpus=0, seed=0, end_ts=None):
+    """Yield samples of every host for `days` up to end_ts, oldest first
+
+    Hosts are staggered within each interval the way independent monitors
+    are, so no two samples share a timestamp.
+    """
+    if hosts > interval:
+        raise ValueError('hosts cannot exceed the interval in seconds')
+    rng = random.Random(seed)
+    machines = [SyntheticHost(i, interfaces, mounts, gpus, random.Random(rng.random())) for i in range(hosts)]
+    end_ts = int(time.time()) if end_ts is None else int(end_ts)
+    start_ts = end_ts - int(days * 86400)
+    start_ts -= start_ts % interval
+
+    for timestamp in range(start_ts, end_ts - interval + 1, interval):
+        for index, machine in enumerate(machines):
+            yield machine.sample(timestamp + index * interval // hosts)
+
+
+def generate(data_dir, days=1.0, interval=5, hosts=1, interfaces=2, mounts=3, gpus=0,
+             seed=0, layout='segments', alerts=True, end_ts=None):
+    """Write a synthetic data dir and return what was written
+
+    'segments' writes the hourly segment store plus the rollup tiers, as a
+    running monitor would; 'files' writes one legacy metrics_<ts>.json per
+    sample, which `metrics_store.py migrate` or the InfluxDB writer read.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    store = MetricsStore(data_dir)
+
+    started = time.perf_counter()
+    samples = 0
+    alert_count = 0
+    last_sent = {}
+    metrics = None
+    with open(data_dir / 'alerts.jsonl', 'a') as alert_file:
+        for metrics in iter_samples(days, interval, hosts, interfaces, mounts, gpus, seed, end_ts):
+            if layout == 'segments':
+                store.append(metrics)
+            else:
+                with open(data_dir / f"metrics_{metrics['timestamp']}.json", 'w') as f:
+                    json.dump(metrics, f, indent=2)
+            samples += 1
+            if alerts:
+                for alert in sample_alerts(metrics, last_sent):
+                    alert_file.write(json.dumps(alert) + '\n')
+                    alert_count += 1
+
+    if metrics is not None:
+        store.write_latest(json.dumps(metrics, indent=2))
+    if layout == 'segments':
+        with Aggregator(data_dir).locked() as aggregator:
+            aggregator.catch_up(store)
+            aggregator.prune()
+            aggregator.save_state()
+
+    return {
+        'data_dir': str(data_dir),
+        'layout': layout,
+        'samples': samples,
+        'alerts': alert_count,
+        'bytes': sum(path.stat().st_size for path in data_dir.rglob('*') if path.is_file()),
+        'seconds': time.perf_counter() - started
+    }
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate a synthetic TaskMania data dir')
+    parser.add_argument('data_dir', help='Directory to write (created if missing)')
+    parser.add_argument('--days', type=float, default=1,
+                       help='Days of samples, ending now (default: 1)')
+    parser.add_argument('--interval', type=int, default=5,
+                       help='Seconds between samples of one host (default: 5)')
+    parser.add_argument('--hosts', type=int, default=1,
+                       help='Number of monitored hosts (default: 1)')
+    parser.add_argument('--interfaces', type=int, default=2,
+                       help='Network interfaces per host (default: 2)')
+    parser.add_argument('--mounts', type=int, default=3,
+                       help='Mounted filesystems per host (default: 3)')
+    parser.add_argument('--gpus', type=int, default=0,
+                       help='GPUs per host (default: 0)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed, for repeatable data (default: 0)')
+    parser.add_argument('--layout', choices=LAYOUTS, default='segments',
+                       help='segments (the metrics store) or files (legacy metrics_<ts>.json)')
+    parser.add_argument('--no-alerts', action='store_true',
+                       help='Do not write alerts.jsonl')
+    parser.add_argument('--json', action='store_true',
+                       help='Print machine-readable results')
+
+    args = parser.parse_args()
+    try:
+        result = generate(args.data_dir, args.days, args.interval, args.hosts, args.interfaces,
+                          args.mounts, args.gpus, args.seed, args.layout, not args.no_alerts)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"Wrote {result['samples']} samples and {result['alerts']} alerts to {result['data_dir']} "
+          f"({result['bytes'] / 1024 / 1024:.1f} MB, {result['layout']}) in {result['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
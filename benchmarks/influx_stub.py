@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+InfluxDB Stub
+Minimal InfluxDB 1.x HTTP endpoint for exercising the writer locally
+"""
+
+import gzip
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class InfluxStub:
+    """Accepts /write and /query, counting requests, points and bytes"""
+
+    def __init__(self, status=204):
+        self.status = status  # set to e.g. 503 to simulate an outage
+        self.database_missing = False  # set to answer writes with 404 until CREATE DATABASE
+        self.queries = 0
+        self.requests = 0
+        self.points = 0
+        self.bytes = 0
+        self.connections = 0
+        self.sockets = set()
+        self.lines = []
+        self.keep_lines = False
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        """Start serving on a free local port and return the base URL"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+                    stub.sockets.add(self.connection)
+
+            def finish(self):
+                with stub.lock:
+                    stub.sockets.discard(self.connection)
+                super().finish()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+
+                if self.path.startswith('/query'):
+                    with stub.lock:
+                        stub.queries += 1
+                        stub.database_missing = False
+                    self.reply(200, b'{"results":[{"statement_id":0}]}')
+                    return
+
+                with stub.lock:
+                    stub.requests += 1
+                    status = 404 if stub.database_missing else stub.status
+                    if status == 204:
+                        lines = body.decode('utf-8').splitlines()
+                        stub.points += len(lines)
+                        stub.bytes += len(body)
+                        if stub.keep_lines:
+                            stub.lines.extend(lines)
+                if status == 204:
+                    self.reply(204, b'')
+                elif status == 404:
+                    self.reply(status, b'{"error":"database not found"}')
+                else:
+                    self.reply(status, b'{"error":"stub unavailable"}')
+
+            def reply(self, status, payload):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(payload)))
+                if payload:
+                    self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def drop_connections(self):
+        """Close every open client connection, as a server timing out idle keep-alives does"""
+        with self.lock:
+            sockets = list(self.sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        """Stop serving"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+if __name__ == '__main__':
+    import time
+
+    stub = InfluxStub()
+    print(f"InfluxDB stub listening on {stub.start()}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"requests={stub.requests} points={stub.points} bytes={stub.bytes}")
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+API Load Test
+Drives latest/history/alerts endpoints concurrently and reports
+p50/p99 latency and requests per second
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_polling import make_sample
+from metrics_store import MetricsStore
+
+
+def build_data_dir(hours, interval):
+    """Write a synthetic data dir with `hours` of samples and some alerts"""
+    data_dir = Path(tempfile.mkdtemp(prefix='taskmania-load-'))
+    store = MetricsStore(data_dir)
+    now = int(time.time())
+    sample = None
+    for timestamp in range(now - int(hours * 3600), now, interval):
+        sample = make_sample(timestamp)
+        store.append(sample)
+    store.write_latest(json.dumps(sample, indent=2))
+
+    with open(data_dir / 'alerts.jsonl', 'w') as f:
+        for i in range(1000):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now - 1000 + i))
+            f.write(json.dumps({'timestamp': stamp, 'severity': random.choice(['INFO', 'WARNING', 'CRITICAL']),
+                                'title': 'Synthetic alert', 'message': f"alert {i}"}) + '\n')
+    return data_dir
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(data_dir, dev):
+    """Start the API server against a data dir and wait until it answers"""
+    port = free_port()
+    env = dict(os.environ, DATA_DIR=str(data_dir), REPORTS_DIR=str(data_dir / 'reports'), API_PORT=str(port))
+    if dev:
+        command = [sys.executable, 'api_server.py']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'api_server:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('API server did not start')
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_load(url, endpoints, concurrency, duration):
+    """Hammer the endpoints from `concurrency` keep-alive clients for `duration` seconds"""
+    target = urlparse(url)
+    names = [name for name, _, _ in endpoints]
+    weights = [weight for _, _, weight in endpoints]
+    paths = {name: path for name, path, _ in endpoints}
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                connection.request('GET', paths[name], headers={'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors[name] += 1
+            except (OSError, http.client.HTTPException):
+                local_errors[name] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+                continue
+            local[name].append(time.perf_counter() - start)
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    workers = [threading.Thread(target=client) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    results = {}
+    for name in names:
+        values = latencies[name]
+        results[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'rps': len(values) / duration,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000
+        }
+    results['total'] = {
+        'requests': sum(r['requests'] for r in results.values()),
+        'errors': sum(r['errors'] for r in results.values()),
+        'rps': sum(r['rps'] for r in results.values())
+    }
+    return results
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test the TaskMania API')
+    parser.add_argument('--url', help='Target an already running server instead of starting one')
+    parser.add_argument('--dev', action='store_true',
+                       help='Start the Flask development server instead of gunicorn')
+    parser.add_argument('--data-hours', type=float, default=6,
+                       help='Hours of synthetic samples to generate (default: 6)')
+    parser.add_argument('--interval', type=int, default=5,
+                       help='Synthetic sample interval in seconds (default: 5)')
+    parser.add_argument('--history-hours', type=int, default=1,
+                       help='Window requested from the history endpoint (default: 1)')
+    parser.add_argument('--concurrency', type=int, default=16,
+                       help='Concurrent keep-alive clients (default: 16)')
+    parser.add_argument('--duration', type=float, default=10,
+                       help='Seconds to run (default: 10)')
+    parser.add_argument('--json', action='store_true',
+                       help='Print machine-readable results')
+
+    args = parser.parse_args()
+
+    endpoints = [
+        ('latest', '/api/metrics/latest', 70),
+        ('history', f"/api/metrics/history/{args.history_hours}", 10),
+        ('alerts', '/api/alerts/recent', 20),
+    ]
+
+    process = None
+    url = args.url
+    if url is None:
+        data_dir = build_data_dir(args.data_hours, args.interval)
+        process, url = start_server(data_dir, args.dev)
+
+    try:
+        results = run_load(url, endpoints, args.concurrency, args.duration)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, _, _ in endpoints:
+        r = results[name]
+        print(f"{name:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+    total = results['total']
+    print(f"{'total':<10}{total['requests']:>10}{total['errors']:>8}{total['rps']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
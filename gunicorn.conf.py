@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration for the API server
+Production serving: one worker process whose thread pool shares the
+in-process caches. Reload gracefully with `kill -HUP <master pid>`.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('API_PORT', 8000)}"
+
+# One worker on purpose: snapshots, the history buffer and response memos
+# live in the worker, so each extra worker repeats their memory and cold
+# misses. Handlers mostly serve cached bytes and wait on I/O, so threads
+# scale them well enough. Every open /api/stream connection occupies one
+# thread, and api_server caps streams at half the pool (STREAM_MAX_CLIENTS).
+workers = int(os.getenv('API_WORKERS', 1))
+worker_class = os.getenv('API_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('API_THREADS', 128))
+
+# Slow history exports must not get a busy worker killed
+timeout = int(os.getenv('API_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('API_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = os.getenv('API_ACCESS_LOG', None)
+errorlog = '-'
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Incremental Aggregator for System Monitoring
+Rollup tiers of running statistics that answer summaries and long-range
+history without re-reading samples
+"""
+
+import fcntl
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional
+
+from series import flatten_sample
+
+# Configuration
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+# Rollup tiers, finest first: (bucket seconds, name, retention hours)
+TIERS = [
+    (60, '1m', float(os.getenv('AGGREGATE_RETENTION_1M', 48))),
+    (300, '5m', float(os.getenv('AGGREGATE_RETENTION_5M', 24 * 14))),
+    (3600, '1h', float(os.getenv('AGGREGATE_RETENTION_1H', 24 * 90))),
+    (86400, '1d', float(os.getenv('AGGREGATE_RETENTION_1D', 24 * 730))),
+]
+BUCKET_SECONDS = TIERS[0][0]
+PRUNE_INTERVAL = 3600
+# A summary may be answered by a tier whose buckets are at most this share of the window
+SUMMARY_BUCKET_FRACTION = 1 / 24
+
+
+class RunningStats:
+    """Count, mean, min, max and variance of a stream (Welford), mergeable across buckets"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, low=math.inf, high=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = low
+        self.max = high
+
+    def add(self, value: float):
+        """Fold one value in"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'RunningStats'):
+        """Fold another set of statistics in (Chan et al.)"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def to_list(self) -> List[float]:
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+    @classmethod
+    def from_list(cls, values: List[float]) -> 'RunningStats':
+        return cls(*values)
+
+
+def number(value: Any) -> Optional[float]:
+    """Convert a sample value to float, or None if it is missing, non-numeric or NaN"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def sample_values(metrics: Dict[str, Any]) -> Dict[str, float]:
+    """Extract the summarized values of one sample, keyed like 'cpu.load_1min' or 'disk:/'
+
+    Values that are not numeric are left out, not the whole sample.
+    """
+    values = {}
+
+    cpu = metrics.get('cpu', {})
+    for field in ('load_1min', 'load_5min', 'load_15min'):
+        load = number(cpu.get(field))
+        if load is not None:
+            values[f"cpu.{field}"] = load
+    temp = number(cpu.get('temperature_celsius'))
+    if temp:
+        values['cpu.temperature'] = temp
+
+    memory = metrics.get('memory', {})
+    total_kb = number(memory.get('total_kb'))
+    available_kb = number(memory.get('available_kb', 0))
+    if total_kb and total_kb > 0 and available_kb is not None:
+        values['memory.used_percent'] = (total_kb - available_kb) / total_kb * 100
+    swap_total = number(memory.get('swap_total_kb'))
+    swap_used = number(memory.get('swap_used_kb', 0))
+    if swap_total and swap_total > 0 and swap_used is not None:
+        values['memory.swap_used_percent'] = swap_used / swap_total * 100
+
+    for fs in metrics.get('disk', {}).get('filesystems', []):
+        use_percent = number(fs.get('use_percent', 0))
+        if use_percent is not None:
+            values[f"disk:{fs.get('mount_point', 'unknown')}"] = use_percent
+
+    return values
+
+
+class Bucket:
+    """Statistics of the samples in one time bucket"""
+
+    def __init__(self, start: int):
+        self.start = start
+        self.count = 0
+        self.stats = {}
+        # Per series path: [min, max, sum, count, last]
+        self.series = {}
+        # Network rates only need the first and last counters of a window
+        self.network = {}
+
+    def add(self, metrics: Dict[str, Any]):
+        """Fold one sample in"""
+        self.count += 1
+        for key, value in sample_values(metrics).items():
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = RunningStats()
+            stats.add(value)
+
+        for path, value in flatten_sample(metrics).items():
+            acc = self.series.get(path)
+            if acc is None:
+                self.series[path] = [value, value, value, 1, value]
+            else:
+                if value < acc[0]:
+                    acc[0] = value
+                if value > acc[1]:
+                    acc[1] = value
+                acc[2] += value
+                acc[3] += 1
+                acc[4] = value
+
+        timestamp = metrics.get('timestamp', 0)
+        for iface in metrics.get('network', {}).get('interfaces', []):
+            counters = [timestamp, iface.get('rx_bytes', 0), iface.get('tx_bytes', 0),
+                        iface.get('rx_errors', 0), iface.get('tx_errors', 0), iface.get('status')]
+            entry = self.network.setdefault(iface.get('interface'), {'first': counters})
+            entry['last'] = counters
+
+    def merge(self, other: 'Bucket'):
+        """Fold a later bucket in"""
+        self.count += other.count
+        for key, stats in other.stats.items():
+            mine = self.stats.get(key)
+            if mine is None:
+                mine = self.stats[key] = RunningStats()
+            mine.merge(stats)
+        for path, acc in other.series.items():
+            mine = self.series.get(path)
+            if mine is None:
+                self.series[path] = list(acc)
+            else:
+                mine[0] = min(mine[0], acc[0])
+                mine[1] = max(mine[1], acc[1])
+                mine[2] += acc[2]
+                mine[3] += acc[3]
+                mine[4] = acc[4]
+        for name, entry in other.network.items():
+            mine = self.network.setdefault(name, {'first': entry['first']})
+            mine['last'] = entry['last']
+
+    def to_dict(self) -> Dict[str, Any]:
+        # 'start' comes first so readers can skip lines without parsing them
+        return {
+            'start': self.start,
+            'count': self.count,
+            'stats': {key: stats.to_list() for key, stats in self.stats.items()},
+            'series': self.series,
+            'network': self.network
+        }
+
+    def to_output(self) -> Dict[str, Any]:
+        """Render as a history bucket: min/avg/max/last per series"""
+        return {
+            'timestamp': self.start,
+            'count': self.count,
+            'series': {
+                path: {'min': low, 'avg': total / n, 'max': high, 'last': last}
+                for path, (low, high, total, n, last) in self.series.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Bucket':
+        bucket = cls(data['start'])
+        bucket.count = data['count']
+        bucket.stats = {key: RunningStats.from_list(values) for key, values in data['stats'].items()}
+        bucket.series = data.get('series', {})
+        bucket.network = data.get('network', {})
+        return bucket
+
+
+class Aggregator:
+    """Rollup tiers (1m, 5m, 1h, 1d) of running statistics, persisted under data/aggregates/
+
+    Samples only update the open 1-minute bucket. A closed bucket is appended
+    to its tier file and folded into the open bucket of the next tier, so
+    the closed buckets of a tier plus the open buckets of it and every finer
+    tier cover each sample exactly once. The open buckets, the last sample
+    timestamp and the latest system info live in a small state file.
+    """
+
+    def __init__(self, data_dir=None, tiers=None):
+        self.directory = Path(data_dir or DATA_DIR) / 'aggregates'
+        self.tiers = TIERS if tiers is None else tiers
+        self.state_file = self.directory / 'state.json'
+        self.lock_file = self.directory / '.lock'
+
+        self.last_timestamp = 0
+        self.pruned_at = 0
+        self.system = {}
+        self.open = [None] * len(self.tiers)
+
+    def tier_file(self, level: int) -> Path:
+        """Return the file holding the closed buckets of a tier"""
+        return self.directory / f"buckets-{self.tiers[level][0]}.ndjson"
+
+    @contextmanager
+    def locked(self):
+        """Hold the aggregate lock (the monitor and the processor both update it)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.load_state()
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load_state(self):
+        """Read the open buckets and progress markers"""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        self.last_timestamp = state.get('last_timestamp', 0)
+        self.pruned_at = state.get('pruned_at', 0)
+        self.system = state.get('system', {})
+
+        open_buckets = state.get('open') or {}
+        if 'start' in open_buckets:
+            # Single-tier state written before rollup tiers existed
+            open_buckets = {str(BUCKET_SECONDS): open_buckets}
+        self.open = [Bucket.from_dict(open_buckets[str(seconds)]) if open_buckets.get(str(seconds)) else None
+                     for seconds, _, _ in self.tiers]
+
+    def save_state(self):
+        """Atomically persist the open buckets and progress markers"""
+        state = {
+            'last_timestamp': self.last_timestamp,
+            'pruned_at': self.pruned_at,
+            'system': self.system,
+            'open': {str(seconds): bucket.to_dict()
+                     for (seconds, _, _), bucket in zip(self.tiers, self.open) if bucket is not None}
+        }
+        tmp_path = self.state_file.with_name(f".{self.state_file.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_path, self.state_file)
+
+    def add(self, metrics: Dict[str, Any]) -> bool:
+        """Fold a sample in; samples at or before the last one seen are ignored"""
+        timestamp = int(metrics.get('timestamp', 0))
+        if timestamp <= self.last_timestamp:
+            return False
+
+        start = timestamp - timestamp % BUCKET_SECONDS
+        if self.open[0] is not None and self.open[0].start != start:
+            self.close_bucket(0)
+        if self.open[0] is None:
+            self.open[0] = Bucket(start)
+
+        self.open[0].add(metrics)
+        self.last_timestamp = timestamp
+        if metrics.get('system'):
+            self.system = metrics['system']
+        return True
+
+    def close_bucket(self, level: int):
+        """Append a tier's open bucket to its file and roll it up into the next tier
+
+        The state is saved after the append, so a crash in between closes the
+        bucket again from the saved state. Readers skip the second copy.
+        """
+        bucket = self.open[level]
+        self.open[level] = None
+        with open(self.tier_file(level), 'a') as f:
+            f.write(json.dumps(bucket.to_dict(), separators=(',', ':')) + '\n')
+
+        if level + 1 < len(self.tiers):
+            seconds = self.tiers[level + 1][0]
+            start = bucket.start - bucket.start % seconds
+            if self.open[level + 1] is not None and self.open[level + 1].start != start:
+                self.close_bucket(level + 1)
+            if self.open[level + 1] is None:
+                self.open[level + 1] = Bucket(start)
+            self.open[level + 1].merge(bucket)
+
+    def catch_up(self, store) -> int:
+        """Fold in stored samples newer than the last one seen (e.g. after a migration)"""
+        longest = max(retention for _, _, retention in self.tiers) * 3600
+        start_ts = max(self.last_timestamp + 1, int(time.time() - longest))
+        added = 0
+        for metrics in store.iter_metrics(start_ts):
+            if self.add(metrics):
+                added += 1
+        return added
+
+    def prune(self, now: Optional[float] = None):
+        """Drop closed buckets past each tier's retention (at most once per interval)"""
+        now = time.time() if now is None else now
+        if now - self.pruned_at < PRUNE_INTERVAL:
+            return
+
+        for level, (seconds, _, retention) in enumerate(self.tiers):
+            tier_file = self.tier_file(level)
+            if not tier_file.exists():
+                continue
+            cutoff = now - retention * 3600
+            tmp_path = tier_file.with_name(f".{tier_file.name}.tmp")
+            previous = None
+            with open(tier_file, 'r') as src, open(tmp_path, 'w') as dst:
+                for line in src:
+                    start = bucket_start(line)
+                    # Also drops buckets written twice by an interrupted close_bucket
+                    if start is not None and start + seconds > cutoff and (previous is None or start > previous):
+                        dst.write(line)
+                        previous = start
+            os.replace(tmp_path, tier_file)
+        self.pruned_at = now
+
+    def select_tier(self, start_ts: int, max_seconds: float, now: Optional[float] = None) -> Optional[int]:
+        """Pick the coarsest tier with buckets of at most max_seconds that still reaches back to start_ts"""
+        now = time.time() if now is None else now
+        eligible = [level for level, (seconds, _, _) in enumerate(self.tiers) if seconds <= max_seconds]
+        if not eligible:
+            return None
+        for level in reversed(eligible):
+            if now - self.tiers[level][2] * 3600 <= start_ts:
+                return level
+        # Nothing retains the whole window; the longest-lived eligible tier covers the most of it
+        return max(eligible, key=lambda level: self.tiers[level][2])
+
+    def iter_buckets(self, start_ts: int, level: int = 0, include_open: bool = True) -> Iterator[Bucket]:
+        """Yield a tier's buckets from start_ts on, oldest first, then the open ones
+
+        The open buckets of finer tiers hold the newest samples and are
+        yielded last, coarsest first, unless include_open is False.
+        """
+        first = start_ts - start_ts % self.tiers[level][0]
+        # Skips the second copy of a bucket closed again after a crash before save_state
+        previous = None
+        try:
+            with open(self.tier_file(level), 'r') as f:
+                for line in f:
+                    start = bucket_start(line)
+                    if start is None or start < first or (previous is not None and start <= previous):
+                        continue
+                    try:
+                        bucket = Bucket.from_dict(json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+                    previous = start
+                    yield bucket
+        except FileNotFoundError:
+            pass
+
+        if not include_open:
+            return
+        for bucket in reversed(self.open[:level + 1]):
+            if bucket is not None and bucket.start >= first:
+                yield bucket
+
+    def window(self, start_ts: int, level: int = 0) -> Optional[Bucket]:
+        """Merge every bucket from start_ts on into one, or None if there are none
+
+        The tier's bucket holding start_ts would reach back before it, so
+        that stretch is read from the closed buckets of finer tiers instead,
+        as far as they are retained. The merged bucket starts at the oldest
+        bucket read.
+        """
+        seconds = self.tiers[level][0]
+        first = -(-start_ts // seconds) * seconds
+        # Open buckets of finer tiers only fall in the edge when the window is shorter than a bucket
+        edge_open = [bucket for bucket in reversed(self.open[:level])
+                     if bucket is not None and start_ts <= bucket.start < first]
+        merged = None
+        for bucket in itertools.chain(self.edge_buckets(start_ts, first, level - 1), edge_open,
+                                      self.iter_buckets(first, level)):
+            if merged is None:
+                merged = Bucket(bucket.start)
+            merged.merge(bucket)
+        return merged
+
+    def edge_buckets(self, start_ts: int, end_ts: int, level: int) -> Iterator[Bucket]:
+        """Yield the closed buckets of a tier and finer ones that lie within [start_ts, end_ts)"""
+        if level < 0 or start_ts >= end_ts:
+            return
+        seconds = self.tiers[level][0]
+        first = -(-start_ts // seconds) * seconds
+        yield from self.edge_buckets(start_ts, min(first, end_ts), level - 1)
+        for bucket in self.iter_buckets(first, level, include_open=False):
+            if bucket.start + seconds > end_ts:
+                break
+            yield bucket
+
+    def history(self, start_ts: int, resolution: int, level: int) -> List[Dict[str, Any]]:
+        """Re-bucket a tier into epoch-aligned buckets of `resolution` seconds"""
+        buckets = []
+        current = None
+        for bucket in self.iter_buckets(start_ts, level):
+            start = bucket.start - bucket.start % resolution
+            if current is None or current.start != start:
+                if current is not None:
+                    buckets.append(current.to_output())
+                current = Bucket(start)
+            current.merge(bucket)
+        if current is not None:
+            buckets.append(current.to_output())
+        return buckets
+
+
+def bucket_start(line: str) -> Optional[int]:
+    """Read the start of a stored bucket without parsing the whole line"""
+    prefix = '{"start":'
+    if not line.startswith(prefix):
+        return None
+    try:
+        return int(line[len(prefix):line.index(',', len(prefix))])
+    except ValueError:
+        return None
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain incremental metric aggregates')
+    parser.add_argument('action', choices=['add', 'catch-up'],
+                       help='Fold one sample in (add) or every stored sample not yet seen')
+    parser.add_argument('file', nargs='?', default='-',
+                       help='Sample to add (default: stdin)')
+
+    args = parser.parse_args()
+
+    with Aggregator().locked() as aggregator:
+        if args.action == 'add':
+            if args.file == '-':
+                metrics = json.load(sys.stdin)
+            else:
+                with open(args.file, 'r') as f:
+                    metrics = json.load(f)
+            aggregator.add(metrics)
+        else:
+            from metrics_store import MetricsStore
+            print(f"Aggregated {aggregator.catch_up(MetricsStore())} samples")
+        aggregator.prune()
+        aggregator.save_state()
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,10 @@ TEMP_THRESHOLD=80.0
 ALERT_COOLDOWN=300
 LAST_ALERT_FILE="$DATA_DIR/last_alerts.state"
 
+# Longest wait between checks; new samples wake the loop earlier when python3 is available
+CHECK_INTERVAL=30
+FILE_WATCHER="$(dirname "$0")/file_watcher.py"
+
 # Ensure directories exist
 mkdir -p "$DATA_DIR" "$LOG_DIR"
 
@@ -250,6 +254,18 @@ check_system_health() {
     return 0
 }
 
+################################################################################
+# Wait For Next Sample
+################################################################################
+wait_for_metrics() {
+    if command -v python3 >/dev/null 2>&1 && [ -f "$FILE_WATCHER" ]; then
+        python3 "$FILE_WATCHER" "$DATA_DIR" --name latest_metrics.json \
+            --timeout "$CHECK_INTERVAL" >/dev/null || true
+    else
+        sleep "$CHECK_INTERVAL"
+    fi
+}
+
 ################################################################################
 # Monitor Loop
 ################################################################################
@@ -274,8 +290,8 @@ monitor_loop() {
             echo "[$(date '+%Y-%m-%d %H:%M:%S')] No metrics file found yet" >> "$ALERT_LOG"
         fi
         
-        # Check every 30 seconds
-        sleep 30
+        # Check again on the next sample, or after CHECK_INTERVAL seconds
+        wait_for_metrics
     done
 }
 
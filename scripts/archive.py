@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Metrics Archive
+Per-day gzip archives of NDJSON samples with a time index embedded in the block headers
+"""
+
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+ARCHIVE_PREFIX = 'metrics-'
+ARCHIVE_SUFFIX = '.ndjson.gz'
+
+# Each block is a complete gzip member, so `zcat` reads an archive as plain
+# NDJSON. Its header carries one extra subfield (RFC 1952 FEXTRA) holding the
+# member size and the time range of the block, so readers can hop from
+# header to header and only inflate the blocks a query needs.
+GZIP_HEADER = struct.Struct('<BBBBIBBH')      # ID1 ID2 CM FLG MTIME XFL OS XLEN
+SUBFIELD_HEADER = struct.Struct('<2sH')       # SI1 SI2, LEN
+BLOCK_INFO = struct.Struct('<IqqI')           # member size, first ts, last ts, sample count
+SUBFIELD_ID = b'TM'
+FLAG_EXTRA = 0x04
+EXTRA_SIZE = SUBFIELD_HEADER.size + BLOCK_INFO.size
+HEADER_SIZE = GZIP_HEADER.size + EXTRA_SIZE
+TRAILER = struct.Struct('<II')                # CRC32, ISIZE
+
+COMPRESS_LEVEL = 6
+
+
+class Block(NamedTuple):
+    offset: int
+    size: int
+    first_ts: int
+    last_ts: int
+    count: int
+
+
+def encode_block(lines: bytes, first_ts: int, last_ts: int, count: int,
+                 level: int = COMPRESS_LEVEL) -> bytes:
+    """Compress NDJSON lines into one gzip member carrying its time range"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(lines) + compressor.flush()
+    size = HEADER_SIZE + len(body) + TRAILER.size
+
+    header = GZIP_HEADER.pack(0x1f, 0x8b, 8, FLAG_EXTRA, int(time.time()), 0, 255, EXTRA_SIZE)
+    extra = SUBFIELD_HEADER.pack(SUBFIELD_ID, BLOCK_INFO.size) + \
+        BLOCK_INFO.pack(size, first_ts, last_ts, count)
+    trailer = TRAILER.pack(zlib.crc32(lines), len(lines) & 0xffffffff)
+    return header + extra + body + trailer
+
+
+def read_block_header(f) -> Optional[Block]:
+    """Parse the block header at the current position, or None at the end or on damage"""
+    offset = f.tell()
+    data = f.read(HEADER_SIZE)
+    if len(data) < HEADER_SIZE:
+        return None
+    id1, id2, method, flags, _, _, _, xlen = GZIP_HEADER.unpack_from(data)
+    subfield, length = SUBFIELD_HEADER.unpack_from(data, GZIP_HEADER.size)
+    if (id1, id2, method) != (0x1f, 0x8b, 8) or not flags & FLAG_EXTRA or xlen != EXTRA_SIZE \
+            or subfield != SUBFIELD_ID or length != BLOCK_INFO.size:
+        return None
+    size, first_ts, last_ts, count = BLOCK_INFO.unpack_from(data, GZIP_HEADER.size + SUBFIELD_HEADER.size)
+    return Block(offset, size, first_ts, last_ts, count)
+
+
+class Archive:
+    """One day of archived samples"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def blocks(self) -> Iterator[Block]:
+        """Yield the complete blocks of the archive in file order"""
+        try:
+            with open(self.path, 'rb') as f:
+                end = os.fstat(f.fileno()).st_size
+                while True:
+                    block = read_block_header(f)
+                    # A block running past the end was cut short by a crash
+                    if block is None or block.offset + block.size > end:
+                        return
+                    yield block
+                    f.seek(block.offset + block.size)
+        except FileNotFoundError:
+            return
+
+    def append(self, lines: bytes, first_ts: int, last_ts: int, count: int):
+        """Durably add a block, dropping any partial block a crash left at the end"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        valid_end = 0
+        for block in self.blocks():
+            valid_end = block.offset + block.size
+
+        with open(self.path, 'ab') as f:
+            if f.tell() != valid_end:
+                f.truncate(valid_end)
+                f.seek(valid_end)
+            f.write(encode_block(lines, first_ts, last_ts, count))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self, start_ts: int = 0, end_ts: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the NDJSON lines of each block overlapping [start_ts, end_ts], one block at a time"""
+        blocks = [block for block in self.blocks()
+                  if block.last_ts >= start_ts and (end_ts is None or block.first_ts <= end_ts)]
+        if not blocks:
+            return
+        with open(self.path, 'rb') as f:
+            for block in blocks:
+                f.seek(block.offset + HEADER_SIZE)
+                body = f.read(block.size - HEADER_SIZE - TRAILER.size)
+                yield zlib.decompress(body, -zlib.MAX_WBITS)
+
+    @property
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect a metrics archive')
+    parser.add_argument('archive', help='Archive file (metrics-YYYYMMDD.ndjson.gz)')
+
+    args = parser.parse_args()
+
+    total = 0
+    for block in Archive(args.archive).blocks():
+        total += block.count
+        print(f"{block.offset:>12} {block.size:>10} "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(block.first_ts))} .. "
+              f"{time.strftime('%H:%M:%S', time.gmtime(block.last_ts))} {block.count:>6}")
+    print(f"{total} samples")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 
 ################################################################################
 # Cleanup Script
-# Removes old metrics and reports
+# Archives old metrics and removes old reports
 ################################################################################
 
 set -euo pipefail
@@ -6,16 +6,154 @@ Aggregates and analyzes metrics data
 
 import json
 import os
+import re
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Any
-import statistics
+from typing import Dict, List, Any, Iterable, Iterator, Union
+
+from aggregator import Aggregator, SUMMARY_BUCKET_FRACTION
+from forecast import Forecaster
+from metrics_store import MetricsStore, json_loads
+from report import SectionCache, cache_key, sparkline
+from vector_stats import column, describe, group, mean, percent, prefixed, present, subtract
 
 # Configuration
 DATA_DIR = os.getenv('DATA_DIR', '/app/data')
 LOG_DIR = os.getenv('LOG_DIR', '/app/logs')
 REPORTS_DIR = os.getenv('REPORTS_DIR', '/app/reports')
+# Percentiles re-read every raw sample, so longer windows use the rollup tiers only
+SUMMARY_PERCENTILE_HOURS = float(os.getenv('SUMMARY_PERCENTILE_HOURS', 1))
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', 4))
+REPORT_POINTS = int(os.getenv('REPORT_POINTS', 120))
+COMPACT_AFTER_HOURS = float(os.getenv('COMPACT_AFTER_HOURS', 24))
+ARCHIVE_RETENTION_DAYS = float(os.getenv('ARCHIVE_RETENTION_DAYS', 365))
+ARCHIVE_MAX_MB = float(os.getenv('ARCHIVE_MAX_MB', 1024))
+
+# Series paths of the per-bucket values drawn in the report
+DISK_PATH = re.compile(r'disk\.filesystems\[(.*)\]\.use_percent')
+NETWORK_PATH = re.compile(r'network\.interfaces\[(.*)\]\.(rx_bytes|tx_bytes)')
+
+REPORT_STYLE = """        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            max-width: 1200px;
+            margin: 0 auto;
+            padding: 20px;
+            background: #f5f5f5;
+        }
+        .header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 30px;
+            border-radius: 10px;
+            margin-bottom: 30px;
+        }
+        .header h1 {
+            margin: 0;
+            font-size: 2em;
+        }
+        .header .subtitle {
+            opacity: 0.9;
+            margin-top: 10px;
+        }
+        .section {
+            background: white;
+            padding: 25px;
+            margin-bottom: 20px;
+            border-radius: 10px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        .section h2 {
+            margin-top: 0;
+            color: #333;
+            border-bottom: 2px solid #667eea;
+            padding-bottom: 10px;
+        }
+        .metric {
+            display: flex;
+            justify-content: space-between;
+            padding: 10px 0;
+            border-bottom: 1px solid #eee;
+        }
+        .metric:last-child {
+            border-bottom: none;
+        }
+        .metric-name {
+            color: #666;
+        }
+        .metric-value {
+            font-weight: bold;
+            color: #333;
+        }
+        .status-good { color: #27ae60; }
+        .status-warning { color: #f39c12; }
+        .status-critical { color: #e74c3c; }
+        .grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+            gap: 20px;
+        }
+        .chart {
+            margin-top: 15px;
+        }
+        .chart svg {
+            display: block;
+            width: 100%;
+            height: 48px;
+        }
+        .chart-caption {
+            color: #666;
+            font-size: 0.85em;
+            margin-top: 4px;
+        }
+"""
+
+
+class SeriesColumns:
+    """The summarized series of many samples, one column each
+    
+    Samples are read once, row by row, appending to plain lists; the lists
+    are converted to contiguous float64 columns when statistics are computed.
+    """
+    
+    CPU_FIELDS = ('load_1min', 'load_5min', 'load_15min', 'temperature_celsius')
+    MEMORY_FIELDS = ('total_kb', 'available_kb', 'swap_total_kb', 'swap_used_kb')
+    
+    def __init__(self):
+        self.count = 0
+        self.cpu = {field: [] for field in self.CPU_FIELDS}
+        self.memory = {field: [] for field in self.MEMORY_FIELDS}
+        self.mount_points = []
+        self.disk_usage = []
+    
+    def add(self, metrics: Dict[str, Any]):
+        """Append the values of one sample"""
+        self.count += 1
+        cpu = metrics.get('cpu', {})
+        for field, values in self.cpu.items():
+            values.append(cpu.get(field))
+        memory = metrics.get('memory', {})
+        for field, values in self.memory.items():
+            values.append(memory.get(field, 0))
+        for fs in metrics.get('disk', {}).get('filesystems', []):
+            self.mount_points.append(fs.get('mount_point', 'unknown'))
+            self.disk_usage.append(fs.get('use_percent', 0))
+    
+    def extend(self, metrics_list: Iterable[Dict[str, Any]]):
+        """Append the values of many samples"""
+        for metrics in metrics_list:
+            self.add(metrics)
+
+
+def format_hours(hours) -> str:
+    """Describe a time-to-threshold estimate in hours"""
+    if hours is None:
+        return 'not reached at this trend'
+    if hours <= 0:
+        return 'reached'
+    if hours < 48:
+        return f"in {hours:.0f} hours"
+    return f"in {hours / 24:.1f} days"
 
 
 class MetricsProcessor:
@@ -25,6 +163,10 @@ class MetricsProcessor:
         self.data_dir = Path(DATA_DIR)
         self.log_dir = Path(LOG_DIR)
         self.reports_dir = Path(REPORTS_DIR)
+        self.store = MetricsStore(self.data_dir)
+        self.aggregator = Aggregator(self.data_dir)
+        self.forecaster = Forecaster(self.data_dir)
+        self.report_cache_stats = {}
         
         # Ensure directories exist
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -34,8 +176,8 @@ class MetricsProcessor:
     def load_metrics_file(self, filepath: Path) -> Dict[str, Any]:
         """Load a single metrics file"""
         try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
+            with open(filepath, 'rb') as f:
+                return json_loads(f.read())
         except Exception as e:
             print(f"Error loading {filepath}: {e}", file=sys.stderr)
             return {}
@@ -45,169 +187,130 @@ class MetricsProcessor:
         cutoff_time = datetime.now() - timedelta(hours=hours)
         cutoff_timestamp = int(cutoff_time.timestamp())
         
-        metrics_files = sorted(self.data_dir.glob('metrics_*.json'))
-        recent_metrics = []
-        
-        for filepath in metrics_files:
-            try:
-                # Extract timestamp from filename
-                timestamp = int(filepath.stem.split('_')[1])
-                if timestamp >= cutoff_timestamp:
-                    metrics = self.load_metrics_file(filepath)
-                    if metrics:
-                        recent_metrics.append(metrics)
-            except (ValueError, IndexError):
-                continue
+        return self.store.load_range(cutoff_timestamp)
+    
+    def iter_recent_metrics(self, hours: int = 1) -> Iterator[Dict[str, Any]]:
+        """Stream metrics from the last N hours, oldest first, reading segments ahead in parallel"""
+        cutoff_timestamp = int((datetime.now() - timedelta(hours=hours)).timestamp())
         
-        return recent_metrics
+        return self.store.iter_metrics_parallel(cutoff_timestamp, workers=LOAD_WORKERS)
     
-    def calculate_cpu_stats(self, metrics_list: List[Dict[str, Any]]) -> Dict[str, float]:
+    def series_columns(self, metrics_list: Union[Iterable[Dict[str, Any]], SeriesColumns]) -> SeriesColumns:
+        """Extract the summarized series of the samples, unless that was already done
+        
+        Samples are consumed one at a time, so a stream such as
+        iter_recent_metrics() is never held in memory as a whole; pass the
+        result to each calculate_*_stats call so the stream is read once.
+        """
+        if isinstance(metrics_list, SeriesColumns):
+            return metrics_list
+        series = SeriesColumns()
+        series.extend(metrics_list)
+        return series
+    
+    def calculate_cpu_stats(self, metrics_list: Union[Iterable[Dict[str, Any]], SeriesColumns]) -> Dict[str, float]:
         """Calculate CPU statistics"""
-        loads_1min = []
-        loads_5min = []
-        loads_15min = []
-        temps = []
-        
-        for metrics in metrics_list:
-            cpu = metrics.get('cpu', {})
-            if 'load_1min' in cpu:
-                loads_1min.append(float(cpu['load_1min']))
-            if 'load_5min' in cpu:
-                loads_5min.append(float(cpu['load_5min']))
-            if 'load_15min' in cpu:
-                loads_15min.append(float(cpu['load_15min']))
-            
-            temp = cpu.get('temperature_celsius')
-            if temp and temp != 'null':
-                temps.append(float(temp))
-        
-        stats = {}
+        cpu = self.series_columns(metrics_list).cpu
         
-        if loads_1min:
-            stats['load_1min_avg'] = statistics.mean(loads_1min)
-            stats['load_1min_max'] = max(loads_1min)
-            stats['load_1min_min'] = min(loads_1min)
+        stats = prefixed('load_1min', describe(present(column(cpu['load_1min']))))
         
-        if loads_5min:
-            stats['load_5min_avg'] = statistics.mean(loads_5min)
+        loads_5min = present(column(cpu['load_5min']))
+        if len(loads_5min):
+            stats['load_5min_avg'] = mean(loads_5min)
         
-        if loads_15min:
-            stats['load_15min_avg'] = statistics.mean(loads_15min)
+        loads_15min = present(column(cpu['load_15min']))
+        if len(loads_15min):
+            stats['load_15min_avg'] = mean(loads_15min)
         
-        if temps:
-            stats['temp_avg'] = statistics.mean(temps)
-            stats['temp_max'] = max(temps)
-            stats['temp_min'] = min(temps)
+        # A zero temperature means no sensor was found
+        temps = present(column(cpu['temperature_celsius']), drop_zero=True)
+        stats.update(prefixed('temp', describe(temps)))
         
         return stats
     
-    def calculate_memory_stats(self, metrics_list: List[Dict[str, Any]]) -> Dict[str, float]:
+    def calculate_memory_stats(self, metrics_list: Union[Iterable[Dict[str, Any]], SeriesColumns]) -> Dict[str, float]:
         """Calculate memory statistics"""
-        mem_used_percent = []
-        swap_used_percent = []
+        memory = {field: column(values) for field, values in self.series_columns(metrics_list).memory.items()}
         
-        for metrics in metrics_list:
-            memory = metrics.get('memory', {})
-            
-            total_kb = memory.get('total_kb', 0)
-            available_kb = memory.get('available_kb', 0)
-            if total_kb > 0:
-                used_kb = total_kb - available_kb
-                used_percent = (used_kb / total_kb) * 100
-                mem_used_percent.append(used_percent)
-            
-            swap_total = memory.get('swap_total_kb', 0)
-            swap_used = memory.get('swap_used_kb', 0)
-            if swap_total > 0:
-                swap_percent = (swap_used / swap_total) * 100
-                swap_used_percent.append(swap_percent)
-        
-        stats = {}
+        used = subtract(memory['total_kb'], memory['available_kb'])
+        stats = prefixed('memory_used', describe(present(percent(used, memory['total_kb']))))
         
-        if mem_used_percent:
-            stats['memory_used_avg'] = statistics.mean(mem_used_percent)
-            stats['memory_used_max'] = max(mem_used_percent)
-            stats['memory_used_min'] = min(mem_used_percent)
-        
-        if swap_used_percent:
-            stats['swap_used_avg'] = statistics.mean(swap_used_percent)
-            stats['swap_used_max'] = max(swap_used_percent)
+        swap = percent(memory['swap_used_kb'], memory['swap_total_kb'])
+        stats.update(prefixed('swap_used', describe(present(swap))))
         
         return stats
     
-    def calculate_disk_stats(self, metrics_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def calculate_disk_stats(self, metrics_list: Union[Iterable[Dict[str, Any]], SeriesColumns]) -> Dict[str, Any]:
         """Calculate disk statistics"""
-        disk_usage = {}
-        
-        for metrics in metrics_list:
-            disk = metrics.get('disk', {})
-            filesystems = disk.get('filesystems', [])
-            
-            for fs in filesystems:
-                mount_point = fs.get('mount_point', 'unknown')
-                use_percent = fs.get('use_percent', 0)
-                
-                if mount_point not in disk_usage:
-                    disk_usage[mount_point] = []
-                disk_usage[mount_point].append(use_percent)
-        
-        stats = {}
-        for mount_point, percentages in disk_usage.items():
-            if percentages:
-                stats[mount_point] = {
-                    'avg': statistics.mean(percentages),
-                    'max': max(percentages),
-                    'min': min(percentages)
-                }
+        series = self.series_columns(metrics_list)
+        usage = group(series.mount_points, column(series.disk_usage))
         
-        return stats
+        return {mount_point: describe(present(percentages))
+                for mount_point, percentages in usage.items()}
     
-    def calculate_network_stats(self, metrics_list: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Calculate network statistics"""
-        if len(metrics_list) < 2:
-            return {}
-        
-        # Calculate rates between first and last metrics
-        first_metrics = metrics_list[0]
-        last_metrics = metrics_list[-1]
-        
-        time_diff = last_metrics.get('timestamp', 0) - first_metrics.get('timestamp', 0)
-        if time_diff <= 0:
-            return {}
+    def summarize_window(self, window) -> Dict[str, Any]:
+        """Turn merged aggregate statistics into the cpu/memory/disk/network summary sections"""
+        stats = window.stats
+        cpu = {}
+        if 'cpu.load_1min' in stats:
+            load = stats['cpu.load_1min']
+            cpu.update({'load_1min_avg': load.mean, 'load_1min_max': load.max,
+                        'load_1min_min': load.min, 'load_1min_stddev': load.stddev})
+        if 'cpu.load_5min' in stats:
+            cpu['load_5min_avg'] = stats['cpu.load_5min'].mean
+        if 'cpu.load_15min' in stats:
+            cpu['load_15min_avg'] = stats['cpu.load_15min'].mean
+        if 'cpu.temperature' in stats:
+            temp = stats['cpu.temperature']
+            cpu.update({'temp_avg': temp.mean, 'temp_max': temp.max, 'temp_min': temp.min})
+        
+        memory = {}
+        if 'memory.used_percent' in stats:
+            used = stats['memory.used_percent']
+            memory.update({'memory_used_avg': used.mean, 'memory_used_max': used.max,
+                           'memory_used_min': used.min, 'memory_used_stddev': used.stddev})
+        if 'memory.swap_used_percent' in stats:
+            swap = stats['memory.swap_used_percent']
+            memory.update({'swap_used_avg': swap.mean, 'swap_used_max': swap.max})
+        
+        disk = {}
+        for key, usage in stats.items():
+            if key.startswith('disk:'):
+                disk[key[len('disk:'):]] = {'avg': usage.mean, 'max': usage.max,
+                                            'min': usage.min, 'stddev': usage.stddev}
+        
+        network = {}
+        for name, counters in window.network.items():
+            first_ts, first_rx, first_tx = counters['first'][:3]
+            last_ts, last_rx, last_tx, rx_errors, tx_errors, status = counters['last']
+            time_diff = last_ts - first_ts
+            if time_diff <= 0:
+                continue
+            network[name] = {
+                'rx_rate_mbps': round(((last_rx - first_rx) * 8) / (time_diff * 1_000_000), 2),
+                'tx_rate_mbps': round(((last_tx - first_tx) * 8) / (time_diff * 1_000_000), 2),
+                'rx_errors': rx_errors,
+                'tx_errors': tx_errors,
+                'status': status
+            }
         
-        network_stats = {}
-        
-        first_interfaces = {iface['interface']: iface 
-                           for iface in first_metrics.get('network', {}).get('interfaces', [])}
-        last_interfaces = {iface['interface']: iface 
-                          for iface in last_metrics.get('network', {}).get('interfaces', [])}
-        
-        for iface_name in first_interfaces.keys():
-            if iface_name in last_interfaces:
-                first = first_interfaces[iface_name]
-                last = last_interfaces[iface_name]
-                
-                rx_bytes_diff = last['rx_bytes'] - first['rx_bytes']
-                tx_bytes_diff = last['tx_bytes'] - first['tx_bytes']
-                
-                rx_rate_mbps = (rx_bytes_diff * 8) / (time_diff * 1_000_000)
-                tx_rate_mbps = (tx_bytes_diff * 8) / (time_diff * 1_000_000)
-                
-                network_stats[iface_name] = {
-                    'rx_rate_mbps': round(rx_rate_mbps, 2),
-                    'tx_rate_mbps': round(tx_rate_mbps, 2),
-                    'rx_errors': last['rx_errors'],
-                    'tx_errors': last['tx_errors'],
-                    'status': last['status']
-                }
-        
-        return network_stats
+        return {'cpu': cpu, 'memory': memory, 'disk': disk, 'network': network}
     
     def generate_summary(self, hours: int = 1) -> Dict[str, Any]:
-        """Generate summary statistics"""
-        metrics_list = self.load_recent_metrics(hours)
-        
-        if not metrics_list:
+        """Generate summary statistics from the incremental aggregates"""
+        cutoff_timestamp = int((datetime.now() - timedelta(hours=hours)).timestamp())
+        
+        with self.aggregator.locked() as aggregator:
+            # Normally a no-op: the monitor folds each sample in as it is stored
+            if aggregator.catch_up(self.store):
+                aggregator.save_state()
+            level = aggregator.select_tier(
+                cutoff_timestamp, max(60, hours * 3600 * SUMMARY_BUCKET_FRACTION))
+            window = aggregator.window(cutoff_timestamp, level)
+            covered_to = aggregator.last_timestamp
+            system = aggregator.system
+        
+        if window is None or window.count == 0:
             return {
                 'error': 'No metrics available',
                 'timestamp': datetime.now().isoformat()
@@ -216,17 +319,34 @@ class MetricsProcessor:
         summary = {
             'timestamp': datetime.now().isoformat(),
             'period_hours': hours,
-            'samples_count': len(metrics_list),
-            'cpu': self.calculate_cpu_stats(metrics_list),
-            'memory': self.calculate_memory_stats(metrics_list),
-            'disk': self.calculate_disk_stats(metrics_list),
-            'network': self.calculate_network_stats(metrics_list)
+            'samples_count': window.count,
+            'resolution': aggregator.tiers[level][1],
+            # The oldest bucket read; a finest-tier bucket only partly in the period is left out
+            'covered_from': datetime.fromtimestamp(window.start).isoformat(),
+            'covered_to': datetime.fromtimestamp(covered_to).isoformat()
         }
+        summary.update(self.summarize_window(window))
+        
+        # Percentiles need every sample, so windows short enough to read in full
+        # are recomputed from the raw segments
+        if hours <= SUMMARY_PERCENTILE_HOURS:
+            series = self.series_columns(self.iter_recent_metrics(hours))
+            if series.count:
+                summary['cpu'].update(self.calculate_cpu_stats(series))
+                summary['memory'].update(self.calculate_memory_stats(series))
+                summary['disk'].update(self.calculate_disk_stats(series))
+                summary['samples_count'] = series.count
+                summary['resolution'] = 'raw'
+                summary['covered_from'] = datetime.fromtimestamp(cutoff_timestamp).isoformat()
+        
+        # Disk, memory and swap trends over the forecast window, whatever the period
+        try:
+            summary['forecast'] = self.forecaster.refresh()
+        except Exception as e:
+            print(f"Error forecasting usage: {e}", file=sys.stderr)
         
         # Add latest system info
-        if metrics_list:
-            latest = metrics_list[-1]
-            summary['system'] = latest.get('system', {})
+        summary['system'] = system
         
         return summary
     
@@ -247,92 +367,137 @@ class MetricsProcessor:
         print(f"Summary saved to {filepath}")
         return filepath
     
-    def generate_html_report(self, hours: int = 24) -> str:
-        """Generate HTML report"""
-        summary = self.generate_summary(hours)
-        
-        html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>System Monitoring Report</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-            background: #f5f5f5;
-        }}
-        .header {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            border-radius: 10px;
-            margin-bottom: 30px;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 2em;
-        }}
-        .header .subtitle {{
-            opacity: 0.9;
-            margin-top: 10px;
-        }}
-        .section {{
-            background: white;
-            padding: 25px;
-            margin-bottom: 20px;
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }}
-        .section h2 {{
-            margin-top: 0;
-            color: #333;
-            border-bottom: 2px solid #667eea;
-            padding-bottom: 10px;
-        }}
-        .metric {{
-            display: flex;
-            justify-content: space-between;
-            padding: 10px 0;
-            border-bottom: 1px solid #eee;
-        }}
-        .metric:last-child {{
-            border-bottom: none;
-        }}
-        .metric-name {{
-            color: #666;
-        }}
-        .metric-value {{
-            font-weight: bold;
-            color: #333;
-        }}
-        .status-good {{ color: #27ae60; }}
-        .status-warning {{ color: #f39c12; }}
-        .status-critical {{ color: #e74c3c; }}
-        .grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>System Monitoring Report</h1>
-        <div class="subtitle">
-            Generated: {summary.get('timestamp', 'N/A')}<br>
-            Period: Last {hours} hour(s) | Samples: {summary.get('samples_count', 0)}
+    def report_range(self, hours: int) -> Dict[str, Any]:
+        """Chart range of a report: the closed buckets of the coarsest tier that fits
+        
+        The range only moves when a chart bucket closes, and the rollup version
+        only changes while the tiers are still catching up with it, so together
+        they identify the data behind every chart.
+        """
+        resolution = max(60, -(-hours * 3600 // REPORT_POINTS))
+        now = int(datetime.now().timestamp())
+        end = now - now % resolution
+        start = end - hours * 3600
+        start -= start % resolution
+        
+        with self.aggregator.locked() as aggregator:
+            if aggregator.catch_up(self.store):
+                aggregator.save_state()
+            level = aggregator.select_tier(start, resolution)
+            version = min(aggregator.last_timestamp, end)
+        
+        return {'start': start, 'end': end, 'resolution': resolution,
+                'level': level, 'tier': self.aggregator.tiers[level][1], 'version': version}
+    
+    def report_series(self, chart: Dict[str, Any], previous: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Downsample the chart range into per-bucket series for the report sparklines
+        
+        Returns the chart, its series and the network counters behind the
+        rates. Given the result for an earlier range at the same resolution,
+        its slots are shifted into place and only the buckets it had not seen
+        complete are read from the tier.
+        """
+        resolution = chart['resolution']
+        slots = (chart['end'] - chart['start']) // resolution
+        
+        def empty():
+            return [None] * slots
+        
+        def shift(values, offset):
+            kept = values[offset:offset + slots]
+            return kept + [None] * (slots - len(kept))
+        
+        old = previous['chart'] if previous else None
+        if (old and old['resolution'] == resolution and old['level'] == chart['level']
+                and chart['start'] >= old['start'] and chart['end'] >= old['end']):
+            offset = (chart['start'] - old['start']) // resolution
+            series = {
+                'load': shift(previous['series']['load'], offset),
+                'load_band': shift(previous['series']['load_band'], offset),
+                'memory': shift(previous['series']['memory'], offset),
+                'disk': {mount_point: shift(values, offset)
+                         for mount_point, values in previous['series']['disk'].items()},
+                'network': {iface: {direction: shift(values, offset) for direction, values in rates.items()}
+                            for iface, rates in previous['series']['network'].items()}
+            }
+            counters = {iface: {direction: shift(values, offset) for direction, values in directions.items()}
+                        for iface, directions in previous['counters'].items()}
+            # The tier bucket holding the old version may have been partial, so its slot is read again
+            partial = old['version'] - old['version'] % self.aggregator.tiers[chart['level']][0]
+            read_from = max(chart['start'], partial - partial % resolution)
+        else:
+            series = {'load': empty(), 'load_band': empty(), 'memory': empty(), 'disk': {}, 'network': {}}
+            counters = {}
+            read_from = chart['start']
+        first = (read_from - chart['start']) // resolution
+        
+        if first >= slots:
+            return {'chart': chart, 'series': series, 'counters': counters}
+        with self.aggregator.locked() as aggregator:
+            buckets = aggregator.history(read_from, resolution, chart['level'])
+        
+        # Slots being read again start empty, as a bucket may have lost series
+        for values in [series['load'], series['load_band'], series['memory'], *series['disk'].values(),
+                       *(values for directions in counters.values() for values in directions.values())]:
+            values[first:] = [None] * (slots - first)
+        
+        for bucket in buckets:
+            index = (bucket['timestamp'] - chart['start']) // resolution
+            if not first <= index < slots:
+                continue
+            values = bucket['series']
+            
+            load = values.get('cpu.load_1min')
+            if load:
+                series['load'][index] = round(load['avg'], 3)
+                series['load_band'][index] = [round(load['min'], 3), round(load['max'], 3)]
+            
+            total = values.get('memory.total_kb')
+            available = values.get('memory.available_kb')
+            if total and available and total['avg'] > 0:
+                series['memory'][index] = round((total['avg'] - available['avg']) / total['avg'] * 100, 2)
+            
+            for path, value in values.items():
+                match = DISK_PATH.fullmatch(path)
+                if match:
+                    series['disk'].setdefault(match.group(1), empty())[index] = round(value['avg'], 2)
+                    continue
+                match = NETWORK_PATH.fullmatch(path)
+                if match:
+                    counters.setdefault(match.group(1), {}).setdefault(match.group(2), empty())[index] = value['last']
+        
+        # Interface rates from the counter difference between consecutive buckets
+        for iface, directions in counters.items():
+            rates = series['network'].setdefault(iface, {})
+            for direction, lasts in directions.items():
+                values = rates.setdefault(direction, empty())
+                # The first slot has no earlier counter in range, even if one was shifted out
+                values[0] = None
+                values[first:] = [None] * (slots - first)
+                for index in range(max(first, 1), slots):
+                    before, current = lasts[index - 1], lasts[index]
+                    if before is not None and current is not None and current >= before:
+                        values[index] = round((current - before) * 8 / (resolution * 1_000_000), 3)
+        
+        return {'chart': chart, 'series': series, 'counters': counters}
+    
+    def chart(self, values: List[Any], caption: str, color: str = '#667eea', band=None) -> str:
+        """Wrap a sparkline and its caption, or return '' if there is no data"""
+        svg = sparkline(values, color=color, band=band, label=caption)
+        if not svg:
+            return ''
+        return f"""
+        <div class="chart">
+            {svg}
+            <div class="chart-caption">{caption}</div>
         </div>
-    </div>
 """
-        
-        # System Info
-        system = summary.get('system', {})
-        if system:
-            html += f"""
+    
+    def render_system_section(self, system: Dict[str, Any], series: Any) -> str:
+        """Render the system information section"""
+        if not system:
+            return ''
+        return f"""
     <div class="section">
         <h2>System Information</h2>
         <div class="metric">
@@ -353,17 +518,18 @@ class MetricsProcessor:
         </div>
     </div>
 """
-        
-        # CPU Stats
-        cpu = summary.get('cpu', {})
-        if cpu:
-            html += f"""
+    
+    def render_cpu_section(self, cpu: Dict[str, Any], series: Dict[str, Any]) -> str:
+        """Render the CPU section with a load sparkline"""
+        if not cpu:
+            return ''
+        html = f"""
     <div class="section">
         <h2>CPU Statistics</h2>
         <div class="grid">
 """
-            if 'load_1min_avg' in cpu:
-                html += f"""
+        if 'load_1min_avg' in cpu:
+            html += f"""
             <div class="metric">
                 <span class="metric-name">Average Load (1min):</span>
                 <span class="metric-value">{cpu['load_1min_avg']:.2f}</span>
@@ -373,8 +539,15 @@ class MetricsProcessor:
                 <span class="metric-value">{cpu['load_1min_max']:.2f}</span>
             </div>
 """
-            if 'temp_avg' in cpu:
-                html += f"""
+        if 'load_1min_p95' in cpu:
+            html += f"""
+            <div class="metric">
+                <span class="metric-name">95th Percentile Load (1min):</span>
+                <span class="metric-value">{cpu['load_1min_p95']:.2f}</span>
+            </div>
+"""
+        if 'temp_avg' in cpu:
+            html += f"""
             <div class="metric">
                 <span class="metric-name">Average Temperature:</span>
                 <span class="metric-value">{cpu['temp_avg']:.1f}°C</span>
@@ -384,21 +557,27 @@ class MetricsProcessor:
                 <span class="metric-value">{cpu['temp_max']:.1f}°C</span>
             </div>
 """
-            html += """
+        html += """
         </div>
+"""
+        html += self.chart(series['load'], "Load (1min), average with min/max band",
+                           band=series['load_band'])
+        html += """
     </div>
 """
-        
-        # Memory Stats
-        memory = summary.get('memory', {})
-        if memory:
-            html += f"""
+        return html
+    
+    def render_memory_section(self, memory: Dict[str, Any], series: Dict[str, Any]) -> str:
+        """Render the memory section with a usage sparkline"""
+        if not memory:
+            return ''
+        html = f"""
     <div class="section">
         <h2>Memory Statistics</h2>
         <div class="grid">
 """
-            if 'memory_used_avg' in memory:
-                html += f"""
+        if 'memory_used_avg' in memory:
+            html += f"""
             <div class="metric">
                 <span class="metric-name">Average Usage:</span>
                 <span class="metric-value">{memory['memory_used_avg']:.1f}%</span>
@@ -408,51 +587,68 @@ class MetricsProcessor:
                 <span class="metric-value">{memory['memory_used_max']:.1f}%</span>
             </div>
 """
-            if 'swap_used_avg' in memory:
-                html += f"""
+        if 'memory_used_p95' in memory:
+            html += f"""
+            <div class="metric">
+                <span class="metric-name">95th Percentile Usage:</span>
+                <span class="metric-value">{memory['memory_used_p95']:.1f}%</span>
+            </div>
+"""
+        if 'swap_used_avg' in memory:
+            html += f"""
             <div class="metric">
                 <span class="metric-name">Average Swap:</span>
                 <span class="metric-value">{memory['swap_used_avg']:.1f}%</span>
             </div>
 """
-            html += """
+        html += """
         </div>
+"""
+        html += self.chart(series['memory'], "Memory used (%)", color='#764ba2')
+        html += """
     </div>
 """
-        
-        # Disk Stats
-        disk = summary.get('disk', {})
-        if disk:
-            html += """
+        return html
+    
+    def render_disk_section(self, disk: Dict[str, Any], series: Dict[str, Any]) -> str:
+        """Render the disk section with a usage sparkline per mount point"""
+        if not disk:
+            return ''
+        html = """
     <div class="section">
         <h2>Disk Usage</h2>
 """
-            for mount_point, stats in disk.items():
-                status_class = 'status-good'
-                if stats['max'] > 90:
-                    status_class = 'status-critical'
-                elif stats['max'] > 75:
-                    status_class = 'status-warning'
-                
-                html += f"""
+        for mount_point, stats in disk.items():
+            status_class = 'status-good'
+            if stats['max'] > 90:
+                status_class = 'status-critical'
+            elif stats['max'] > 75:
+                status_class = 'status-warning'
+            p95 = f"{stats['p95']:.1f}% p95, " if 'p95' in stats else ''
+            
+            html += f"""
         <div class="metric">
             <span class="metric-name">{mount_point}:</span>
-            <span class="metric-value {status_class}">{stats['avg']:.1f}% avg, {stats['max']:.1f}% peak</span>
+            <span class="metric-value {status_class}">{stats['avg']:.1f}% avg, {p95}{stats['max']:.1f}% peak</span>
         </div>
 """
-            html += """
+            html += self.chart(series.get(mount_point, []), f"{mount_point} used (%)",
+                               color='#27ae60')
+        html += """
     </div>
 """
-        
-        # Network Stats
-        network = summary.get('network', {})
-        if network:
-            html += """
+        return html
+    
+    def render_network_section(self, network: Dict[str, Any], series: Dict[str, Any]) -> str:
+        """Render the network section with RX/TX rate sparklines per interface"""
+        if not network:
+            return ''
+        html = """
     <div class="section">
         <h2>Network Statistics</h2>
 """
-            for iface, stats in network.items():
-                html += f"""
+        for iface, stats in network.items():
+            html += f"""
         <h3>{iface}</h3>
         <div class="metric">
             <span class="metric-name">RX Rate:</span>
@@ -471,15 +667,122 @@ class MetricsProcessor:
             <span class="metric-value">{stats['tx_errors']}</span>
         </div>
 """
-            html += """
+            rates = series.get(iface, {})
+            html += self.chart(rates.get('rx_bytes', []), "RX Mbps", color='#2980b9')
+            html += self.chart(rates.get('tx_bytes', []), "TX Mbps", color='#e67e22')
+        html += """
+    </div>
+"""
+        return html
+    
+    def render_forecast_section(self, forecast: Dict[str, Any], series: Any) -> str:
+        """Render the time-to-threshold estimates of each disk, memory and swap"""
+        rows = [(mount_point, result) for mount_point, result in forecast.get('disk', {}).items()]
+        rows += [(label, forecast[name]) for name, label in (('memory', 'Memory'), ('swap', 'Swap'))
+                 if name in forecast]
+        if not rows:
+            return ''
+        html = f"""
+    <div class="section">
+        <h2>Capacity Forecast</h2>
+        <div class="chart-caption">Theil–Sen trend over the last {forecast['window_hours']:g} hours of {forecast['resolution']} buckets</div>
+"""
+        for label, result in rows:
+            hours_left = result['hours_to_threshold']
+            status_class = 'status-good'
+            if hours_left is not None and hours_left <= 72:
+                status_class = 'status-critical'
+            elif hours_left is not None and hours_left <= 24 * 14:
+                status_class = 'status-warning'
+            
+            html += f"""
+        <div class="metric">
+            <span class="metric-name">{label}:</span>
+            <span class="metric-value {status_class}">{result['current']:.1f}% now, {result['trend_per_day']:+.2f}%/day, {result['threshold']:g}% {format_hours(hours_left)}, full {format_hours(result['hours_to_full'])}</span>
+        </div>
+"""
+        html += """
     </div>
 """
+        return html
+    
+    def generate_html_report(self, hours: int = 24) -> str:
+        """Generate HTML report
+        
+        The summary is cached per chart range and rollup version. The chart
+        series are extended by the buckets closed since the last report, and
+        every section is cached under a hash of its own inputs, so a
+        regenerated report only recomputes what changed.
+        """
+        cache = SectionCache(self.reports_dir / f".report_cache_{hours}h.json")
+        chart = self.report_range(hours)
+        
+        summary_key = cache_key(hours, chart['end'], chart['version'])
+        summary = cache.get('summary', summary_key)
+        if summary is None:
+            summary = self.generate_summary(hours)
+            cache.put('summary', summary_key, summary)
+        
+        # Stored under a fixed key: the previous range is the starting point, not a match
+        series_key = cache_key(hours, chart['resolution'], chart['level'])
+        previous = cache.get('series', series_key)
+        if previous is None or previous['chart'] != chart:
+            previous = self.report_series(chart, previous)
+            cache.put('series', series_key, previous)
+        series = previous['series']
+        
+        range_label = (f"{datetime.fromtimestamp(chart['start']).strftime('%Y-%m-%d %H:%M')} to "
+                       f"{datetime.fromtimestamp(chart['end']).strftime('%Y-%m-%d %H:%M')}, "
+                       f"{chart['resolution'] // 60} min buckets from the {chart['tier']} tier")
+        
+        html = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>System Monitoring Report</title>
+    <style>
+{REPORT_STYLE}    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>System Monitoring Report</h1>
+        <div class="subtitle">
+            Generated: {datetime.now().isoformat()}<br>
+            Period: Last {hours} hour(s) | Samples: {summary.get('samples_count', 0)}<br>
+            Charts: {range_label}
+        </div>
+    </div>
+"""
+        
+        sections = [
+            ('system', self.render_system_section, summary.get('system', {}), None),
+            ('cpu', self.render_cpu_section, summary.get('cpu', {}),
+             {'load': series['load'], 'load_band': series['load_band']}),
+            ('memory', self.render_memory_section, summary.get('memory', {}), {'memory': series['memory']}),
+            ('disk', self.render_disk_section, summary.get('disk', {}), series['disk']),
+            ('network', self.render_network_section, summary.get('network', {}), series['network']),
+            ('forecast', self.render_forecast_section, summary.get('forecast', {}), None),
+        ]
+        for name, render, stats, section_series in sections:
+            key = cache_key(name, stats, section_series)
+            section_html = cache.get(name, key)
+            if section_html is None:
+                section_html = render(stats, section_series)
+                cache.put(name, key, section_html)
+            html += section_html
         
         html += """
 </body>
 </html>
 """
         
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Error saving report cache: {e}", file=sys.stderr)
+        self.report_cache_stats = {'reused': cache.hits, 'computed': cache.misses}
+        
         return html
     
     def save_html_report(self, hours: int = 24):
@@ -497,7 +800,9 @@ class MetricsProcessor:
         with open(latest_path, 'w') as f:
             f.write(html)
         
-        print(f"HTML report saved to {filepath}")
+        print(f"HTML report saved to {filepath} "
+              f"({self.report_cache_stats.get('reused', 0)} cached parts reused, "
+              f"{self.report_cache_stats.get('computed', 0)} computed)")
         return filepath
     
     def cleanup_old_files(self, days: int = 7):
@@ -507,15 +812,9 @@ class MetricsProcessor:
         
         deleted_count = 0
         
-        # Clean metrics
-        for filepath in self.data_dir.glob('metrics_*.json'):
-            try:
-                timestamp = int(filepath.stem.split('_')[1])
-                if timestamp < cutoff_timestamp:
-                    filepath.unlink()
-                    deleted_count += 1
-            except (ValueError, IndexError):
-                continue
+        # Old metrics are compacted into the archive rather than deleted
+        # (whole segments only, so a partial hour is never cut)
+        self.compact(days * 24)
         
         # Clean reports
         for filepath in self.reports_dir.glob('report_*.html'):
@@ -529,6 +828,60 @@ class MetricsProcessor:
         
         print(f"Cleaned up {deleted_count} old files")
         return deleted_count
+    
+    def compact(self, hours: float = COMPACT_AFTER_HOURS) -> int:
+        """Archive segments older than hours and apply the archive retention"""
+        cutoff_timestamp = int((datetime.now() - timedelta(hours=hours)).timestamp())
+        compacted = self.store.compact(cutoff_timestamp)
+        pruned = self.store.prune_archives(ARCHIVE_RETENTION_DAYS, int(ARCHIVE_MAX_MB * 1024 * 1024))
+        
+        archives = self.store.list_archives()
+        archive_bytes = sum(filepath.stat().st_size for filepath in archives)
+        print(f"Compacted {compacted} segments, pruned {pruned} archives "
+              f"({len(archives)} archives, {archive_bytes / 1024 / 1024:.1f} MB)")
+        return compacted
+    
+    def rollup(self) -> int:
+        """Bring the rollup tiers up to date and apply their retention"""
+        with self.aggregator.locked() as aggregator:
+            added = aggregator.catch_up(self.store)
+            aggregator.prune()
+            aggregator.save_state()
+        
+        print(f"Rolled up {added} new samples")
+        for level, (seconds, name, retention) in enumerate(self.aggregator.tiers):
+            tier_file = self.aggregator.tier_file(level)
+            buckets = 0
+            if tier_file.exists():
+                with open(tier_file, 'r') as f:
+                    buckets = sum(1 for _ in f)
+            print(f"  {name:>3}: {buckets} buckets (retention {retention:g}h)")
+        return added
+    
+    def check_index(self) -> int:
+        """Verify every segment index, returning the number of bad segments"""
+        segments = self.store.list_segments()
+        bad_segments = 0
+        
+        for filepath in segments:
+            problems = self.store.check_index(filepath)
+            if problems:
+                bad_segments += 1
+                print(f"{filepath.name}: {'; '.join(problems)}")
+        
+        print(f"Checked {len(segments)} segments, {bad_segments} inconsistent")
+        return bad_segments
+    
+    def rebuild_index(self) -> int:
+        """Rebuild every segment index from the segment contents"""
+        segments = self.store.list_segments()
+        entries = 0
+        
+        for filepath in segments:
+            entries += self.store.rebuild_index(filepath)
+        
+        print(f"Rebuilt {len(segments)} segment indexes ({entries} samples)")
+        return entries
 
 
 def main():
@@ -536,7 +889,8 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Process system monitoring data')
-    parser.add_argument('action', choices=['summary', 'report', 'cleanup'],
+    parser.add_argument('action', choices=['summary', 'report', 'cleanup', 'rollup', 'compact',
+                                           'check-index', 'rebuild-index'],
                        help='Action to perform')
     parser.add_argument('--hours', type=int, default=1,
                        help='Number of hours to analyze (default: 1)')
@@ -557,6 +911,19 @@ def main():
     
     elif args.action == 'cleanup':
         processor.cleanup_old_files(args.days)
+    
+    elif args.action == 'rollup':
+        processor.rollup()
+    
+    elif args.action == 'compact':
+        processor.compact()
+    
+    elif args.action == 'check-index':
+        if processor.check_index():
+            sys.exit(1)
+    
+    elif args.action == 'rebuild-index':
+        processor.rebuild_index()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Prometheus Exposition
+Render a metrics sample in the Prometheus text exposition format
+"""
+
+import math
+from typing import Dict, List, Any, Optional
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'taskmania_'
+
+KB = 1024
+MB = 1024 * 1024
+SECTOR = 512
+
+# Single-valued metrics: (section, field, name, type, help, scale)
+SCALARS = [
+    ('system', 'uptime_seconds', 'system_uptime_seconds', 'gauge', 'Seconds since boot', 1),
+    ('system', 'process_count', 'system_processes', 'gauge', 'Number of processes', 1),
+    ('cpu', 'load_1min', 'cpu_load1', 'gauge', '1-minute load average', 1),
+    ('cpu', 'load_5min', 'cpu_load5', 'gauge', '5-minute load average', 1),
+    ('cpu', 'load_15min', 'cpu_load15', 'gauge', '15-minute load average', 1),
+    ('cpu', 'core_count', 'cpu_cores', 'gauge', 'Number of CPU cores', 1),
+    ('cpu', 'temperature_celsius', 'cpu_temperature_celsius', 'gauge', 'CPU temperature', 1),
+    ('memory', 'total_kb', 'memory_total_bytes', 'gauge', 'Total memory', KB),
+    ('memory', 'free_kb', 'memory_free_bytes', 'gauge', 'Free memory', KB),
+    ('memory', 'available_kb', 'memory_available_bytes', 'gauge', 'Available memory', KB),
+    ('memory', 'used_kb', 'memory_used_bytes', 'gauge', 'Used memory', KB),
+    ('memory', 'buffers_kb', 'memory_buffers_bytes', 'gauge', 'Memory used for buffers', KB),
+    ('memory', 'cached_kb', 'memory_cached_bytes', 'gauge', 'Memory used for page cache', KB),
+    ('memory', 'swap_total_kb', 'swap_total_bytes', 'gauge', 'Total swap', KB),
+    ('memory', 'swap_used_kb', 'swap_used_bytes', 'gauge', 'Used swap', KB),
+    ('memory', 'swap_free_kb', 'swap_free_bytes', 'gauge', 'Free swap', KB),
+]
+
+# Per-entry metrics: (section, list, [(field, label)], [(field, name, type, help, scale)])
+LISTS = [
+    ('disk', 'filesystems', [('mount_point', 'mountpoint'), ('device', 'device')], [
+        ('total_kb', 'filesystem_size_bytes', 'gauge', 'Filesystem size', KB),
+        ('used_kb', 'filesystem_used_bytes', 'gauge', 'Filesystem space used', KB),
+        ('available_kb', 'filesystem_avail_bytes', 'gauge', 'Filesystem space available', KB),
+        ('use_percent', 'filesystem_used_percent', 'gauge', 'Filesystem space used in percent', 1),
+    ]),
+    ('disk', 'io_stats', [('device', 'device')], [
+        ('reads', 'disk_reads_completed_total', 'counter', 'Reads completed', 1),
+        ('reads_merged', 'disk_reads_merged_total', 'counter', 'Reads merged', 1),
+        ('sectors_read', 'disk_read_bytes_total', 'counter', 'Bytes read', SECTOR),
+        ('writes', 'disk_writes_completed_total', 'counter', 'Writes completed', 1),
+        ('writes_merged', 'disk_writes_merged_total', 'counter', 'Writes merged', 1),
+        ('sectors_written', 'disk_written_bytes_total', 'counter', 'Bytes written', SECTOR),
+        ('io_in_progress', 'disk_io_now', 'gauge', 'I/Os currently in progress', 1),
+    ]),
+    ('network', 'interfaces', [('interface', 'interface')], [
+        ('rx_bytes', 'network_receive_bytes_total', 'counter', 'Bytes received', 1),
+        ('rx_packets', 'network_receive_packets_total', 'counter', 'Packets received', 1),
+        ('rx_errors', 'network_receive_errs_total', 'counter', 'Receive errors', 1),
+        ('rx_dropped', 'network_receive_drop_total', 'counter', 'Received packets dropped', 1),
+        ('tx_bytes', 'network_transmit_bytes_total', 'counter', 'Bytes transmitted', 1),
+        ('tx_packets', 'network_transmit_packets_total', 'counter', 'Packets transmitted', 1),
+        ('tx_errors', 'network_transmit_errs_total', 'counter', 'Transmit errors', 1),
+        ('tx_dropped', 'network_transmit_drop_total', 'counter', 'Transmitted packets dropped', 1),
+    ]),
+    ('gpu', 'devices', [('id', 'gpu'), ('name', 'name'), ('vendor', 'vendor')], [
+        ('temperature_celsius', 'gpu_temperature_celsius', 'gauge', 'GPU temperature', 1),
+        ('utilization_percent', 'gpu_utilization_percent', 'gauge', 'GPU utilization', 1),
+        ('memory_used_mb', 'gpu_memory_used_bytes', 'gauge', 'GPU memory used', MB),
+        ('memory_total_mb', 'gpu_memory_total_bytes', 'gauge', 'GPU memory total', MB),
+        ('power_draw_watts', 'gpu_power_draw_watts', 'gauge', 'GPU power draw', 1),
+        ('power_limit_watts', 'gpu_power_limit_watts', 'gauge', 'GPU power limit', 1),
+        ('fan_speed_percent', 'gpu_fan_speed_percent', 'gauge', 'GPU fan speed', 1),
+    ]),
+]
+
+INFO_LABELS = [('hostname', 'hostname'), ('os_name', 'os'), ('kernel', 'kernel'),
+               ('architecture', 'architecture')]
+
+
+def escape_label(value: Any) -> str:
+    """Escape a label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value: Any, scale: int = 1) -> Optional[str]:
+    """Format a sample value, or None if it is not numeric"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    value = value * scale
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def format_labels(pairs: List[tuple]) -> str:
+    """Format {name="value",...} from (name, value) pairs"""
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def family(lines: List[str], name: str, kind: str, help_text: str, samples: List[str]):
+    """Append one metric family; families without samples are left out"""
+    if samples:
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        lines.extend(samples)
+
+
+def render(metrics: Dict[str, Any]) -> str:
+    """Render a sample as exposition text"""
+    lines = []
+
+    system = metrics.get('system') or {}
+    info = [(label, system[key]) for key, label in INFO_LABELS if system.get(key) not in (None, '')]
+    family(lines, 'system_info', 'gauge', 'Host information', [f"{PREFIX}system_info{format_labels(info)} 1"])
+
+    timestamp = format_number(metrics.get('timestamp'))
+    family(lines, 'sample_timestamp_seconds', 'gauge', 'Collection time of the latest sample',
+           [f"{PREFIX}sample_timestamp_seconds {timestamp}"] if timestamp else [])
+
+    success = 1 if metrics.get('collection_status') == 'success' else 0
+    family(lines, 'collection_success', 'gauge', 'Whether the latest collection succeeded',
+           [f"{PREFIX}collection_success {success}"])
+
+    for section, field, name, kind, help_text, scale in SCALARS:
+        value = format_number((metrics.get(section) or {}).get(field), scale)
+        family(lines, name, kind, help_text, [f"{PREFIX}{name} {value}"] if value else [])
+
+    for section, key, label_fields, fields in LISTS:
+        entries = [entry for entry in (metrics.get(section) or {}).get(key) or []
+                   if isinstance(entry, dict)]
+        labels = [format_labels([(label, entry[field]) for field, label in label_fields if field in entry])
+                  for entry in entries]
+
+        for field, name, kind, help_text, scale in fields:
+            samples = []
+            for entry, entry_labels in zip(entries, labels):
+                value = format_number(entry.get(field), scale)
+                if value is not None:
+                    samples.append(f"{PREFIX}{name}{entry_labels} {value}")
+            family(lines, name, kind, help_text, samples)
+
+    return '\n'.join(lines) + '\n'
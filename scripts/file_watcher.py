@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+File Watcher for System Monitoring
+Wakes consumers when files in a directory are written or renamed into place
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO
+
+# struct inotify_event header: wd, mask, cookie, name length
+EVENT_HEADER = struct.Struct('iIII')
+
+# Reported instead of file names when the kernel dropped events
+OVERFLOW = '*'
+
+
+def load_inotify() -> Optional[ctypes.CDLL]:
+    """Return libc if it provides inotify, otherwise None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        # Without a library name (e.g. on musl) the interpreter's own symbols, libc's included, are used
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def file_signature(path) -> Optional[Tuple[int, int, int]]:
+    """Return (inode, mtime_ns, size) for a path, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class FileWatcher:
+    """Block until files in one directory are closed after writing or renamed in
+
+    Uses inotify on Linux. Where inotify is unavailable, or FILE_WATCHER=poll
+    is set, the directory is polled every poll_interval seconds instead.
+    """
+
+    def __init__(self, directory, names: Optional[Iterable[str]] = None, poll_interval: float = 1.0):
+        self.directory = Path(directory)
+        self.names = set(names) if names else None
+        self.poll_interval = poll_interval
+        self.fd = None
+        self.wakeups = 0
+
+        if os.getenv('FILE_WATCHER', 'auto') != 'poll':
+            self.fd = self._open_inotify()
+        self.signatures = self._snapshot() if self.fd is None else {}
+
+    @property
+    def mode(self) -> str:
+        return 'poll' if self.fd is None else 'inotify'
+
+    def _open_inotify(self) -> Optional[int]:
+        libc = load_inotify()
+        if libc is None:
+            return None
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), WATCH_MASK) < 0:
+            # e.g. the directory does not exist yet or the watch limit is reached
+            os.close(fd)
+            return None
+        return fd
+
+    def _snapshot(self) -> Dict[str, Optional[Tuple[int, int, int]]]:
+        if self.names is not None:
+            return {name: file_signature(self.directory / name) for name in self.names}
+        try:
+            return {entry.name: file_signature(entry.path) for entry in os.scandir(self.directory)}
+        except OSError:
+            return {}
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Wait up to timeout seconds (forever if None) and return the changed names"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            changed = self._wait_inotify(remaining) if self.fd is not None else self._wait_poll(remaining)
+            if changed:
+                self.wakeups += 1
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+    def _wait_inotify(self, timeout: Optional[float]) -> Set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                start = offset + EVENT_HEADER.size
+                name = os.fsdecode(data[start:start + length].split(b'\0', 1)[0])
+                offset = start + length
+
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(OVERFLOW)
+                elif mask & IN_IGNORED:
+                    # The directory went away; keep going by polling
+                    os.close(self.fd)
+                    self.fd = None
+                    self.signatures = self._snapshot()
+                    changed.add(OVERFLOW)
+                    return changed
+                elif self.names is None or name in self.names:
+                    changed.add(name)
+
+        return changed
+
+    def _wait_poll(self, timeout: Optional[float]) -> Set[str]:
+        time.sleep(self.poll_interval if timeout is None else min(self.poll_interval, timeout))
+        current = self._snapshot()
+        changed = {name for name, signature in current.items()
+                   if signature is not None and signature != self.signatures.get(name)}
+        self.signatures = current
+        return changed
+
+    def close(self):
+        """Release the inotify descriptor"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Wait for files in a directory to change')
+    parser.add_argument('directory', help='Directory to watch')
+    parser.add_argument('--name', action='append',
+                       help='File name to wait for (repeatable, default: any)')
+    parser.add_argument('--timeout', type=float, default=None,
+                       help='Give up after this many seconds (exit status 1)')
+
+    args = parser.parse_args()
+
+    watcher = FileWatcher(args.directory, names=args.name)
+    changed = watcher.wait(args.timeout)
+    watcher.close()
+
+    for name in sorted(changed):
+        print(name)
+    sys.exit(0 if changed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Capacity Forecasting
+Robust usage trends and time-to-threshold estimates for disks, memory and swap
+"""
+
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from aggregator import Aggregator
+
+# Configuration
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+FORECAST_HOURS = float(os.getenv('FORECAST_HOURS', 24 * 7))
+FORECAST_HORIZON_DAYS = float(os.getenv('FORECAST_HORIZON_DAYS', 365))
+# Same defaults as config/alert_config.conf
+DISK_THRESHOLD = float(os.getenv('DISK_THRESHOLD', 90))
+MEMORY_THRESHOLD = float(os.getenv('MEMORY_THRESHOLD', 85))
+SWAP_THRESHOLD = float(os.getenv('SWAP_THRESHOLD', 70))
+
+# Trends are fitted to the closed buckets of the hourly tier
+FORECAST_BUCKET_SECONDS = 3600
+FORECAST_MIN_POINTS = 6
+# Theil-Sen compares every pair of points, so longer windows are thinned to this many
+FORECAST_MAX_POINTS = int(os.getenv('FORECAST_MAX_POINTS', 500))
+
+DISK_PREFIX = 'disk:'
+MEMORY_KEY = 'memory.used_percent'
+SWAP_KEY = 'memory.swap_used_percent'
+
+
+def thin(points: List[Any], limit: int) -> List[Any]:
+    """Keep at most limit points, evenly spaced and including the first and last"""
+    if limit < 2 or len(points) <= limit:
+        return points
+    step = (len(points) - 1) / (limit - 1)
+    return [points[round(i * step)] for i in range(limit)]
+
+
+def theil_sen(points: List[Tuple[float, float]],
+              max_points: int = FORECAST_MAX_POINTS) -> Optional[Tuple[float, float]]:
+    """Fit y = slope * x + intercept as the median of the pairwise slopes
+
+    Robust to outliers: up to ~29% of the points can be arbitrary without
+    moving the fit. The cost is quadratic in the number of points, so more
+    than max_points are thinned evenly first. Returns None with fewer than
+    two distinct x values.
+    """
+    points = thin(points, max_points)
+    slopes = []
+    for i, (x1, y1) in enumerate(points):
+        for x2, y2 in points[i + 1:]:
+            if x2 != x1:
+                slopes.append((y2 - y1) / (x2 - x1))
+    if not slopes:
+        return None
+    slope = statistics.median(slopes)
+    intercept = statistics.median(y - slope * x for x, y in points)
+    return slope, intercept
+
+
+def crossing_time(slope: float, level: float, now: float, threshold: float,
+                  horizon: float) -> Optional[float]:
+    """Return when a trend at `level` by `now` reaches threshold, or None if not within horizon seconds"""
+    if level >= threshold:
+        return now
+    if slope <= 0:
+        return None
+    eta = now + (threshold - level) / slope
+    return eta if eta - now <= horizon else None
+
+
+class Forecaster:
+    """Usage trends per mount point, memory and swap, persisted under data/aggregates/
+
+    For the FORECAST_HOURS window the hourly points are kept in a small state
+    file and only buckets closed since the last update are read from the
+    rollup tier. Other windows are fitted in memory from the tier, so ad-hoc
+    requests never leave files behind.
+    """
+
+    def __init__(self, data_dir=None, hours: float = FORECAST_HOURS, persist: Optional[bool] = None):
+        self.aggregator = Aggregator(data_dir or DATA_DIR)
+        self.level = next(level for level, (seconds, _, _) in enumerate(self.aggregator.tiers)
+                          if seconds == FORECAST_BUCKET_SECONDS)
+        # The tier holds no points further back than its retention
+        self.hours = min(hours, self.max_hours)
+        self.persist = hours == FORECAST_HOURS if persist is None else persist
+        self.state_file = self.aggregator.directory / f"forecast-{self.hours:g}h.json"
+
+        self.last_start = 0
+        self.points = {}
+
+    @property
+    def max_hours(self) -> float:
+        """Longest window the hourly tier can answer"""
+        return self.aggregator.tiers[self.level][2]
+
+    def load_state(self):
+        """Read the points of the fit window"""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        self.last_start = state.get('last_start', 0)
+        self.points = state.get('points', {})
+
+    def save_state(self):
+        """Atomically persist the points of the fit window"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_name(f".{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_start': self.last_start, 'points': self.points}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.state_file)
+
+    def update(self, now: Optional[float] = None) -> int:
+        """Add the hourly buckets closed since the last update and drop those outside the window"""
+        now = time.time() if now is None else now
+        window_start = int(now - self.hours * 3600)
+        start_ts = max(window_start, self.last_start + FORECAST_BUCKET_SECONDS)
+
+        added = 0
+        for bucket in self.aggregator.iter_buckets(start_ts, self.level, include_open=False):
+            # Bucket midpoints, so a fresh hour is not treated as an hour old
+            middle = bucket.start + FORECAST_BUCKET_SECONDS // 2
+            for key, stats in bucket.stats.items():
+                if key.startswith(DISK_PREFIX) or key in (MEMORY_KEY, SWAP_KEY):
+                    self.points.setdefault(key, []).append([middle, stats.mean])
+            self.last_start = bucket.start
+            added += 1
+
+        for key in list(self.points):
+            self.points[key] = [point for point in self.points[key] if point[0] >= window_start]
+            if not self.points[key]:
+                del self.points[key]
+        return added
+
+    def fit(self, key: str, threshold: float, now: float) -> Optional[Dict[str, Any]]:
+        """Trend and time-to-threshold of one series, or None without enough points"""
+        points = self.points.get(key, [])
+        if len(points) < FORECAST_MIN_POINTS:
+            return None
+
+        # Fit in hours since now, so the intercept is the level right now
+        fitted = theil_sen([((ts - now) / 3600, value) for ts, value in points])
+        if fitted is None:
+            return None
+        slope, level = fitted
+        horizon = FORECAST_HORIZON_DAYS * 86400
+
+        result = {
+            'current': round(level, 2),
+            'trend_per_day': round(slope * 24, 3),
+            'threshold': threshold,
+            'points': len(points)
+        }
+        for name, limit in (('threshold', threshold), ('full', 100.0)):
+            eta = crossing_time(slope / 3600, level, now, limit, horizon)
+            result[f"{name}_eta"] = int(eta) if eta is not None else None
+            result[f"hours_to_{name}"] = round((eta - now) / 3600, 1) if eta is not None else None
+        return result
+
+    def forecast(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Fit every series in the window"""
+        now = time.time() if now is None else now
+        disk = {}
+        for key in sorted(self.points):
+            if key.startswith(DISK_PREFIX):
+                result = self.fit(key, DISK_THRESHOLD, now)
+                if result is not None:
+                    disk[key[len(DISK_PREFIX):]] = result
+
+        forecast = {
+            'window_hours': self.hours,
+            'resolution': self.aggregator.tiers[self.level][1],
+            'disk': disk
+        }
+        for name, key, threshold in (('memory', MEMORY_KEY, MEMORY_THRESHOLD),
+                                     ('swap', SWAP_KEY, SWAP_THRESHOLD)):
+            result = self.fit(key, threshold, now)
+            if result is not None:
+                forecast[name] = result
+        return forecast
+
+    def refresh(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Load the state, bring it up to date, persist it if it changed and forecast"""
+        now = time.time() if now is None else now
+        if not self.persist:
+            self.update(now)
+            return self.forecast(now)
+
+        self.load_state()
+        if self.update(now):
+            try:
+                self.save_state()
+            except OSError:
+                # The state only saves work; the forecast is still complete
+                pass
+        return self.forecast(now)
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Forecast disk, memory and swap usage')
+    parser.add_argument('--hours', type=float, default=FORECAST_HOURS,
+                       help=f"Hours of history to fit (default: {FORECAST_HOURS:g})")
+
+    args = parser.parse_args()
+
+    print(json.dumps(Forecaster(hours=args.hours).refresh(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
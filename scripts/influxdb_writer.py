@@ -4,15 +4,298 @@ InfluxDB Writer
 Writes metrics to InfluxDB for time-series storage
 """
 
+import gzip
+import http.client
 import json
 import os
+import threading
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
-from urllib.request import Request, urlopen
-from urllib.error import URLError, HTTPError
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, quote
 import sys
 
+from file_watcher import FileWatcher
+from line_protocol import LineEncoder
+from metrics_store import MetricsStore, SEGMENT_SECONDS
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to InfluxDB, reused across requests"""
+    
+    def __init__(self, url, size=2, timeout=10.0):
+        parts = urlsplit(url)
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.reconnects = 0
+    
+    def acquire(self):
+        """Take an idle connection, or open a new one; returns (connection, reused)"""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), True
+            self.opened += 1
+        return self.connection_class(self.host, self.port, timeout=self.timeout), False
+    
+    def release(self, connection):
+        """Return a connection to the pool, closing it if the pool is full"""
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(connection)
+                return
+        connection.close()
+    
+    def request(self, method, path, body=None, headers=None):
+        """Send a request and return (status, response body)"""
+        while True:
+            connection, reused = self.acquire()
+            try:
+                connection.request(method, self.base_path + path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest, http.client.BadStatusLine):
+                connection.close()
+                # The server may drop idle keep-alive connections; only those are retried
+                if reused:
+                    with self.lock:
+                        self.reconnects += 1
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            
+            self.release(connection)
+            return response.status, data
+    
+    def close(self):
+        """Close all idle connections"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+
+class Spool:
+    """Durable, size-bounded queue of line-protocol batches waiting for InfluxDB
+    
+    Batches are numbered in order and written to their own file before any
+    attempt to send them. The highest acknowledged number is recorded before
+    a batch file is removed, so an acknowledged batch is not sent again.
+    Delivery is at least once: a batch InfluxDB wrote but whose response was
+    lost is replayed, which is harmless because points with the same
+    measurement, tags and timestamp overwrite each other.
+    """
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.acked_file = self.directory / 'acked'
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        
+        try:
+            self.acked = int(self.acked_file.read_text().strip())
+        except (FileNotFoundError, ValueError):
+            self.acked = 0
+        
+        # A crash between recording the ack and removing the file leaves it behind
+        pending = self.pending()
+        for seq, path in pending:
+            if seq <= self.acked:
+                path.unlink(missing_ok=True)
+        self.next_seq = max([self.acked] + [seq for seq, _ in pending]) + 1
+    
+    def pending(self):
+        """List (sequence, path) of unacknowledged batches, oldest first"""
+        batches = []
+        for path in self.directory.glob('batch-*.lp'):
+            try:
+                batches.append((int(path.stem[len('batch-'):]), path))
+            except ValueError:
+                continue
+        return sorted(batches)
+    
+    def push(self, body):
+        """Persist a batch and return its sequence number"""
+        seq = self.next_seq
+        path = self.directory / f"batch-{seq:012d}.lp"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.next_seq += 1
+        self.trim()
+        return seq
+    
+    def ack(self, seq):
+        """Mark a batch as written and remove it"""
+        tmp_path = self.acked_file.with_name('.acked.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(str(seq))
+        os.replace(tmp_path, self.acked_file)
+        self.acked = seq
+        (self.directory / f"batch-{seq:012d}.lp").unlink(missing_ok=True)
+    
+    def trim(self):
+        """Drop the oldest batches while the spool is over its size limit"""
+        pending = [(seq, path, path.stat().st_size) for seq, path in self.pending()]
+        total = sum(size for _, _, size in pending)
+        # The newest batch is always kept
+        for seq, path, size in pending[:-1]:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.dropped += 1
+            print(f"Spool over {self.max_bytes} bytes, dropped batch {seq}", file=sys.stderr)
+
+
+def sample_points(metrics):
+    """Yield (measurement, tags, fields, timestamp) for every point in a sample"""
+    timestamp = metrics.get('timestamp', int(time.time()))
+    hostname = metrics.get('system', {}).get('hostname', 'unknown')
+    
+    # CPU metrics
+    cpu = metrics.get('cpu', {})
+    if cpu:
+        yield (
+            'cpu',
+            {'host': hostname},
+            {
+                'load_1min': cpu.get('load_1min', 0),
+                'load_5min': cpu.get('load_5min', 0),
+                'load_15min': cpu.get('load_15min', 0),
+                'core_count': cpu.get('core_count', 0)
+            },
+            timestamp
+        )
+        
+        if cpu.get('temperature_celsius') and cpu.get('temperature_celsius') != 'null':
+            yield (
+                'cpu_temperature',
+                {'host': hostname},
+                {'celsius': float(cpu['temperature_celsius'])},
+                timestamp
+            )
+    
+    # Memory metrics
+    memory = metrics.get('memory', {})
+    if memory:
+        total_kb = memory.get('total_kb', 0)
+        available_kb = memory.get('available_kb', 0)
+        
+        if total_kb > 0:
+            used_kb = total_kb - available_kb
+            used_percent = (used_kb / total_kb) * 100
+            
+            yield (
+                'memory',
+                {'host': hostname},
+                {
+                    'total_kb': total_kb,
+                    'used_kb': used_kb,
+                    'available_kb': available_kb,
+                    'used_percent': used_percent
+                },
+                timestamp
+            )
+        
+        # Swap metrics
+        swap_total = memory.get('swap_total_kb', 0)
+        swap_used = memory.get('swap_used_kb', 0)
+        if swap_total > 0:
+            swap_percent = (swap_used / swap_total) * 100
+            yield (
+                'swap',
+                {'host': hostname},
+                {
+                    'total_kb': swap_total,
+                    'used_kb': swap_used,
+                    'used_percent': swap_percent
+                },
+                timestamp
+            )
+    
+    # Disk metrics
+    disk = metrics.get('disk', {})
+    if disk:
+        for fs in disk.get('filesystems', []):
+            mount_point = fs.get('mount_point', 'unknown')
+            yield (
+                'disk',
+                {
+                    'host': hostname,
+                    'mount_point': mount_point,
+                    'device': fs.get('device', 'unknown')
+                },
+                {
+                    'total_kb': fs.get('total_kb', 0),
+                    'used_kb': fs.get('used_kb', 0),
+                    'available_kb': fs.get('available_kb', 0),
+                    'used_percent': fs.get('use_percent', 0)
+                },
+                timestamp
+            )
+    
+    # Network metrics
+    network = metrics.get('network', {})
+    if network:
+        for iface in network.get('interfaces', []):
+            interface_name = iface.get('interface', 'unknown')
+            yield (
+                'network',
+                {
+                    'host': hostname,
+                    'interface': interface_name
+                },
+                {
+                    'rx_bytes': iface.get('rx_bytes', 0),
+                    'tx_bytes': iface.get('tx_bytes', 0),
+                    'rx_packets': iface.get('rx_packets', 0),
+                    'tx_packets': iface.get('tx_packets', 0),
+                    'rx_errors': iface.get('rx_errors', 0),
+                    'tx_errors': iface.get('tx_errors', 0)
+                },
+                timestamp
+            )
+
+
+# Per-process encoder used by backfill parse workers; keeps its prefix cache between windows
+_worker_encoder = None
+
+
+def encode_window(data_dir, start_ts, end_ts, batch_points):
+    """Encode the samples of one segment window into (body, points) batches"""
+    global _worker_encoder
+    if _worker_encoder is None:
+        _worker_encoder = LineEncoder()
+    encoder = _worker_encoder
+    
+    batches = []
+    for metrics in MetricsStore(data_dir).iter_metrics(start_ts, end_ts):
+        encoder.extend(sample_points(metrics))
+        if encoder.lines >= batch_points:
+            batches.append((encoder.getvalue(), encoder.lines))
+            encoder.clear()
+    if encoder.lines:
+        batches.append((encoder.getvalue(), encoder.lines))
+        encoder.clear()
+    return batches
+
 
 class InfluxDBWriter:
     """Write metrics to InfluxDB"""
@@ -22,160 +305,170 @@ class InfluxDBWriter:
         self.database = os.getenv('INFLUXDB_DB', 'system_monitoring')
         self.data_dir = Path(os.getenv('DATA_DIR', '/app/data'))
         self.last_processed_file = self.data_dir / '.last_processed_influx'
+        self.backfill_file = self.data_dir / '.backfill_influx.json'
+        self.store = MetricsStore(self.data_dir)
+        
+        # Requests reuse keep-alive connections instead of a new TCP handshake each time
+        self.gzip = os.getenv('INFLUXDB_GZIP', 'false').lower() in ('1', 'true', 'yes')
+        self.pool = ConnectionPool(
+            self.influxdb_url,
+            size=int(os.getenv('INFLUXDB_POOL_SIZE', 2)),
+            timeout=float(os.getenv('INFLUXDB_TIMEOUT', 10))
+        )
+        
+        # Points are buffered and sent in one /write per batch
+        self.precision = 's'
+        self.batch_points = int(os.getenv('INFLUXDB_BATCH_POINTS', 5000))
+        self.batch_seconds = float(os.getenv('INFLUXDB_BATCH_SECONDS', 5))
+        self.encoder = LineEncoder()
+        self.batch_started = None
+        self.batch_last_timestamp = 0
+        self.last_spooled_timestamp = 0
+        
+        # Batches wait on disk until InfluxDB accepts them, retried with exponential backoff
+        self.spool = Spool(self.data_dir / 'influx_spool',
+                           int(float(os.getenv('INFLUXDB_SPOOL_MB', 256)) * 1024 * 1024))
+        self.backoff_max = float(os.getenv('INFLUXDB_BACKOFF_MAX', 300))
+        self.failures = 0
+        self.retry_at = 0
         
     def create_database(self):
         """Create the database if it doesn't exist"""
         try:
-            url = f"{self.influxdb_url}/query"
-            data = f"q=CREATE DATABASE {self.database}".encode('utf-8')
-            req = Request(url, data=data, method='POST')
-            req.add_header('Content-Type', 'application/x-www-form-urlencoded')
-            
-            with urlopen(req, timeout=10) as response:
-                return response.status == 200
+            data = f"q={quote(f'CREATE DATABASE {self.database}')}".encode('utf-8')
+            status, _ = self.pool.request('POST', '/query', data,
+                                          {'Content-Type': 'application/x-www-form-urlencoded'})
+            return status == 200
         except Exception as e:
             print(f"Error creating database: {e}", file=sys.stderr)
             return False
     
+    def format_line(self, measurement, tags, fields, timestamp):
+        """Build one line of line protocol, or None if no field can be written"""
+        return self.encoder.encode(measurement, tags, fields, timestamp)
+    
     def write_metric(self, measurement, tags, fields, timestamp):
-        """Write a single metric to InfluxDB"""
+        """Write a single metric to InfluxDB (one request per point)"""
+        line = self.format_line(measurement, tags, fields, timestamp)
+        if line is None:
+            return False
+        
+        status, error = self.write_lines(line)
+        if status != 204:
+            print(f"Error writing metric: {error}", file=sys.stderr)
+        return status == 204
+    
+    def write_lines(self, body):
+        """POST line protocol to /write, returning (HTTP status or None, error message)"""
+        path = f"/write?db={quote(self.database)}&precision={self.precision}"
+        data = body if isinstance(body, bytes) else body.encode('utf-8')
+        headers = {'Content-Type': 'text/plain; charset=utf-8'}
+        if self.gzip:
+            data = gzip.compress(data, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        
         try:
-            # Build line protocol
-            tag_str = ','.join([f"{k}={v}" for k, v in tags.items()])
-            field_str = ','.join([f"{k}={v}" for k, v in fields.items()])
-            
-            line = f"{measurement},{tag_str} {field_str} {timestamp}"
-            
-            # Write to InfluxDB
-            url = f"{self.influxdb_url}/write?db={self.database}"
-            data = line.encode('utf-8')
-            req = Request(url, data=data, method='POST')
-            
-            with urlopen(req, timeout=10) as response:
-                return response.status == 204
+            status, detail = self.pool.request('POST', path, data, headers)
         except Exception as e:
-            print(f"Error writing metric: {e}", file=sys.stderr)
-            return False
+            return None, str(e) or type(e).__name__
+        
+        if status == 204:
+            return status, None
+        # InfluxDB explains partial writes and rejected points in the body
+        return status, f"HTTP {status}: {detail.decode('utf-8', 'replace').strip()}"
     
     def process_metrics_file(self, filepath):
         """Process a metrics file and write to InfluxDB"""
         try:
             with open(filepath, 'r') as f:
                 metrics = json.load(f)
-            
-            timestamp = metrics.get('timestamp', int(time.time()))
-            timestamp_ns = timestamp * 1_000_000_000  # Convert to nanoseconds
-            
-            hostname = metrics.get('system', {}).get('hostname', 'unknown')
-            
-            # Write CPU metrics
-            cpu = metrics.get('cpu', {})
-            if cpu:
-                self.write_metric(
-                    'cpu',
-                    {'host': hostname},
-                    {
-                        'load_1min': cpu.get('load_1min', 0),
-                        'load_5min': cpu.get('load_5min', 0),
-                        'load_15min': cpu.get('load_15min', 0),
-                        'core_count': cpu.get('core_count', 0)
-                    },
-                    timestamp_ns
-                )
-                
-                if cpu.get('temperature_celsius') and cpu.get('temperature_celsius') != 'null':
-                    self.write_metric(
-                        'cpu_temperature',
-                        {'host': hostname},
-                        {'celsius': float(cpu['temperature_celsius'])},
-                        timestamp_ns
-                    )
-            
-            # Write memory metrics
-            memory = metrics.get('memory', {})
-            if memory:
-                total_kb = memory.get('total_kb', 0)
-                available_kb = memory.get('available_kb', 0)
-                
-                if total_kb > 0:
-                    used_kb = total_kb - available_kb
-                    used_percent = (used_kb / total_kb) * 100
-                    
-                    self.write_metric(
-                        'memory',
-                        {'host': hostname},
-                        {
-                            'total_kb': total_kb,
-                            'used_kb': used_kb,
-                            'available_kb': available_kb,
-                            'used_percent': used_percent
-                        },
-                        timestamp_ns
-                    )
-                
-                # Swap metrics
-                swap_total = memory.get('swap_total_kb', 0)
-                swap_used = memory.get('swap_used_kb', 0)
-                if swap_total > 0:
-                    swap_percent = (swap_used / swap_total) * 100
-                    self.write_metric(
-                        'swap',
-                        {'host': hostname},
-                        {
-                            'total_kb': swap_total,
-                            'used_kb': swap_used,
-                            'used_percent': swap_percent
-                        },
-                        timestamp_ns
-                    )
-            
-            # Write disk metrics
-            disk = metrics.get('disk', {})
-            if disk:
-                for fs in disk.get('filesystems', []):
-                    mount_point = fs.get('mount_point', 'unknown')
-                    self.write_metric(
-                        'disk',
-                        {
-                            'host': hostname,
-                            'mount_point': mount_point,
-                            'device': fs.get('device', 'unknown')
-                        },
-                        {
-                            'total_kb': fs.get('total_kb', 0),
-                            'used_kb': fs.get('used_kb', 0),
-                            'available_kb': fs.get('available_kb', 0),
-                            'used_percent': fs.get('use_percent', 0)
-                        },
-                        timestamp_ns
-                    )
-            
-            # Write network metrics
-            network = metrics.get('network', {})
-            if network:
-                for iface in network.get('interfaces', []):
-                    interface_name = iface.get('interface', 'unknown')
-                    self.write_metric(
-                        'network',
-                        {
-                            'host': hostname,
-                            'interface': interface_name
-                        },
-                        {
-                            'rx_bytes': iface.get('rx_bytes', 0),
-                            'tx_bytes': iface.get('tx_bytes', 0),
-                            'rx_packets': iface.get('rx_packets', 0),
-                            'tx_packets': iface.get('tx_packets', 0),
-                            'rx_errors': iface.get('rx_errors', 0),
-                            'tx_errors': iface.get('tx_errors', 0)
-                        },
-                        timestamp_ns
-                    )
-            
-            return True
         except Exception as e:
             print(f"Error processing metrics file {filepath}: {e}", file=sys.stderr)
             return False
+        
+        return self.process_metrics(metrics)
+    
+    def process_metrics(self, metrics):
+        """Write a single metrics sample to InfluxDB in one request"""
+        try:
+            self.add_sample(metrics)
+        except Exception as e:
+            print(f"Error processing metrics sample: {e}", file=sys.stderr)
+            self.encoder.clear()
+            return False
+        
+        return self.flush()
+    
+    def add_sample(self, metrics):
+        """Queue a sample's points, flushing when the batch is full"""
+        self.encoder.extend(sample_points(metrics))
+        
+        if self.batch_started is None:
+            self.batch_started = time.monotonic()
+        self.batch_last_timestamp = metrics.get('timestamp', self.batch_last_timestamp)
+        
+        if self.encoder.lines >= self.batch_points:
+            return self.flush()
+        return True
+    
+    def batch_expired(self):
+        """Whether the pending batch is older than the flush interval"""
+        return (self.batch_started is not None and
+                time.monotonic() - self.batch_started >= self.batch_seconds)
+    
+    def flush(self):
+        """Spool the pending batch, then send everything spooled; True once all is written"""
+        if self.encoder.lines:
+            try:
+                self.spool.push(self.encoder.getvalue())
+            except OSError as e:
+                # Keep the points in memory and try again on the next flush
+                print(f"Error spooling batch: {e}", file=sys.stderr)
+                return False
+            
+            self.last_spooled_timestamp = self.batch_last_timestamp
+            self.encoder.clear()
+            self.batch_started = None
+        
+        return self.drain()
+    
+    def drain(self):
+        """Write spooled batches oldest first, backing off while InfluxDB is failing"""
+        if time.monotonic() < self.retry_at:
+            return False
+        
+        pending = self.spool.pending()
+        for position, (seq, path) in enumerate(pending):
+            try:
+                body = path.read_bytes()
+            except FileNotFoundError:
+                continue  # dropped by trim
+            
+            status, error = self.write_lines(body)
+            if status == 404 and self.create_database():
+                # The database was dropped, or not created while InfluxDB was down
+                status, error = self.write_lines(body)
+            if status == 400:
+                # Rejected points will never succeed; InfluxDB has kept the valid ones
+                print(f"Batch {seq} partially rejected, not retrying: {error}", file=sys.stderr)
+            elif status != 204:
+                self.failures += 1
+                delay = min(2 ** (self.failures - 1), self.backoff_max)
+                self.retry_at = time.monotonic() + delay
+                print(f"Batch {seq} failed: {error}; {len(pending) - position} batches spooled, "
+                      f"retrying in {delay:.0f}s", file=sys.stderr)
+                return False
+            
+            self.spool.ack(seq)
+            self.failures = 0
+        
+        return True
+    
+    def retry_delay(self):
+        """Seconds until spooled batches are due to be retried, or None if nothing waits"""
+        if not self.spool.pending():
+            return None
+        return max(self.retry_at - time.monotonic(), 0)
     
     def get_last_processed_timestamp(self):
         """Get the timestamp of the last processed file"""
@@ -203,32 +496,189 @@ class InfluxDBWriter:
         self.create_database()
         
         last_processed = self.get_last_processed_timestamp()
+        saved = last_processed
+        
+        # The monitor replaces latest_metrics.json right after appending each sample
+        watcher = FileWatcher(self.data_dir, names=[self.store.latest_file.name])
+        print(f"Watching {self.data_dir} ({watcher.mode})")
         
         while True:
             try:
-                # Find new metrics files
-                metrics_files = sorted(self.data_dir.glob('metrics_*.json'))
+                # Queue new samples from the segment store; full batches flush as they fill
+                for metrics in self.store.iter_metrics(last_processed + 1):
+                    last_processed = metrics.get('timestamp', last_processed)
+                    self.add_sample(metrics)
+                
+                if self.batch_expired():
+                    self.flush()
+                elif self.retry_delay() == 0:
+                    self.drain()
                 
-                for filepath in metrics_files:
-                    try:
-                        timestamp = int(filepath.stem.split('_')[1])
-                        if timestamp > last_processed:
-                            if self.process_metrics_file(filepath):
-                                print(f"Processed: {filepath.name}")
-                                last_processed = timestamp
-                                self.save_last_processed_timestamp(timestamp)
-                    except (ValueError, IndexError):
-                        continue
+                # Spooled samples are durable, so the checkpoint may move past them
+                if self.last_spooled_timestamp > saved:
+                    saved = self.last_spooled_timestamp
+                    print(f"Spooled up to sample {saved}")
+                    self.save_last_processed_timestamp(saved)
                 
             except Exception as e:
                 print(f"Error in main loop: {e}", file=sys.stderr)
             
-            # Wait before checking for new files
-            time.sleep(5)
+            # Wake on the next sample, when a pending batch is due, or when a retry is due
+            timeout = self.batch_seconds
+            retry_delay = self.retry_delay()
+            if retry_delay is not None:
+                timeout = min(timeout, max(retry_delay, 0.1))
+            watcher.wait(timeout)
+
+    def send_batch(self, body, attempts=5):
+        """Write one backfill batch, retrying with backoff; True once InfluxDB has it"""
+        for attempt in range(attempts):
+            status, error = self.write_lines(body)
+            if status == 404 and self.create_database():
+                status, error = self.write_lines(body)
+            if status == 204:
+                return True
+            if status == 400:
+                print(f"Backfill batch partially rejected: {error}", file=sys.stderr)
+                return True
+            if attempt < attempts - 1:
+                time.sleep(min(2 ** attempt, self.backoff_max))
+        print(f"Backfill batch failed after {attempts} attempts: {error}", file=sys.stderr)
+        return False
+    
+    def read_backfill_state(self):
+        """Return the checkpoint of an interrupted backfill, or an empty dict"""
+        try:
+            with open(self.backfill_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def load_backfill_state(self, start_ts, end_ts):
+        """Return the segments already written by an interrupted backfill of the same range"""
+        state = self.read_backfill_state()
+        if state.get('from') != start_ts or state.get('to') != end_ts:
+            return set()
+        return set(state.get('done', []))
+    
+    def save_backfill_state(self, start_ts, end_ts, done):
+        """Record finished segments so an interrupted backfill can resume"""
+        tmp_path = self.backfill_file.with_name(f".{self.backfill_file.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'from': start_ts, 'to': end_ts, 'done': sorted(done)}, f)
+        os.replace(tmp_path, self.backfill_file)
+    
+    def backfill(self, start_ts, end_ts=None, workers=4, concurrency=4, batch_points=20000):
+        """Replay stored samples in [start_ts, end_ts] with parallel parsing and sending
+        
+        Without end_ts an interrupted backfill from the same start resumes up
+        to the end it resolved; otherwise the range ends now.
+        """
+        if end_ts is None:
+            state = self.read_backfill_state()
+            end_ts = state['to'] if state.get('from') == start_ts and 'to' in state else int(time.time())
+        # Archived hours are replayed like segments, so old data can be backfilled too
+        segments = self.store.stored_hours(start_ts, end_ts)
+        done = self.load_backfill_state(start_ts, end_ts)
+        todo = iter([segment_ts for segment_ts in segments if segment_ts not in done])
+        if done:
+            print(f"Resuming backfill: {len(done)} of {len(segments)} segments already written")
+        
+        self.create_database()
+        self.pool.size = max(self.pool.size, concurrency)
+        
+        points_written = 0
+        failed = False
+        started = time.monotonic()
+        
+        # Bounded pipeline: parse a few segments ahead, keep a few segments in flight
+        with ProcessPoolExecutor(workers) as parsers, ThreadPoolExecutor(concurrency) as senders:
+            parsing = deque()
+            sending = deque()
+            
+            def fill():
+                while not failed and len(parsing) < workers * 2:
+                    segment_ts = next(todo, None)
+                    if segment_ts is None:
+                        return
+                    window_start = max(segment_ts, start_ts)
+                    window_end = min(segment_ts + SEGMENT_SECONDS - 1, end_ts)
+                    parsing.append((segment_ts, parsers.submit(
+                        encode_window, str(self.data_dir), window_start, window_end, batch_points)))
+            
+            fill()
+            while parsing or sending:
+                if parsing and len(sending) < concurrency * 2:
+                    segment_ts, future = parsing.popleft()
+                    batches = future.result()
+                    sending.append((segment_ts, sum(points for _, points in batches),
+                                    [senders.submit(self.send_batch, body) for body, _ in batches]))
+                    fill()
+                    continue
+                
+                segment_ts, points, futures = sending.popleft()
+                if not all(future.result() for future in futures):
+                    # Stop reading ahead; batches already in flight still finish
+                    failed = True
+                    for _, pending in parsing:
+                        pending.cancel()
+                    parsing.clear()
+                    continue
+                
+                done.add(segment_ts)
+                points_written += points
+                self.save_backfill_state(start_ts, end_ts, done)
+                elapsed = time.monotonic() - started
+                print(f"Backfill {len(done)}/{len(segments)} segments, {points_written} points, "
+                      f"{points_written / elapsed if elapsed else 0:.0f} points/s")
+        
+        if failed:
+            print(f"Backfill stopped with {len(segments) - len(done)} segments left; "
+                  f"run it again to resume", file=sys.stderr)
+            return False
+        
+        self.backfill_file.unlink(missing_ok=True)
+        print(f"Backfill complete: {points_written} points in {time.monotonic() - started:.1f}s")
+        return True
+
+
+def parse_time(value):
+    """Parse a Unix timestamp or an ISO-8601 date/time (UTC unless it has an offset)"""
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
 
 
 def main():
+    """Main function"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Write stored metrics to InfluxDB')
+    parser.add_argument('action', nargs='?', default='run', choices=['run', 'backfill'],
+                       help='Follow new samples (run) or replay a time range (backfill)')
+    parser.add_argument('--from', dest='start', type=parse_time, default=0,
+                       help='Backfill start (Unix timestamp or ISO date, default: oldest sample)')
+    parser.add_argument('--to', dest='end', type=parse_time, default=None,
+                       help='Backfill end (Unix timestamp or ISO date, default: now)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                       help='Parse worker processes (default: CPU count)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                       help='Batches sent concurrently (default: 4)')
+    parser.add_argument('--batch-points', type=int, default=20000,
+                       help='Points per backfill request (default: 20000)')
+    
+    args = parser.parse_args()
+    
     writer = InfluxDBWriter()
+    
+    if args.action == 'backfill':
+        ok = writer.backfill(args.start, args.end, workers=args.workers,
+                             concurrency=args.concurrency, batch_points=args.batch_points)
+        sys.exit(0 if ok else 1)
+    
     writer.run()
 
 
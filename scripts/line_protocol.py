@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Line Protocol Encoder
+Escaped, type-stable InfluxDB line protocol with cached series prefixes
+"""
+
+import math
+from operator import itemgetter
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+# Field types per measurement; a field keeps its declared type in every write
+SCHEMA = {
+    'cpu': {'load_1min': float, 'load_5min': float, 'load_15min': float, 'core_count': int},
+    'cpu_temperature': {'celsius': float},
+    'memory': {'total_kb': int, 'used_kb': int, 'available_kb': int, 'used_percent': float},
+    'swap': {'total_kb': int, 'used_kb': int, 'used_percent': float},
+    'disk': {'total_kb': int, 'used_kb': int, 'available_kb': int, 'used_percent': float},
+    'network': {'rx_bytes': int, 'tx_bytes': int, 'rx_packets': int, 'tx_packets': int,
+                'rx_errors': int, 'tx_errors': int},
+}
+
+MEASUREMENT_ESCAPES = str.maketrans({',': '\\,', ' ': '\\ ', '\n': '\\n'})
+KEY_ESCAPES = str.maketrans({',': '\\,', '=': '\\=', ' ': '\\ ', '\n': '\\n'})
+STRING_ESCAPES = str.maketrans({'"': '\\"', '\\': '\\\\'})
+
+
+def escape_measurement(name: str) -> str:
+    """Escape a measurement name"""
+    return str(name).translate(MEASUREMENT_ESCAPES)
+
+
+def escape_key(value: str) -> str:
+    """Escape a tag key, tag value or field key"""
+    return str(value).translate(KEY_ESCAPES)
+
+
+def format_value(value: Any, kind: Optional[type]) -> Optional[str]:
+    """Format a field value as its declared type, or None if it cannot be written"""
+    if kind is None:
+        # Undeclared fields keep the type of the value they arrive with
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (int, float)):
+            kind = type(value)
+        elif isinstance(value, str):
+            return '"' + value.translate(STRING_ESCAPES) + '"'
+        else:
+            return None
+
+    try:
+        if kind is int:
+            return f"{int(value)}i"
+        if kind is float:
+            number = float(value)
+            # Line protocol has no representation for NaN or infinity
+            return repr(number) if math.isfinite(number) else None
+        if kind is bool:
+            return 't' if value else 'f'
+        return '"' + str(value).translate(STRING_ESCAPES) + '"'
+    except (TypeError, ValueError, OverflowError):
+        # int() of an infinite float overflows; the field is skipped like NaN
+        return None
+
+
+def value_format(kind: Optional[type], value_type: type) -> Optional[str]:
+    """%-format of a value type written as a declared field type, or None if it needs format_value"""
+    if kind is int and value_type in (int, float):
+        return '%di'
+    if kind is float and value_type is float:
+        return '%s'
+    if kind is float and value_type is int:
+        return '%d.0'
+    return None
+
+
+class LineEncoder:
+    """Encodes points into line protocol, appending to one reusable buffer
+
+    The escaped "measurement,tag=value,..." prefix of each series is cached
+    as bytes. For each measurement the field keys and the value types seen
+    are compiled into one %-format, so a typical point costs one tuple of
+    values, one format and one append; anything else goes through
+    format_value field by field.
+    """
+
+    def __init__(self, schema: Optional[Dict[str, Dict[str, type]]] = None, max_series: int = 10000):
+        self.schema = SCHEMA if schema is None else schema
+        self.max_series = max_series
+        self.prefixes = {}
+        self.series = {}  # (measurement, tag items) -> encoded prefix and space
+        self.field_tables = {}
+        self.templates = {}  # measurement -> (getter, field count, {value types: format})
+        self.buffer = bytearray()
+        self.lines = 0
+        self.skipped = 0
+
+    def prefix(self, measurement: str, tags: Dict[str, Any]) -> str:
+        """Return the cached series key: measurement plus sorted, escaped tags"""
+        key = (measurement, tuple(tags.items()))
+        prefix = self.prefixes.get(key)
+        if prefix is None:
+            if len(self.prefixes) >= self.max_series:
+                self.prefixes.clear()
+            parts = [escape_measurement(measurement)]
+            for tag, value in sorted(tags.items()):
+                # Empty tag values are invalid, so the tag is left out
+                if value is not None and str(value) != '':
+                    parts.append(f"{escape_key(tag)}={escape_key(value)}")
+            prefix = ','.join(parts)
+            self.prefixes[key] = prefix
+        return prefix
+
+    def compile_fields(self, measurement: str) -> Dict[str, Any]:
+        """Return the field table of a measurement: field -> (escaped 'key=', declared type)"""
+        table = self.field_tables.get(measurement)
+        if table is None:
+            types = self.schema.get(measurement, {})
+            table = {field: (escape_key(field) + '=', kind) for field, kind in types.items()}
+            self.field_tables[measurement] = table
+        return table
+
+    def compile_template(self, measurement: str, fields: Dict[str, Any]) -> Tuple[Any, int, Dict]:
+        """Remember the field keys of a measurement, in the order they arrive"""
+        keys = tuple(fields)
+        if len(keys) > 1:
+            getter = itemgetter(*keys)
+        elif keys:
+            getter = lambda values, key=keys[0]: (values[key],)
+        else:
+            getter = lambda values: ()
+        template = self.templates[measurement] = (getter, len(keys), {'keys': keys})
+        return template
+
+    def compile_format(self, measurement: str, formats: Dict, value_types: Tuple[type, ...]) -> Optional[str]:
+        """Build the %-format of one combination of value types, or None if it has no fast form"""
+        table = self.field_tables.get(measurement) or self.compile_fields(measurement)
+        parts = []
+        for field, value_type in zip(formats['keys'], value_types):
+            key, kind = table.get(field, (escape_key(field) + '=', None))
+            spec = value_format(kind, value_type)
+            if spec is None:
+                formats[value_types] = None
+                return None
+            parts.append(key.replace('%', '%%') + spec)
+        if not parts:
+            # A point without fields is not written
+            formats[value_types] = None
+            return None
+        formats[value_types] = spec = ','.join(parts) + ' %d\n'
+        return spec
+
+    def encode(self, measurement: str, tags: Dict[str, Any], fields: Dict[str, Any],
+               timestamp: int) -> Optional[str]:
+        """Encode one point without a trailing newline, or None if it has no writable fields"""
+        table = self.field_tables.get(measurement) or self.compile_fields(measurement)
+        parts = []
+        for field, value in fields.items():
+            compiled = table.get(field)
+            if compiled is None:
+                compiled = table[field] = (escape_key(field) + '=', None)
+            key, kind = compiled
+
+            # Fast paths for values that already have their declared type
+            value_type = type(value)
+            if kind is int and value_type is int:
+                parts.append(f"{key}{value}i")
+            elif kind is float and value_type is float and math.isfinite(value):
+                parts.append(f"{key}{value!r}")
+            elif kind is float and value_type is int:
+                parts.append(f"{key}{value}.0")
+            else:
+                formatted = format_value(value, kind)
+                if formatted is not None:
+                    parts.append(key + formatted)
+
+        if not parts:
+            self.skipped += 1
+            return None
+        return f"{self.prefix(measurement, tags)} {','.join(parts)} {int(timestamp)}"
+
+    def add(self, measurement: str, tags: Dict[str, Any], fields: Dict[str, Any],
+            timestamp: int) -> bool:
+        """Append one point to the buffer"""
+        return self.extend(((measurement, tags, fields, timestamp),)) == 1
+
+    def extend(self, points: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any], int]]) -> int:
+        """Append (measurement, tags, fields, timestamp) points, returning how many were written"""
+        templates = self.templates
+        series = self.series
+        buffer = self.buffer
+        isfinite = math.isfinite
+        added = 0
+        for measurement, tags, fields, timestamp in points:
+            template = templates.get(measurement)
+            if template is None:
+                template = self.compile_template(measurement, fields)
+            getter, count, formats = template
+            text = None
+            if len(fields) == count:
+                try:
+                    values = getter(fields)
+                    value_types = tuple(map(type, values))
+                    spec = formats[value_types] if value_types in formats else \
+                        self.compile_format(measurement, formats, value_types)
+                    # The sum is finite only if every value is, as NaN and infinity are not written
+                    if spec is not None and isfinite(sum(values)):
+                        text = spec % (*values, timestamp)
+                except (KeyError, OverflowError, ValueError, TypeError):
+                    pass
+
+            if text is None:
+                line = self.encode(measurement, tags, fields, timestamp)
+                if line is not None:
+                    buffer += (line + '\n').encode('utf-8')
+                    added += 1
+                continue
+
+            key = (measurement, tuple(tags.items()))
+            prefix = series.get(key)
+            if prefix is None:
+                if len(series) >= self.max_series:
+                    series.clear()
+                    self.prefixes.clear()
+                prefix = series[key] = (self.prefix(measurement, tags) + ' ').encode('utf-8')
+            buffer += prefix
+            buffer += text.encode('utf-8')
+            added += 1
+
+        self.lines += added
+        return added
+
+    def getvalue(self) -> bytes:
+        """Return the buffered lines as a request body"""
+        return bytes(self.buffer)
+
+    def clear(self):
+        """Empty the buffer, keeping the prefix caches"""
+        self.buffer.clear()
+        self.lines = 0
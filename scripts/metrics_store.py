@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Metrics Store for System Monitoring
+Time-partitioned, append-only storage for metric samples
+"""
+
+import calendar
+import json
+import os
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from aggregator import Aggregator
+from archive import Archive, ARCHIVE_PREFIX, ARCHIVE_SUFFIX
+
+# Optional: orjson parses samples about twice as fast as the json module
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Configuration
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+SEGMENT_SECONDS = 3600
+SEGMENT_PREFIX = 'metrics-'
+SEGMENT_SUFFIX = '.ndjson'
+INDEX_SUFFIX = '.idx'
+# One fixed-size record per sample: timestamp, byte offset of its line
+INDEX_RECORD = struct.Struct('<qQ')
+# Windows spanning more segments than this are resolved by listing instead
+DERIVED_SEGMENT_LIMIT = 48
+ARCHIVE_SECONDS = 86400
+
+
+class MetricsStore:
+    """Hourly NDJSON segments shared by the API, processor and InfluxDB writer"""
+
+    def __init__(self, data_dir=None):
+        self.data_dir = Path(data_dir or DATA_DIR)
+        self.segments_dir = self.data_dir / 'segments'
+        self.archive_dir = self.data_dir / 'archive'
+        self.latest_file = self.data_dir / 'latest_metrics.json'
+
+    def segment_start(self, timestamp: int) -> int:
+        """Return the start of the segment that holds a timestamp"""
+        return int(timestamp) - (int(timestamp) % SEGMENT_SECONDS)
+
+    def segment_path(self, timestamp: int) -> Path:
+        """Return the segment file for a timestamp"""
+        name = time.strftime('%Y%m%d%H', time.gmtime(self.segment_start(timestamp)))
+        return self.segments_dir / f"{SEGMENT_PREFIX}{name}{SEGMENT_SUFFIX}"
+
+    def segment_timestamp(self, filepath: Path) -> int:
+        """Parse the start timestamp out of a segment filename"""
+        name = filepath.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+        return calendar.timegm(time.strptime(name, '%Y%m%d%H'))
+
+    def index_path(self, filepath: Path) -> Path:
+        """Return the offset index that belongs to a segment"""
+        return filepath.with_suffix(INDEX_SUFFIX)
+
+    def list_segments(self) -> List[Path]:
+        """List all segment files, oldest first"""
+        if not self.segments_dir.exists():
+            return []
+        return sorted(self.segments_dir.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    def iter_segments(self, start_ts: int = 0, end_ts: Optional[int] = None) -> Iterator[Path]:
+        """Yield existing segments overlapping [start_ts, end_ts], oldest first"""
+        if end_ts is None:
+            end_ts = int(time.time())
+
+        if end_ts - start_ts > DERIVED_SEGMENT_LIMIT * SEGMENT_SECONDS:
+            # Wide or unbounded window: the segment listing is the cheaper path
+            for filepath in self.list_segments():
+                segment_ts = self.segment_timestamp(filepath)
+                if segment_ts + SEGMENT_SECONDS > start_ts and segment_ts <= end_ts:
+                    yield filepath
+            return
+
+        # Narrow window: derive segment names instead of listing the directory
+        current = self.segment_start(start_ts)
+        while current <= end_ts:
+            filepath = self.segment_path(current)
+            if filepath.exists():
+                yield filepath
+            current += SEGMENT_SECONDS
+
+    def archive_path(self, timestamp: int) -> Path:
+        """Return the per-day archive that holds a timestamp"""
+        name = time.strftime('%Y%m%d', time.gmtime(int(timestamp)))
+        return self.archive_dir / f"{ARCHIVE_PREFIX}{name}{ARCHIVE_SUFFIX}"
+
+    def archive_timestamp(self, filepath: Path) -> int:
+        """Parse the start-of-day timestamp out of an archive filename"""
+        name = filepath.name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        return calendar.timegm(time.strptime(name, '%Y%m%d'))
+
+    def list_archives(self) -> List[Path]:
+        """List all archive files, oldest first"""
+        if not self.archive_dir.exists():
+            return []
+        return sorted(self.archive_dir.glob(f"{ARCHIVE_PREFIX}*{ARCHIVE_SUFFIX}"))
+
+    def iter_archives(self, start_ts: int = 0, end_ts: Optional[int] = None) -> Iterator[Path]:
+        """Yield existing archives overlapping [start_ts, end_ts], oldest first"""
+        if end_ts is None:
+            end_ts = int(time.time())
+
+        if end_ts - start_ts > DERIVED_SEGMENT_LIMIT * SEGMENT_SECONDS:
+            for filepath in self.list_archives():
+                try:
+                    day_ts = self.archive_timestamp(filepath)
+                except ValueError:
+                    continue
+                if day_ts + ARCHIVE_SECONDS > start_ts and day_ts <= end_ts:
+                    yield filepath
+            return
+
+        current = int(start_ts) - int(start_ts) % ARCHIVE_SECONDS
+        while current <= end_ts:
+            filepath = self.archive_path(current)
+            if filepath.exists():
+                yield filepath
+            current += ARCHIVE_SECONDS
+
+    def iter_archived(self, start_ts: int = 0, end_ts: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield archived samples with start_ts <= timestamp <= end_ts, oldest first"""
+        for filepath in self.iter_archives(start_ts, end_ts):
+            for data in Archive(filepath).read(start_ts, end_ts):
+                yield from self.parse_lines(data, start_ts, end_ts)
+
+    def stored_hours(self, start_ts: int = 0, end_ts: Optional[int] = None) -> List[int]:
+        """Return the start of every segment-sized hour with samples in [start_ts, end_ts]"""
+        hours = set()
+        for filepath in self.iter_archives(start_ts, end_ts):
+            for block in Archive(filepath).blocks():
+                if block.last_ts >= start_ts and (end_ts is None or block.first_ts <= end_ts):
+                    hours.add(self.segment_start(block.first_ts))
+        for filepath in self.iter_segments(start_ts, end_ts):
+            hours.add(self.segment_timestamp(filepath))
+        return sorted(hours)
+
+    def last_timestamp(self, filepath: Path) -> Optional[int]:
+        """Return the newest timestamp in a segment index, or None if nothing is indexed"""
+        try:
+            with open(self.index_path(filepath), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                size -= size % INDEX_RECORD.size
+                if size == 0:
+                    return None
+                f.seek(size - INDEX_RECORD.size)
+                timestamp, _ = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+                return timestamp
+        except FileNotFoundError:
+            return None
+
+    def append(self, metrics: Dict[str, Any]) -> Path:
+        """Append a sample to its segment and record it in the segment index
+
+        Readers rely on each segment being in timestamp order, so a sample
+        older than the newest one in its segment raises ValueError; use
+        merge_segment() to add out-of-order samples.
+        """
+        timestamp = int(metrics.get('timestamp', time.time()))
+        filepath = self.segment_path(timestamp)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        last = self.last_timestamp(filepath)
+        if last is not None and timestamp < last:
+            raise ValueError(f"Sample at {timestamp} is older than the last one in {filepath.name} ({last})")
+
+        line = json.dumps(metrics, separators=(',', ':')) + '\n'
+        with open(filepath, 'ab') as f:
+            offset = f.tell()
+            f.write(line.encode('utf-8'))
+
+        # The index is written after the data so it never points past a line
+        with open(self.index_path(filepath), 'ab') as f:
+            f.write(INDEX_RECORD.pack(timestamp, offset))
+
+        return filepath
+
+    def remove_segment(self, filepath: Path):
+        """Delete a segment together with its index"""
+        filepath.unlink()
+        self.index_path(filepath).unlink(missing_ok=True)
+
+    def write_latest(self, raw: str):
+        """Atomically replace latest_metrics.json with the raw sample text"""
+        # os.replace also swaps out the symlink older monitor versions created
+        tmp_path = self.latest_file.with_name(f".{self.latest_file.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(raw)
+        os.replace(tmp_path, self.latest_file)
+
+    def find_offset(self, filepath: Path, start_ts: int) -> int:
+        """Binary search the segment index for the first sample at or after start_ts"""
+        try:
+            with open(self.index_path(filepath), 'rb') as f:
+                count = os.fstat(f.fileno()).st_size // INDEX_RECORD.size
+                if count == 0:
+                    return 0
+
+                low, high = 0, count
+                while low < high:
+                    middle = (low + high) // 2
+                    f.seek(middle * INDEX_RECORD.size)
+                    timestamp, _ = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+                    if timestamp < start_ts:
+                        low = middle + 1
+                    else:
+                        high = middle
+
+                # Past the last entry: resume from it so unindexed lines are still read
+                f.seek(min(low, count - 1) * INDEX_RECORD.size)
+                _, offset = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+                return offset
+        except (FileNotFoundError, struct.error):
+            return 0
+
+    def read_segment(self, filepath: Path, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield every complete sample stored in a segment from a byte offset on"""
+        try:
+            with open(filepath, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    # A trailing partial line means the writer is mid-append
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        yield json_loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def iter_metrics(self, start_ts: int = 0, end_ts: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield samples with start_ts <= timestamp <= end_ts, oldest first"""
+        archived_until = start_ts - 1
+        for metrics in self.iter_archived(start_ts, end_ts):
+            archived_until = metrics.get('timestamp', archived_until)
+            yield metrics
+        # Resume after the archive: a segment may outlive its copy if compaction was interrupted
+        start_ts = archived_until + 1
+
+        for filepath in self.iter_segments(start_ts, end_ts):
+            offset = 0
+            if self.segment_timestamp(filepath) < start_ts:
+                offset = self.find_offset(filepath, start_ts)
+
+            for metrics in self.read_segment(filepath, offset):
+                timestamp = metrics.get('timestamp', 0)
+                if timestamp < start_ts:
+                    continue
+                if end_ts is not None and timestamp > end_ts:
+                    return
+                yield metrics
+
+    def read_lines(self, filepath: Path, offset: int = 0) -> bytes:
+        """Read the complete lines of a segment from a byte offset on"""
+        try:
+            with open(filepath, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return b''
+        # A trailing partial line means the writer is mid-append
+        return data[:data.rfind(b'\n') + 1]
+
+    def iter_metrics_parallel(self, start_ts: int = 0, end_ts: Optional[int] = None,
+                              workers: int = 4) -> Iterator[Dict[str, Any]]:
+        """Like iter_metrics, but segments are read ahead by a thread pool
+
+        Samples are still yielded oldest first and parsed as they are
+        consumed; handing parsed samples back from worker processes costs
+        about as much as parsing them with orjson. Only a few segments are
+        read ahead, so memory stays bounded on wide windows.
+        """
+        segments = list(self.iter_segments(start_ts, end_ts))
+        if workers <= 1 or len(segments) <= 1:
+            yield from self.iter_metrics(start_ts, end_ts)
+            return
+
+        archived_until = start_ts - 1
+        for metrics in self.iter_archived(start_ts, end_ts):
+            archived_until = metrics.get('timestamp', archived_until)
+            yield metrics
+        start_ts = archived_until + 1
+
+        def read(filepath):
+            offset = 0
+            if self.segment_timestamp(filepath) < start_ts:
+                offset = self.find_offset(filepath, start_ts)
+            return self.read_lines(filepath, offset)
+
+        executor = ThreadPoolExecutor(workers)
+        try:
+            pending = deque()
+            for filepath in segments:
+                pending.append(executor.submit(read, filepath))
+                if len(pending) > workers * 2:
+                    yield from self.parse_lines(pending.popleft().result(), start_ts, end_ts)
+            while pending:
+                yield from self.parse_lines(pending.popleft().result(), start_ts, end_ts)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def parse_lines(self, data: bytes, start_ts: int = 0,
+                    end_ts: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield the samples of NDJSON lines with start_ts <= timestamp <= end_ts"""
+        for line in data.splitlines():
+            try:
+                metrics = json_loads(line)
+            except json.JSONDecodeError:
+                continue
+            timestamp = metrics.get('timestamp', 0)
+            if timestamp >= start_ts and (end_ts is None or timestamp <= end_ts):
+                yield metrics
+
+    def load_range(self, start_ts: int = 0, end_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Load samples in a time range into a list"""
+        return list(self.iter_metrics(start_ts, end_ts))
+
+    def migrate_legacy(self, remove: bool = True) -> int:
+        """Pack legacy metrics_<ts>.json files into segments"""
+        legacy_files = []
+        for filepath in self.data_dir.glob('metrics_*.json'):
+            try:
+                legacy_files.append((int(filepath.stem.split('_')[1]), filepath))
+            except (ValueError, IndexError):
+                continue
+
+        if not legacy_files:
+            return 0
+
+        # Skip anything already present so an interrupted migration can be re-run
+        seen = set()
+        for segment_ts in {self.segment_start(ts) for ts, _ in legacy_files}:
+            for metrics in self.read_segment(self.segment_path(segment_ts)):
+                seen.add(metrics.get('timestamp'))
+
+        # One segment at a time, and files are removed only once their samples are stored
+        by_segment = {}
+        for timestamp, filepath in sorted(legacy_files):
+            by_segment.setdefault(self.segment_start(timestamp), []).append((timestamp, filepath))
+
+        migrated = 0
+        for segment_ts in sorted(by_segment):
+            pending = {}
+            for timestamp, filepath in by_segment[segment_ts]:
+                try:
+                    with open(filepath, 'r') as f:
+                        metrics = json.load(f)
+                except Exception as e:
+                    print(f"Error loading {filepath}: {e}", file=sys.stderr)
+                    continue
+
+                metrics.setdefault('timestamp', timestamp)
+                if metrics['timestamp'] not in seen:
+                    pending.setdefault(self.segment_path(metrics['timestamp']), []).append(metrics)
+                    seen.add(metrics['timestamp'])
+                    migrated += 1
+
+            for filepath, samples in pending.items():
+                samples.sort(key=lambda metrics: metrics['timestamp'])
+                last = self.last_timestamp(filepath)
+                if last is None or samples[0]['timestamp'] >= last:
+                    for metrics in samples:
+                        self.append(metrics)
+                else:
+                    # Migrating after newer samples were stored: keep the segment in order
+                    self.merge_segment(filepath, samples)
+
+            if remove:
+                for _, filepath in by_segment[segment_ts]:
+                    filepath.unlink(missing_ok=True)
+
+        return migrated
+
+    def merge_segment(self, filepath: Path, samples: List[Dict[str, Any]]) -> int:
+        """Rewrite a segment with extra samples merged in timestamp order, then reindex it"""
+        merged = list(self.read_segment(filepath)) + samples
+        merged.sort(key=lambda metrics: metrics.get('timestamp', 0))
+
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = filepath.with_name(f".{filepath.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            for metrics in merged:
+                f.write((json.dumps(metrics, separators=(',', ':')) + '\n').encode('utf-8'))
+        os.replace(tmp_path, filepath)
+        return self.rebuild_index(filepath)
+
+    def scan_segment(self, filepath: Path) -> List[Tuple[int, int]]:
+        """Return (timestamp, offset) for every complete line of a segment"""
+        entries = []
+        with open(filepath, 'rb') as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    timestamp = int(json_loads(line).get('timestamp', 0))
+                except (json.JSONDecodeError, ValueError, AttributeError):
+                    timestamp = None
+                if timestamp is not None:
+                    entries.append((timestamp, offset))
+                offset += len(line)
+        return entries
+
+    def check_index(self, filepath: Path) -> List[str]:
+        """Compare a segment index against the segment, returning any problems"""
+        index_file = self.index_path(filepath)
+        if not index_file.exists():
+            return ['index missing']
+
+        with open(index_file, 'rb') as f:
+            raw = f.read()
+
+        problems = []
+        if len(raw) % INDEX_RECORD.size:
+            problems.append('index has a truncated record')
+            raw = raw[:len(raw) - len(raw) % INDEX_RECORD.size]
+
+        indexed = list(INDEX_RECORD.iter_unpack(raw))
+        actual = sorted(self.scan_segment(filepath))
+
+        if len(indexed) != len(actual):
+            problems.append(f"index has {len(indexed)} entries, segment has {len(actual)} samples")
+
+        mismatched = sum(1 for a, b in zip(indexed, actual) if a != b)
+        if mismatched:
+            problems.append(f"{mismatched} index entries do not match the segment")
+
+        timestamps = [timestamp for timestamp, _ in indexed]
+        if timestamps != sorted(timestamps):
+            problems.append('index timestamps are out of order')
+
+        return problems
+
+    def rebuild_index(self, filepath: Path) -> int:
+        """Regenerate a segment index from the segment contents"""
+        entries = sorted(self.scan_segment(filepath))
+        index_file = self.index_path(filepath)
+        tmp_path = index_file.with_name(f".{index_file.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            for timestamp, offset in entries:
+                f.write(INDEX_RECORD.pack(timestamp, offset))
+        os.replace(tmp_path, index_file)
+        return len(entries)
+
+    def compact(self, before_ts: int) -> int:
+        """Move segments that end at or before before_ts into their day archive
+
+        A segment becomes one archive block. It is removed only after the
+        block is on disk, and a block already holding its hour is not
+        written twice, so an interrupted compaction can simply be re-run.
+        """
+        compacted = 0
+        for filepath in self.list_segments():
+            try:
+                segment_ts = self.segment_timestamp(filepath)
+            except ValueError:
+                continue
+            if segment_ts + SEGMENT_SECONDS > before_ts:
+                break
+
+            archive = Archive(self.archive_path(segment_ts))
+            archived = any(self.segment_start(block.first_ts) == segment_ts
+                           for block in archive.blocks())
+            entries = self.scan_segment(filepath)
+            if entries and not archived:
+                timestamps = [timestamp for timestamp, _ in entries]
+                archive.append(self.read_lines(filepath), min(timestamps),
+                               max(timestamps), len(entries))
+            self.remove_segment(filepath)
+            compacted += 1
+        return compacted
+
+    def prune_archives(self, max_days: float, max_bytes: Optional[int] = None) -> int:
+        """Delete whole-day archives older than max_days, then the oldest beyond max_bytes"""
+        cutoff = time.time() - max_days * 86400
+        archives = []
+        removed = 0
+        for filepath in self.list_archives():
+            try:
+                day_ts = self.archive_timestamp(filepath)
+            except ValueError:
+                continue
+            if day_ts + ARCHIVE_SECONDS <= cutoff:
+                filepath.unlink()
+                removed += 1
+            else:
+                archives.append(filepath)
+
+        if max_bytes is not None:
+            total = sum(filepath.stat().st_size for filepath in archives)
+            for filepath in archives:
+                if total <= max_bytes:
+                    break
+                total -= filepath.stat().st_size
+                filepath.unlink()
+                removed += 1
+        return removed
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the metrics segment store')
+    parser.add_argument('action', choices=['append', 'migrate'],
+                       help='Action to perform')
+    parser.add_argument('file', nargs='?', default='-',
+                       help='Sample to append (default: stdin)')
+    parser.add_argument('--keep', action='store_true',
+                       help='Keep legacy files after migrating them')
+
+    args = parser.parse_args()
+
+    store = MetricsStore()
+
+    if args.action == 'append':
+        if args.file == '-':
+            raw = sys.stdin.read()
+        else:
+            with open(args.file, 'r') as f:
+                raw = f.read()
+
+        try:
+            metrics = json.loads(raw)
+        except json.JSONDecodeError as e:
+            print(f"Invalid metrics sample: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            store.append(metrics)
+        except ValueError as e:
+            # The clock stepped back; the sample would break segment order
+            print(f"Error storing sample: {e}", file=sys.stderr)
+            sys.exit(1)
+        store.write_latest(raw)
+
+        # Keep the running summary statistics current, one sample at a time
+        try:
+            with Aggregator(store.data_dir).locked() as aggregator:
+                aggregator.add(metrics)
+                aggregator.prune()
+                aggregator.save_state()
+        except Exception as e:
+            print(f"Error updating aggregates: {e}", file=sys.stderr)
+
+    elif args.action == 'migrate':
+        migrated = store.migrate_legacy(remove=not args.keep)
+        print(f"Migrated {migrated} legacy metrics files")
+
+
+if __name__ == '__main__':
+    main()
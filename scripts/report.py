@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Report Rendering Helpers
+Inline SVG sparklines and a keyed cache of rendered report sections
+"""
+
+import hashlib
+import html
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional, Sequence, Tuple
+
+
+def sparkline(values: Sequence[Optional[float]], width: int = 320, height: int = 48,
+              color: str = '#667eea', band: Optional[Sequence[Optional[Tuple[float, float]]]] = None,
+              label: str = '') -> str:
+    """Render values as an inline SVG polyline, with an optional min/max band
+
+    None values leave gaps in the line. Returns '' when there is nothing to draw.
+    """
+    points = [value for value in values if value is not None]
+    bounds = points + [bound for pair in band or [] if pair is not None for bound in pair]
+    if not points:
+        return ''
+
+    low, high = min(bounds), max(bounds)
+    span = (high - low) or 1.0
+    step = width / max(len(values) - 1, 1)
+    pad = 2
+
+    def x(index):
+        return f"{index * step:.1f}"
+
+    def y(value):
+        return f"{pad + (high - value) / span * (height - 2 * pad):.1f}"
+
+    shapes = []
+    if band:
+        upper = [f"{x(i)},{y(pair[1])}" for i, pair in enumerate(band) if pair is not None]
+        lower = [f"{x(i)},{y(pair[0])}" for i, pair in enumerate(band) if pair is not None]
+        if upper:
+            shapes.append(f'<polygon points="{" ".join(upper + lower[::-1])}" '
+                          f'fill="{color}" fill-opacity="0.15" stroke="none"/>')
+
+    run = []
+    for index, value in enumerate(list(values) + [None]):
+        if value is not None:
+            run.append(f"{x(index)},{y(value)}")
+        elif run:
+            if len(run) == 1:
+                # A single sample between gaps is drawn as a dot
+                cx, cy = run[0].split(',')
+                shapes.append(f'<circle cx="{cx}" cy="{cy}" r="1.5" fill="{color}"/>')
+            else:
+                shapes.append(f'<polyline points="{" ".join(run)}" fill="none" '
+                              f'stroke="{color}" stroke-width="1.5" stroke-linejoin="round"/>')
+            run = []
+
+    return (f'<svg class="sparkline" viewBox="0 0 {width} {height}" preserveAspectRatio="none" '
+            f'role="img" aria-label="{html.escape(label)}" xmlns="http://www.w3.org/2000/svg">'
+            f'{"".join(shapes)}</svg>')
+
+
+def cache_key(*parts: Any) -> str:
+    """Hash JSON-serializable parts into a stable cache key"""
+    encoded = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class SectionCache:
+    """Rendered report sections and the data they were computed from, keyed per entry
+
+    Entries not used by the latest report are dropped when it is saved,
+    so the file holds one report's worth of sections.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, name: str, key: str) -> Optional[Any]:
+        """Return the cached value of an entry if it was stored under key"""
+        self.used.add(name)
+        entry = self.entries.get(name)
+        if entry is not None and entry.get('key') == key:
+            self.hits += 1
+            return entry['value']
+        self.misses += 1
+        return None
+
+    def put(self, name: str, key: str, value: Any):
+        """Store the value of an entry under key"""
+        self.used.add(name)
+        self.entries[name] = {'key': key, 'value': value}
+
+    def save(self):
+        """Persist the entries used since loading"""
+        self.entries = {name: entry for name, entry in self.entries.items() if name in self.used}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
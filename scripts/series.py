@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Metric Series Helpers
+Address, flatten and downsample numeric series inside metrics samples
+"""
+
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+# Fields that identify an entry inside a list (filesystems, interfaces, GPUs...)
+SERIES_KEYS = ('mount_point', 'interface', 'device', 'id')
+
+PATH_TOKEN = re.compile(r'([^.\[\]]+)(?:\[([^\]]*)\])?\.?')
+
+
+def parse_path(path: str) -> List[Tuple[str, Optional[str]]]:
+    """Split 'network.interfaces[eth0].rx_bytes' into (key, label) steps"""
+    steps = []
+    position = 0
+    while position < len(path):
+        match = PATH_TOKEN.match(path, position)
+        if not match:
+            raise ValueError(f"Invalid series path: {path}")
+        steps.append((match.group(1), match.group(2)))
+        position = match.end()
+    if not steps:
+        raise ValueError(f"Invalid series path: {path}")
+    return steps
+
+
+def entry_label(entry: Dict[str, Any], index: int) -> str:
+    """Return the label that addresses a list entry"""
+    for key in SERIES_KEYS:
+        if key in entry:
+            return str(entry[key])
+    return str(index)
+
+
+def find_entry(entries: List[Any], label: str) -> Optional[Any]:
+    """Find the list entry addressed by a label"""
+    for index, entry in enumerate(entries):
+        if isinstance(entry, dict) and entry_label(entry, index) == label:
+            return entry
+    return None
+
+
+def series_value(metrics: Dict[str, Any], path) -> Optional[float]:
+    """Resolve a series path (string or parsed steps) to a number, or None"""
+    steps = parse_path(path) if isinstance(path, str) else path
+    value = metrics
+    for key, label in steps:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+        if label is not None:
+            if not isinstance(value, list):
+                return None
+            value = find_entry(value, label)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def flatten_sample(metrics: Dict[str, Any], prefix: str = '',
+                   out: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Flatten every numeric leaf of a sample into {series path: value}"""
+    if out is None:
+        out = {}
+
+    for key, value in metrics.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            if path != 'timestamp':
+                out[path] = value
+        elif isinstance(value, dict):
+            flatten_sample(value, f"{path}.", out)
+        elif isinstance(value, list):
+            for index, entry in enumerate(value):
+                if isinstance(entry, dict):
+                    flatten_sample(entry, f"{path}[{entry_label(entry, index)}].", out)
+
+    return out
+
+
+def bucket_aggregate(samples: List[Dict[str, Any]], bucket_seconds: int) -> List[Dict[str, Any]]:
+    """Reduce samples to min/avg/max/last per series in fixed, epoch-aligned buckets"""
+    buckets = []
+    bucket_start = None
+    count = 0
+    accumulators = {}
+
+    def close_bucket():
+        buckets.append({
+            'timestamp': bucket_start,
+            'count': count,
+            'series': {
+                path: {'min': low, 'avg': total / n, 'max': high, 'last': last}
+                for path, (low, high, total, n, last) in accumulators.items()
+            }
+        })
+
+    for metrics in samples:
+        timestamp = metrics.get('timestamp', 0)
+        start = timestamp - (timestamp % bucket_seconds)
+        if start != bucket_start:
+            if bucket_start is not None:
+                close_bucket()
+            bucket_start = start
+            count = 0
+            accumulators = {}
+
+        count += 1
+        for path, value in flatten_sample(metrics).items():
+            acc = accumulators.get(path)
+            if acc is None:
+                accumulators[path] = [value, value, value, 1, value]
+            else:
+                if value < acc[0]:
+                    acc[0] = value
+                if value > acc[1]:
+                    acc[1] = value
+                acc[2] += value
+                acc[3] += 1
+                acc[4] = value
+
+    if bucket_start is not None:
+        close_bucket()
+
+    return buckets
+
+
+def lttb(samples: List[Dict[str, Any]], points: int, path: str) -> List[Dict[str, Any]]:
+    """Largest-Triangle-Three-Buckets: keep the samples that preserve a series' shape"""
+    steps = parse_path(path)
+    data = []
+    for metrics in samples:
+        value = series_value(metrics, steps)
+        if value is not None:
+            data.append((metrics.get('timestamp', 0), value, metrics))
+
+    if points >= len(data):
+        return [metrics for _, _, metrics in data]
+    if points < 3:
+        return [data[0][2], data[-1][2]][:max(points, 1)]
+
+    every = (len(data) - 2) / (points - 2)
+    selected = [data[0][2]]
+    anchor = 0
+
+    for i in range(points - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(data))
+        next_bucket = data[next_start:next_end]
+        avg_x = sum(point[0] for point in next_bucket) / len(next_bucket)
+        avg_y = sum(point[1] for point in next_bucket) / len(next_bucket)
+
+        anchor_x, anchor_y = data[anchor][0], data[anchor][1]
+        best_area = -1
+        best = next_start - 1
+        for j in range(int(i * every) + 1, next_start):
+            area = abs((anchor_x - avg_x) * (data[j][1] - anchor_y)
+                       - (anchor_x - data[j][0]) * (avg_y - anchor_y))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        selected.append(data[best][2])
+        anchor = best
+
+    selected.append(data[-1][2])
+    return selected
+
+
+# Marks a projection node that keeps the whole value
+ALL = None
+
+
+class FieldProjection:
+    """Compiled fields= selector that prunes samples down to the requested series"""
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.root = self._new_node()
+
+        for path in selector.split(','):
+            path = path.strip()
+            if path:
+                self._add(parse_path(path))
+
+        if not self.root['keys']:
+            raise ValueError('Empty fields selector')
+
+    def _new_node(self) -> Dict[str, Any]:
+        # 'keys' applies to dict values, 'entries' to labelled list entries
+        return {'keys': {}, 'entries': {}}
+
+    def _add(self, steps: List[Tuple[str, Optional[str]]]):
+        node = self.root
+        for position, (key, label) in enumerate(steps):
+            last = position == len(steps) - 1
+            children = node['keys']
+            if key in children and children[key] is ALL:
+                return
+
+            if label is None:
+                if last:
+                    children[key] = ALL
+                    return
+                node = children.setdefault(key, self._new_node())
+                continue
+
+            list_node = children.setdefault(key, self._new_node())
+            entries = list_node['entries']
+            if label in entries and entries[label] is ALL:
+                return
+            if last:
+                entries[label] = ALL
+                return
+            node = entries.setdefault(label, self._new_node())
+
+    def _project(self, value: Any, node: Optional[Dict[str, Any]]) -> Any:
+        if node is ALL:
+            return value
+
+        if isinstance(value, dict):
+            projected = {}
+            for key, child in node['keys'].items():
+                if key in value:
+                    projected[key] = self._project(value[key], child)
+            return projected
+
+        if isinstance(value, list):
+            projected = []
+            for index, entry in enumerate(value):
+                if not isinstance(entry, dict):
+                    continue
+                label = entry_label(entry, index)
+                if label in node['entries']:
+                    child = node['entries'][label]
+                elif node['keys']:
+                    # 'interfaces.rx_bytes' selects the field from every entry
+                    child = node
+                else:
+                    continue
+
+                pruned = self._project(entry, child)
+                if child is not ALL:
+                    # Keep the identifying field so entries stay addressable
+                    for key in SERIES_KEYS:
+                        if key in entry:
+                            pruned[key] = entry[key]
+                            break
+                projected.append(pruned)
+            return projected
+
+        return value
+
+    def apply(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a pruned copy of a sample; the timestamp is always kept"""
+        projected = self._project(metrics, self.root)
+        if 'timestamp' in metrics:
+            projected['timestamp'] = metrics['timestamp']
+        return projected
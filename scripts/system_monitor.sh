@@ -17,14 +17,16 @@ trap 'echo "ERROR: Command failed at line $LINENO: $BASH_COMMAND" >&2' ERR
 DATA_DIR="${DATA_DIR:-/app/data}"
 LOG_DIR="${LOG_DIR:-/app/logs}"
 INTERVAL="${MONITOR_INTERVAL:-5}"
+STORE_SCRIPT="${STORE_SCRIPT:-$(dirname "$0")/metrics_store.py}"
+AGGREGATOR_SCRIPT="${AGGREGATOR_SCRIPT:-$(dirname "$0")/aggregator.py}"
 TIMESTAMP=$(date +%s)
 DATETIME=$(date '+%Y-%m-%d %H:%M:%S')
 
 # Ensure directories exist
 mkdir -p "$DATA_DIR" "$LOG_DIR"
 
-# Output file
-METRICS_FILE="$DATA_DIR/metrics_${TIMESTAMP}.json"
+# Scratch file for the sample being collected (appended to the segment store)
+METRICS_FILE="$DATA_DIR/.metrics_${TIMESTAMP}.json.tmp"
 
 ################################################################################
 # CPU Metrics
@@ -503,29 +505,29 @@ collect_metrics() {
 monitor_loop() {
     echo "Starting system monitoring (interval: ${INTERVAL}s)..." | tee -a "$LOG_DIR/monitor.log"
     
+    # Pack per-sample files left by older versions into segments
+    python3 "$STORE_SCRIPT" migrate 2>> "$LOG_DIR/monitor_error.log" | tee -a "$LOG_DIR/monitor.log" || true
+    
+    # Fold stored samples the summary aggregates have not seen yet (first start, upgrades)
+    python3 "$AGGREGATOR_SCRIPT" catch-up 2>> "$LOG_DIR/monitor_error.log" | tee -a "$LOG_DIR/monitor.log" || true
+    
     while true; do
         TIMESTAMP=$(date +%s)
         DATETIME=$(date '+%Y-%m-%d %H:%M:%S')
-        METRICS_FILE="$DATA_DIR/metrics_${TIMESTAMP}.json"
+        METRICS_FILE="$DATA_DIR/.metrics_${TIMESTAMP}.json.tmp"
         
         echo "[$DATETIME] Collecting metrics..." | tee -a "$LOG_DIR/monitor.log"
         
         # Collect metrics (append errors to log instead of overwriting)
-        if collect_metrics > "$METRICS_FILE" 2>> "$LOG_DIR/monitor_error.log"; then
-            # Keep latest metrics symlink
-            ln -sf "$(basename "$METRICS_FILE")" "$DATA_DIR/latest_metrics.json" || true
-            
+        if collect_metrics > "$METRICS_FILE" 2>> "$LOG_DIR/monitor_error.log" && \
+           python3 "$STORE_SCRIPT" append "$METRICS_FILE" 2>> "$LOG_DIR/monitor_error.log"; then
             # Log collection
-            echo "[$DATETIME] Metrics collected: $METRICS_FILE" | tee -a "$LOG_DIR/monitor.log"
+            echo "[$DATETIME] Metrics collected: timestamp $TIMESTAMP" | tee -a "$LOG_DIR/monitor.log"
         else
             echo "[$DATETIME] ERROR: Failed to collect metrics" | tee -a "$LOG_DIR/monitor.log"
         fi
         
-        # Cleanup old metrics (keep last 1000 files)
-        metric_count=$(ls -1 "$DATA_DIR"/metrics_*.json 2>/dev/null | wc -l || echo "0")
-        if [ "$metric_count" -gt 1000 ]; then
-            ls -1t "$DATA_DIR"/metrics_*.json 2>/dev/null | tail -n +1001 | xargs -r rm -f || true
-        fi
+        rm -f "$METRICS_FILE"
         
         sleep "$INTERVAL"
     done
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Vectorized Statistics
+Bulk mean/min/max/stddev and percentiles over contiguous columns of samples
+"""
+
+import math
+from array import array
+from typing import Dict, List, Any, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (50, 95, 99)
+
+
+def backend() -> str:
+    """Name of the array implementation in use"""
+    return 'numpy' if np is not None else 'array'
+
+
+def to_float(value: Any) -> float:
+    """Convert a sample value to float, with NaN for null or non-numeric values"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def column(values: Sequence[Any]):
+    """Convert a list of sample values into one contiguous float64 column
+
+    Null or non-numeric entries become NaN; drop them with present().
+    """
+    try:
+        if np is not None:
+            return np.array(values, dtype=np.float64)
+        return array('d', values)
+    except (TypeError, ValueError):
+        return column([to_float(value) for value in values])
+
+
+def present(values, drop_zero: bool = False):
+    """Drop NaN entries (and zeros if drop_zero) from a column"""
+    if np is not None:
+        keep = ~np.isnan(values)
+        if drop_zero:
+            keep &= values != 0
+        return values[keep]
+    return array('d', [v for v in values if v == v and not (drop_zero and v == 0)])
+
+
+def group(keys: List[Any], values) -> Dict[Any, Any]:
+    """Split a column into one column per key, keeping first-seen key order"""
+    if np is not None:
+        keys = np.array(keys, dtype=object)
+        return {key: values[keys == key] for key in dict.fromkeys(keys.tolist())}
+    groups = {}
+    for key, value in zip(keys, values):
+        members = groups.get(key)
+        if members is None:
+            members = groups[key] = array('d')
+        members.append(value)
+    return groups
+
+
+def subtract(minuends, subtrahends):
+    """Element-wise difference of two columns of equal length"""
+    if np is not None:
+        return minuends - subtrahends
+    return array('d', [a - b for a, b in zip(minuends, subtrahends)])
+
+
+def percent(numerators, denominators):
+    """Element-wise numerator / denominator * 100, skipping rows without a positive denominator"""
+    if np is not None:
+        valid = denominators > 0
+        return numerators[valid] / denominators[valid] * 100
+    return array('d', [n / d * 100 for n, d in zip(numerators, denominators) if d > 0])
+
+
+def mean(values) -> float:
+    """Arithmetic mean of a non-empty column"""
+    if np is not None:
+        return float(np.mean(values))
+    return math.fsum(values) / len(values)
+
+
+def describe(values) -> Dict[str, float]:
+    """Return avg, min, max, stddev and p50/p95/p99 of a column, or {} if it is empty
+
+    The standard deviation is the population one, as in the rollup tiers.
+    Percentiles interpolate linearly between the closest ranks.
+    """
+    count = len(values)
+    if count == 0:
+        return {}
+
+    if np is not None:
+        values = np.asarray(values, dtype=np.float64)
+        mean = float(values.mean())
+        stats = {'avg': mean, 'min': float(values.min()), 'max': float(values.max()),
+                 'stddev': float(values.std())}
+        for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            stats[f"p{q}"] = float(value)
+        return stats
+
+    ordered = sorted(values)
+    mean = math.fsum(ordered) / count
+    stats = {'avg': mean, 'min': ordered[0], 'max': ordered[-1],
+             'stddev': math.sqrt(math.fsum((v - mean) ** 2 for v in ordered) / count)}
+    for q in PERCENTILES:
+        rank = (count - 1) * q / 100
+        low = int(rank)
+        high = min(low + 1, count - 1)
+        stats[f"p{q}"] = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return stats
+
+
+def prefixed(prefix: str, stats: Dict[str, float]) -> Dict[str, float]:
+    """Flatten describe() output into keys like 'load_1min_p95'"""
+    return {f"{prefix}_{name}": value for name, value in stats.items()}
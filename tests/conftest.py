@@ -0,0 +1,9 @@
+"""Put the scripts and benchmarks directories on the import path, as the scripts run from there"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for directory in (ROOT, ROOT / 'scripts', ROOT / 'benchmarks'):
+    if str(directory) not in sys.path:
+        sys.path.insert(0, str(directory))
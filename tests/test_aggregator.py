@@ -0,0 +1,59 @@
+"""Tests for scripts/aggregator.py"""
+
+from aggregator import PRUNE_INTERVAL, Aggregator, Bucket, sample_values
+
+
+def test_sample_values_skips_non_numeric():
+    metrics = {
+        'cpu': {'load_1min': '0.5', 'load_5min': 'n/a', 'temperature_celsius': 'null'},
+        'memory': {'total_kb': 100, 'available_kb': None, 'swap_total_kb': 10, 'swap_used_kb': 5},
+        'disk': {'filesystems': [{'mount_point': '/', 'use_percent': '12'},
+                                 {'mount_point': '/data', 'use_percent': 'unknown'}]}
+    }
+    assert sample_values(metrics) == {'cpu.load_1min': 0.5, 'memory.swap_used_percent': 50.0, 'disk:/': 12.0}
+
+
+def test_bucket_keeps_sample_with_bad_value():
+    bucket = Bucket(0)
+    bucket.add({'cpu': {'load_1min': 1.0, 'temperature_celsius': 'N/A'}})
+    bucket.add({'cpu': {'load_1min': 3.0, 'temperature_celsius': 40}})
+    assert bucket.count == 2
+    assert bucket.stats['cpu.load_1min'].count == 2
+    assert bucket.stats['cpu.temperature'].count == 1
+
+
+def test_bucket_closed_twice_is_read_once(tmp_path):
+    aggregator = Aggregator(tmp_path)
+    aggregator.directory.mkdir(parents=True)
+    for timestamp in (600, 630, 660):
+        aggregator.add({'timestamp': timestamp, 'cpu': {'load_1min': 1.0}})
+    aggregator.save_state()
+    aggregator.add({'timestamp': 720, 'cpu': {'load_1min': 1.0}})
+
+    # Crash before save_state: the reloaded state closes the 660 bucket again
+    aggregator.load_state()
+    aggregator.add({'timestamp': 720, 'cpu': {'load_1min': 1.0}})
+    assert len(aggregator.tier_file(0).read_text().splitlines()) == 3
+
+    closed = list(aggregator.iter_buckets(0, include_open=False))
+    assert [bucket.start for bucket in closed] == [600, 660]
+    assert sum(bucket.count for bucket in aggregator.iter_buckets(0, level=1)) == 4
+
+    aggregator.prune(now=720 + PRUNE_INTERVAL)
+    assert len(aggregator.tier_file(0).read_text().splitlines()) == 2
+
+
+def test_window_does_not_reach_before_start(tmp_path):
+    aggregator = Aggregator(tmp_path)
+    aggregator.directory.mkdir(parents=True)
+    start = 86400
+    for timestamp in range(start, start + 3 * 3600, 30):
+        aggregator.add({'timestamp': timestamp, 'cpu': {'load_1min': 1.0}})
+
+    # 1h buckets would start at the top of the hour, 25 minutes too early
+    cutoff = start + 85 * 60
+    expected = len(range(cutoff, start + 3 * 3600, 30))
+    for level in range(len(aggregator.tiers)):
+        window = aggregator.window(cutoff, level)
+        assert window.count == expected
+        assert window.start == cutoff
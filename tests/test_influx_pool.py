@@ -0,0 +1,127 @@
+"""Tests for the InfluxDB writer's connection pool and spool against benchmarks/influx_stub.py"""
+
+import time
+
+import pytest
+
+from bench_polling import make_sample
+from influx_stub import InfluxStub
+
+
+@pytest.fixture
+def stub():
+    stub = InfluxStub()
+    stub.url = stub.start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def make_writer(stub, tmp_path, monkeypatch):
+    monkeypatch.setenv('INFLUXDB_URL', stub.url)
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    from influxdb_writer import InfluxDBWriter
+
+    writers = []
+
+    def make():
+        writer = InfluxDBWriter()
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.pool.close()
+
+
+def write(pool, body=b'cpu load_1min=1.0 1\n'):
+    return pool.request('POST', '/write?db=test', body, {'Content-Type': 'text/plain'})
+
+
+def test_connection_is_reused(stub):
+    from influxdb_writer import ConnectionPool
+
+    pool = ConnectionPool(stub.url, size=2)
+    try:
+        for _ in range(5):
+            assert write(pool) == (204, b'')
+    finally:
+        pool.close()
+
+    assert stub.requests == 5
+    assert stub.connections == 1
+    assert pool.opened == 1
+    assert pool.reconnects == 0
+
+
+def test_retry_after_server_closes_keepalive(stub):
+    from influxdb_writer import ConnectionPool
+
+    pool = ConnectionPool(stub.url, size=2)
+    try:
+        assert write(pool)[0] == 204
+        stub.drop_connections()
+        # Give the server a moment to finish closing its side
+        deadline = time.monotonic() + 2
+        while stub.sockets and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert write(pool)[0] == 204
+    finally:
+        pool.close()
+
+    assert pool.reconnects == 1
+    assert pool.opened == 2
+    assert stub.requests == 2
+
+
+def test_fresh_connection_failure_is_not_retried(stub):
+    from influxdb_writer import ConnectionPool
+
+    url = stub.url
+    stub.stop()
+    pool = ConnectionPool(url, size=2, timeout=1)
+    with pytest.raises(OSError):
+        write(pool)
+    assert pool.reconnects == 0
+
+
+def test_spool_replays_after_failure(stub, make_writer):
+    writer = make_writer()
+    stub.status = 503
+    assert not writer.process_metrics(make_sample(int(time.time())))
+    assert len(writer.spool.pending()) == 1
+    assert stub.points == 0
+
+    # The batch waits on disk for the backoff, then is replayed once
+    stub.status = 204
+    assert not writer.drain()
+    writer.retry_at = 0
+    assert writer.drain()
+    assert writer.spool.pending() == []
+    assert stub.points > 0
+
+    points = stub.points
+    assert writer.drain()
+    assert stub.points == points
+
+
+def test_spool_survives_restart(stub, make_writer):
+    stub.status = 503
+    assert not make_writer().process_metrics(make_sample(int(time.time())))
+
+    stub.status = 204
+    writer = make_writer()
+    assert len(writer.spool.pending()) == 1
+    assert writer.drain()
+    assert writer.spool.pending() == []
+    assert stub.points > 0
+
+
+def test_spool_creates_missing_database(stub, make_writer):
+    writer = make_writer()
+    stub.database_missing = True
+    assert writer.process_metrics(make_sample(int(time.time())))
+    assert stub.queries == 1
+    assert writer.spool.pending() == []
+    assert stub.points > 0
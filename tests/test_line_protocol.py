@@ -0,0 +1,136 @@
+"""Tests for scripts/line_protocol.py"""
+
+import pytest
+
+from line_protocol import LineEncoder, escape_key, escape_measurement, format_value
+
+
+def test_escape_measurement():
+    assert escape_measurement('cpu load,1') == 'cpu\\ load\\,1'
+    # '=' is only special in keys
+    assert escape_measurement('a=b') == 'a=b'
+
+
+def test_escape_key():
+    assert escape_key('mount point') == 'mount\\ point'
+    assert escape_key('a,b=c') == 'a\\,b\\=c'
+    assert escape_key('line\nbreak') == 'line\\nbreak'
+
+
+def test_escaped_tags_and_string_fields():
+    encoder = LineEncoder(schema={})
+    line = encoder.encode('disk usage', {'mount point': '/mnt/a b', 'host': 'web,1'},
+                          {'note': 'say "hi" \\ bye'}, 100)
+    assert line == ('disk\\ usage,host=web\\,1,mount\\ point=/mnt/a\\ b '
+                    'note="say \\"hi\\" \\\\ bye" 100')
+
+
+def test_declared_types():
+    encoder = LineEncoder()
+    line = encoder.encode('memory', {}, {'total_kb': 2048.0, 'used_percent': 50, 'used_kb': '1024'}, 1)
+    assert line == 'memory total_kb=2048i,used_percent=50.0,used_kb=1024i 1'
+
+
+def test_undeclared_types():
+    encoder = LineEncoder(schema={})
+    line = encoder.encode('gpu', {}, {'count': 2, 'load': 0.5, 'busy': True, 'name': 'x'}, 1)
+    assert line == 'gpu count=2i,load=0.5,busy=t,name="x" 1'
+
+
+def test_bool_is_not_an_int():
+    assert format_value(False, None) == 'f'
+    assert format_value(True, bool) == 't'
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+@pytest.mark.parametrize('kind', [int, float, None])
+def test_non_finite_values_are_skipped(value, kind):
+    assert format_value(value, kind) is None
+
+
+def test_point_without_writable_fields():
+    encoder = LineEncoder()
+    assert encoder.encode('cpu', {}, {'load_1min': float('nan'), 'core_count': float('inf')}, 1) is None
+    assert not encoder.add('cpu', {}, {'load_1min': None}, 1)
+    assert encoder.skipped == 2
+    assert encoder.getvalue() == b''
+
+
+def test_non_finite_field_leaves_the_others():
+    encoder = LineEncoder()
+    line = encoder.encode('cpu', {}, {'load_1min': float('inf'), 'load_5min': 1.5}, 1)
+    assert line == 'cpu load_5min=1.5 1'
+
+
+def test_empty_tags_are_left_out():
+    encoder = LineEncoder()
+    assert encoder.prefix('network', {'interface': '', 'host': None}) == 'network'
+    assert encoder.encode('network', {}, {'rx_bytes': 1}, 5) == 'network rx_bytes=1i 5'
+
+
+def test_prefix_cache_is_reused():
+    encoder = LineEncoder()
+    tags = {'mount': '/', 'device': 'sda1'}
+    first = encoder.prefix('disk', tags)
+    assert first == 'disk,device=sda1,mount=/'
+    assert encoder.prefix('disk', dict(tags)) is first
+    assert len(encoder.prefixes) == 1
+
+
+def test_prefix_cache_is_bounded():
+    encoder = LineEncoder(max_series=2)
+    for index in range(5):
+        encoder.prefix('disk', {'mount': f"/mnt/{index}"})
+    assert len(encoder.prefixes) <= 2
+
+
+def test_buffer_and_clear():
+    encoder = LineEncoder()
+    assert encoder.add('cpu', {'host': 'a'}, {'load_1min': 0.25}, 10)
+    assert encoder.add('cpu', {'host': 'a'}, {'load_1min': 0.5}, 20)
+    assert encoder.getvalue() == b'cpu,host=a load_1min=0.25 10\ncpu,host=a load_1min=0.5 20\n'
+    assert encoder.lines == 2
+
+    encoder.clear()
+    assert encoder.getvalue() == b''
+    assert encoder.lines == 0
+    assert encoder.prefixes
+
+
+def normalized(line):
+    """Split a line into prefix, set of fields and timestamp, as field order does not matter"""
+    prefix, fields, timestamp = line.rsplit(' ', 2)
+    return prefix, set(fields.split(',')), timestamp
+
+
+def test_extend_matches_encode():
+    points = [
+        ('cpu', {'host': 'a'}, {'load_1min': 0.5, 'load_5min': 1, 'load_15min': 2.25, 'core_count': 4.0}, 10),
+        ('cpu', {'host': 'a'}, {'core_count': 4, 'load_15min': 0.1, 'load_5min': 0.2, 'load_1min': 0.3}, 20),
+        ('cpu', {'host': 'a'}, {'load_1min': float('nan'), 'load_5min': 1.0, 'load_15min': 1.0, 'core_count': 4}, 30),
+        ('cpu', {'host': 'a'}, {'load_1min': True, 'load_5min': 1.0, 'load_15min': 1.0, 'core_count': 4}, 40),
+        ('cpu', {'host': 'a'}, {'load_1min': '0.7', 'load_5min': None, 'load_15min': 1.0, 'core_count': 4}, 50),
+        ('cpu', {'host': 'a'}, {'load_1min': 0.5, 'extra': 'x', 'load_15min': 1.0, 'core_count': 4}, 60),
+        ('disk', {'mount_point': '/mnt/a b'}, {'used_percent': 50, 'total_kb': 10}, 70),
+    ]
+    reference = LineEncoder()
+    expected = [reference.encode(*point) for point in points]
+
+    encoder = LineEncoder()
+    assert encoder.extend(points) == len(points)
+    assert encoder.lines == len(points)
+    lines = encoder.getvalue().decode('utf-8').splitlines()
+    assert [normalized(line) for line in lines] == [normalized(line) for line in expected]
+
+
+def test_extend_skips_points_without_fields():
+    encoder = LineEncoder()
+    assert encoder.extend([('cpu', {}, {}, 1), ('cpu', {}, {'load_1min': float('inf')}, 2)]) == 0
+    assert encoder.skipped == 2
+    assert encoder.getvalue() == b''
+
+
+def test_percent_in_field_key():
+    encoder = LineEncoder(schema={})
+    encoder.extend([('m', {}, {'100%': 1}, 1), ('m', {}, {'100%': 2}, 2)])
+    assert encoder.getvalue() == b'm 100%=1i 1\nm 100%=2i 2\n'
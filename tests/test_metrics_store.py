@@ -0,0 +1,111 @@
+"""Tests for the segment store in scripts/metrics_store.py"""
+
+import json
+
+import pytest
+
+from metrics_store import SEGMENT_SECONDS, MetricsStore
+
+# Midnight, so every segment of a test falls into one day archive
+DAY = 86400 * 20000
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetricsStore(tmp_path)
+
+
+def sample(timestamp):
+    return {'timestamp': timestamp, 'cpu': {'load_1min': timestamp % 7}}
+
+
+def timestamps(samples):
+    return [metrics['timestamp'] for metrics in samples]
+
+
+def test_append_refuses_older_sample(store):
+    path = store.append(sample(DAY + 60))
+    with pytest.raises(ValueError):
+        store.append(sample(DAY + 30))
+    # Equal timestamps are still in order
+    store.append(sample(DAY + 60))
+    assert timestamps(store.read_segment(path)) == [DAY + 60, DAY + 60]
+    assert store.check_index(path) == []
+
+
+def test_merge_segment_keeps_order_and_index(store):
+    for offset in (0, 30, 90, 120):
+        path = store.append(sample(DAY + offset))
+
+    assert store.merge_segment(path, [sample(DAY + 60), sample(DAY + 10)]) == 6
+    assert timestamps(store.read_segment(path)) == [DAY, DAY + 10, DAY + 30, DAY + 60, DAY + 90, DAY + 120]
+    assert store.check_index(path) == []
+    assert timestamps(store.iter_metrics(DAY + 50)) == [DAY + 60, DAY + 90, DAY + 120]
+
+    # Appending after the merge continues the rebuilt index
+    store.append(sample(DAY + 150))
+    assert store.check_index(path) == []
+    assert store.last_timestamp(path) == DAY + 150
+
+
+def test_late_legacy_samples_are_merged(store, tmp_path):
+    for offset in (100, 200, 300):
+        store.append(sample(DAY + offset))
+    for offset in (150, 50, SEGMENT_SECONDS + 5):
+        (tmp_path / f"metrics_{DAY + offset}.json").write_text(json.dumps(sample(DAY + offset)))
+
+    assert store.migrate_legacy() == 3
+    assert list(tmp_path.glob('metrics_*.json')) == []
+    assert timestamps(store.iter_metrics()) == [DAY + 50, DAY + 100, DAY + 150, DAY + 200, DAY + 300,
+                                                DAY + SEGMENT_SECONDS + 5]
+    for path in store.list_segments():
+        assert store.check_index(path) == []
+
+    # Re-running finds nothing new
+    (tmp_path / f"metrics_{DAY + 150}.json").write_text(json.dumps(sample(DAY + 150)))
+    assert store.migrate_legacy() == 0
+
+
+def test_find_offset(store):
+    for offset in range(0, 600, 60):
+        path = store.append(sample(DAY + offset))
+    entries = store.scan_segment(path)
+
+    assert store.find_offset(path, 0) == 0
+    assert store.find_offset(path, DAY + 120) == entries[2][1]
+    # Between two samples: the later one
+    assert store.find_offset(path, DAY + 121) == entries[3][1]
+    # Past the end: the last indexed sample, so unindexed lines are still read
+    assert store.find_offset(path, DAY + 10_000) == entries[-1][1]
+    assert store.find_offset(store.segment_path(DAY + SEGMENT_SECONDS), DAY) == 0
+
+
+def test_index_problems_are_found_and_rebuilt(store):
+    for offset in (0, 30, 60):
+        path = store.append(sample(DAY + offset))
+    store.index_path(path).write_bytes(store.index_path(path).read_bytes()[:-3])
+
+    assert store.check_index(path)
+    assert store.rebuild_index(path) == 3
+    assert store.check_index(path) == []
+
+
+def test_compaction_round_trip(store):
+    expected = []
+    for hour in range(3):
+        for offset in range(0, SEGMENT_SECONDS, 600):
+            expected.append(sample(DAY + hour * SEGMENT_SECONDS + offset))
+            store.append(expected[-1])
+
+    assert store.compact(DAY + 2 * SEGMENT_SECONDS) == 2
+    assert len(store.list_segments()) == 1
+    assert len(store.list_archives()) == 1
+    assert store.load_range() == expected
+    assert store.load_range(DAY + 1800, DAY + SEGMENT_SECONDS + 1800) == \
+        [metrics for metrics in expected if DAY + 1800 <= metrics['timestamp'] <= DAY + SEGMENT_SECONDS + 1800]
+    assert store.stored_hours() == [DAY, DAY + SEGMENT_SECONDS, DAY + 2 * SEGMENT_SECONDS]
+
+    # Re-running after an interrupted compaction does not archive an hour twice
+    store.append(expected[0])
+    assert store.compact(DAY + 2 * SEGMENT_SECONDS) == 1
+    assert store.load_range() == expected
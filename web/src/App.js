@@ -38,17 +38,46 @@ function App() {
     }
   };
 
-  // Auto-refresh every 5 seconds
+  // Live updates: server-sent events, falling back to polling every 5 seconds
   useEffect(() => {
     fetchMetrics();
     fetchAlerts();
-    
-    const interval = setInterval(() => {
-      fetchMetrics();
-      fetchAlerts();
-    }, 5000);
 
-    return () => clearInterval(interval);
+    let interval = null;
+    const startPolling = () => {
+      if (interval) return;
+      interval = setInterval(() => {
+        fetchMetrics();
+        fetchAlerts();
+      }, 5000);
+    };
+    const stopPolling = () => {
+      clearInterval(interval);
+      interval = null;
+    };
+
+    if (!window.EventSource) {
+      startPolling();
+      return stopPolling;
+    }
+
+    const source = new EventSource('/api/stream');
+    source.addEventListener('metrics', (event) => {
+      setMetrics(JSON.parse(event.data));
+      setError(null);
+      setLoading(false);
+    });
+    source.addEventListener('alerts', (event) => {
+      setAlerts(JSON.parse(event.data));
+    });
+    // EventSource reconnects on its own; poll until it is back
+    source.onopen = stopPolling;
+    source.onerror = startPolling;
+
+    return () => {
+      source.close();
+      stopPolling();
+    };
   }, []);
 
   if (loading) {